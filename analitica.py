@@ -0,0 +1,233 @@
+"""
+ANALÍTICA DE VENTAS - CAFETERÍA
+Mapa de calor de ventas por hora del día × día de la semana (general y por categoría)
+y co-ocurrencia de productos para sugerir complementos en el carrito
+Autor: Sistema de Ventas
+Fecha: Octubre 2026
+"""
+
+import heapq
+
+DIAS_SEMANA = ["Lun", "Mar", "Mié", "Jue", "Vie", "Sáb", "Dom"]
+SIN_CATEGORIA = "Sin categoría"
+
+
+def _matriz():
+    """Matriz 7 × 24 (día de la semana × hora) en ceros."""
+    return [[0.0] * 24 for _ in range(7)]
+
+
+# ============================================================
+# CLASE MAPA DE CALOR
+# ============================================================
+
+class MapaCalorVentas:
+    """
+    Acumula ventas en matrices de 7 días × 24 horas.
+    Se carga una vez desde la base de datos con consultas agrupadas y
+    luego se actualiza con cada venta nueva (agregar_venta).
+
+    Métricas:
+        'ventas'    número de tickets
+        'ingresos'  monto cobrado
+        por categoría: 'unidades' y 'ingresos' de las líneas de esa categoría
+    """
+
+    def __init__(self):
+        self.ventas = _matriz()
+        self.ingresos = _matriz()
+        self.por_categoria = {}  # categoria -> {'unidades': matriz, 'ingresos': matriz}
+
+    def _categoria(self, categoria):
+        matrices = self.por_categoria.get(categoria)
+        if matrices is None:
+            matrices = self.por_categoria[categoria] = {'unidades': _matriz(), 'ingresos': _matriz()}
+        return matrices
+
+    # --- CARGA Y ACTUALIZACIÓN ---
+    def cargar_desde_bd(self, db):
+        """Reconstruye las matrices a partir de las tablas ventas y detalle_ventas."""
+        self.__init__()
+        cursor = db.cursor
+        # strftime('%w') cuenta desde el domingo (0); se convierte a lunes = 0
+        cursor.execute("""
+            SELECT (CAST(strftime('%w', fecha) AS INTEGER) + 6) % 7 AS dia,
+                   CAST(strftime('%H', fecha) AS INTEGER) AS hora,
+                   COUNT(*), SUM(total)
+            FROM ventas
+            WHERE estado = 'Completada'
+            GROUP BY dia, hora
+        """)
+        for dia, hora, cantidad, total in cursor.fetchall():
+            self.ventas[dia][hora] = cantidad
+            self.ingresos[dia][hora] = total
+
+        cursor.execute("""
+            SELECT COALESCE(p.categoria, ?) AS categoria,
+                   (CAST(strftime('%w', v.fecha) AS INTEGER) + 6) % 7 AS dia,
+                   CAST(strftime('%H', v.fecha) AS INTEGER) AS hora,
+                   SUM(d.cantidad), SUM(d.subtotal)
+            FROM detalle_ventas d
+            JOIN ventas v ON v.numero_venta = d.numero_venta
+            LEFT JOIN productos p ON p.codigo = d.codigo_producto
+            WHERE v.estado = 'Completada'
+            GROUP BY categoria, dia, hora
+        """, (SIN_CATEGORIA,))
+        for categoria, dia, hora, unidades, subtotal in cursor.fetchall():
+            matrices = self._categoria(categoria)
+            matrices['unidades'][dia][hora] = unidades
+            matrices['ingresos'][dia][hora] = subtotal
+
+    def agregar_venta(self, venta):
+        """Suma una venta completada a las matrices."""
+        fecha = venta.get_fecha()
+        dia, hora = fecha.weekday(), fecha.hour
+        self.ventas[dia][hora] += 1
+        self.ingresos[dia][hora] += venta.get_total()
+        for item in venta.get_items():
+            producto = item.get('producto_obj')
+            matrices = self._categoria(producto.get_categoria() if producto else SIN_CATEGORIA)
+            matrices['unidades'][dia][hora] += item['cantidad']
+            matrices['ingresos'][dia][hora] += item['subtotal']
+
+    # --- CONSULTAS ---
+    def matriz(self, metrica="ventas", categoria=None):
+        """Devuelve la matriz 7 × 24 de una métrica (general o de una categoría)."""
+        if categoria is None:
+            return self.ventas if metrica == "ventas" else self.ingresos
+        matrices = self.por_categoria.get(categoria)
+        if matrices is None:
+            return _matriz()
+        return matrices['ingresos'] if metrica == "ingresos" else matrices['unidades']
+
+    def hora_pico(self, metrica="ventas", categoria=None):
+        """(día, hora, valor) de la celda con el valor más alto."""
+        matriz = self.matriz(metrica, categoria)
+        return max(((dia, hora, matriz[dia][hora]) for dia in range(7) for hora in range(24)),
+                   key=lambda celda: celda[2])
+
+    def mostrar(self, metrica="ventas", categoria=None):
+        """Imprime el mapa de calor (sólo el rango de horas con actividad)."""
+        matriz = self.matriz(metrica, categoria)
+        horas = [h for h in range(24) if any(matriz[d][h] for d in range(7))]
+        titulo = f"MAPA DE CALOR - {metrica.upper()}" + (f" - {categoria}" if categoria else "")
+
+        print("\n" + "="*70)
+        print(titulo)
+        print("="*70)
+        if not horas:
+            print("No hay ventas registradas")
+            print("="*70 + "\n")
+            return
+
+        horas = range(horas[0], horas[-1] + 1)
+        formato = "{:>8.0f}" if metrica == "ingresos" else "{:>5.0f}"
+        ancho = 8 if metrica == "ingresos" else 5
+        print("Hora " + "".join(f"{h:>{ancho}}" for h in horas) + f"{'Total':>{ancho + 3}}")
+        for dia in range(7):
+            fila = matriz[dia]
+            print(f"{DIAS_SEMANA[dia]:<5}" + "".join(formato.format(fila[h]) for h in horas)
+                  + f"{sum(fila):>{ancho + 3}.0f}")
+        print("-"*70)
+        dia, hora, valor = self.hora_pico(metrica, categoria)
+        print(f"Hora pico: {DIAS_SEMANA[dia]} {hora:02d}:00 ({valor:,.0f})")
+        print("="*70 + "\n")
+
+
+# ============================================================
+# CLASE CO-OCURRENCIA DE PRODUCTOS (SUGERENCIAS)
+# ============================================================
+
+class CoocurrenciaProductos:
+    """
+    Matriz dispersa de co-ocurrencia: cuántos tickets contienen cada
+    producto y cada par de productos. Se construye una vez con una
+    consulta agrupada sobre detalle_ventas y se actualiza con cada venta.
+
+    lift(a, b) = P(a y b) / (P(a) · P(b)); mayor que 1 indica que los
+    productos se compran juntos más de lo esperado por azar.
+    """
+
+    def __init__(self, soporte_minimo=2):
+        self.soporte_minimo = soporte_minimo  # Tickets mínimos con el par para sugerirlo
+        self.total_tickets = 0
+        self.tickets_producto = {}            # codigo -> tickets que lo contienen
+        self.pares = {}                       # codigo -> {otro_codigo: tickets con ambos}
+
+    # --- CARGA Y ACTUALIZACIÓN ---
+    def cargar_desde_bd(self, cursor):
+        """Construye la matriz desde detalle_ventas (cursor de sqlite3 de cualquiera de las dos bases)."""
+        self.__init__(self.soporte_minimo)
+        cursor.execute("SELECT COUNT(DISTINCT numero_venta) FROM detalle_ventas")
+        self.total_tickets = cursor.fetchone()[0]
+
+        cursor.execute("""
+            SELECT codigo_producto, COUNT(DISTINCT numero_venta)
+            FROM detalle_ventas
+            GROUP BY codigo_producto
+        """)
+        self.tickets_producto = dict(cursor.fetchall())
+
+        cursor.execute("""
+            SELECT a.codigo_producto, b.codigo_producto, COUNT(DISTINCT a.numero_venta)
+            FROM detalle_ventas a
+            JOIN detalle_ventas b
+              ON b.numero_venta = a.numero_venta AND b.codigo_producto > a.codigo_producto
+            GROUP BY a.codigo_producto, b.codigo_producto
+        """)
+        for codigo_a, codigo_b, conteo in cursor.fetchall():
+            self.pares.setdefault(codigo_a, {})[codigo_b] = conteo
+            self.pares.setdefault(codigo_b, {})[codigo_a] = conteo
+
+    def agregar_ticket(self, codigos):
+        """Suma un ticket con los códigos de producto indicados."""
+        codigos = set(codigos)
+        if not codigos:
+            return
+        self.total_tickets += 1
+        for codigo in codigos:
+            self.tickets_producto[codigo] = self.tickets_producto.get(codigo, 0) + 1
+            vecinos = self.pares.setdefault(codigo, {})
+            for otro in codigos:
+                if otro != codigo:
+                    vecinos[otro] = vecinos.get(otro, 0) + 1
+
+    def agregar_venta(self, venta):
+        """Suma una Venta completada."""
+        self.agregar_ticket(item['codigo'] for item in venta.get_items())
+
+    # --- CONSULTAS ---
+    def lift(self, codigo_a, codigo_b):
+        juntos = self.pares.get(codigo_a, {}).get(codigo_b, 0)
+        if not juntos:
+            return 0.0
+        return juntos * self.total_tickets / (self.tickets_producto[codigo_a] * self.tickets_producto[codigo_b])
+
+    def vecinos(self, codigo, n=5):
+        """Los n productos con mayor lift respecto a 'codigo': [(codigo, lift, tickets juntos)]."""
+        return self.sugerencias([codigo], n)
+
+    def sugerencias(self, codigos_carrito, n=3):
+        """
+        Productos a sugerir para un carrito: para cada candidato se toma el
+        mayor lift con algún producto del carrito. Sólo recorre los vecinos
+        de los productos del carrito.
+        """
+        en_carrito = set(codigos_carrito)
+        candidatos = {}
+        total = self.total_tickets
+        for codigo in en_carrito:
+            vecinos = self.pares.get(codigo)
+            if not vecinos:
+                continue
+            tickets_codigo = self.tickets_producto[codigo]
+            for otro, juntos in vecinos.items():
+                if otro in en_carrito or juntos < self.soporte_minimo:
+                    continue
+                lift = juntos * total / (tickets_codigo * self.tickets_producto[otro])
+                if lift > candidatos.get(otro, (0.0, 0))[0]:
+                    candidatos[otro] = (lift, juntos)
+        # Sólo asociaciones positivas (lift > 1) compiten por los n lugares
+        positivos = [(otro, datos) for otro, datos in candidatos.items() if datos[0] > 1.0]
+        mejores = heapq.nlargest(n, positivos, key=lambda c: c[1])
+        return [(otro, round(lift, 2), juntos) for otro, (lift, juntos) in mejores]
@@ -0,0 +1,259 @@
+"""
+ARCHIVO SEGMENTADO DE TICKETS - CAFETERÍA
+Tickets agregados a segmentos de solo-anexar con índice numero_venta → (segmento, offset)
+Autor: Sistema de Ventas
+Fecha: Octubre 2026
+"""
+
+import mmap
+import os
+import re
+import struct
+import threading
+import zlib
+
+# ============================================================
+# FORMATO EN DISCO
+# ============================================================
+#
+#   segmento_000001.tks   registros: [encabezado][contenido]
+#       encabezado = MAGIA (4) | numero_venta (int64) | longitud (uint32) | banderas (uint8)
+#   indice.idx            entradas fijas de 24 bytes:
+#       numero_venta (int64) | segmento (uint32) | offset (uint64) | longitud (uint32)
+#
+# Si el programa se interrumpe entre la escritura del segmento y la del
+# índice, al abrir el archivo se recuperan los registros sin indexar.
+
+MAGIA = b"TKT1"
+ENCABEZADO = struct.Struct("<4sqIB")
+ENTRADA_INDICE = struct.Struct("<qIQI")
+BANDERA_ZLIB = 1
+
+NOMBRE_INDICE = "indice.idx"
+PATRON_SEGMENTO = re.compile(r"^segmento_(\d{6})\.tks$")
+PATRON_TICKET_SUELTO = re.compile(r"^ticket_(\d+)_\d{8}_\d{6}\.txt$")
+
+
+# ============================================================
+# CLASE ARCHIVO DE TICKETS
+# ============================================================
+
+class ArchivoTickets:
+    """
+    Archivo de tickets en segmentos rotativos de solo-anexar.
+    Reemplaza el archivo suelto por venta: cada ticket se agrega al segmento
+    activo y se registra en un índice compacto; la reimpresión es una
+    búsqueda en el diccionario y un corte sobre el segmento mapeado en memoria.
+    """
+
+    def __init__(self, carpeta="tickets", tamano_segmento=16 * 1024 * 1024, comprimir=False):
+        self.carpeta = carpeta
+        self.tamano_segmento = tamano_segmento
+        self.comprimir = comprimir
+        self._indice = {}      # numero_venta -> (segmento, offset)
+        self._mapas = {}       # segmento -> (mmap, tamaño mapeado, archivo)
+        self._lock = threading.Lock()
+
+        os.makedirs(carpeta, exist_ok=True)
+        self._ruta_indice = os.path.join(carpeta, NOMBRE_INDICE)
+        self._segmento_activo = max(self._segmentos_existentes(), default=1)
+        self._cargar_indice()
+
+    # --- RUTAS ---
+    def _ruta_segmento(self, segmento):
+        return os.path.join(self.carpeta, f"segmento_{segmento:06d}.tks")
+
+    def _segmentos_existentes(self):
+        segmentos = []
+        for nombre in os.listdir(self.carpeta):
+            coincidencia = PATRON_SEGMENTO.match(nombre)
+            if coincidencia:
+                segmentos.append(int(coincidencia.group(1)))
+        return sorted(segmentos)
+
+    # --- ÍNDICE ---
+    def _cargar_indice(self):
+        """Carga el índice y recupera registros que quedaron sin indexar."""
+        final_indexado = {}   # segmento -> fin del último registro indexado
+        if os.path.exists(self._ruta_indice):
+            with open(self._ruta_indice, "rb") as archivo:
+                datos = archivo.read()
+            completo = len(datos) - len(datos) % ENTRADA_INDICE.size
+            for numero, segmento, offset, longitud in ENTRADA_INDICE.iter_unpack(datos[:completo]):
+                self._indice[numero] = (segmento, offset)
+                fin = offset + ENCABEZADO.size + longitud
+                if fin > final_indexado.get(segmento, 0):
+                    final_indexado[segmento] = fin
+            if completo != len(datos):
+                # Entrada a medio escribir: se descarta
+                with open(self._ruta_indice, "r+b") as archivo:
+                    archivo.truncate(completo)
+
+        recuperados = []
+        for segmento in self._segmentos_existentes():
+            recuperados.extend(self._escanear(segmento, final_indexado.get(segmento, 0)))
+        if recuperados:
+            self._escribir_indice(recuperados)
+            print(f"✓ {len(recuperados)} tickets recuperados en el índice de '{self.carpeta}'")
+
+    def _escanear(self, segmento, desde):
+        """Lee los registros de un segmento a partir de un offset; trunca una cola incompleta."""
+        ruta = self._ruta_segmento(segmento)
+        tamano = os.path.getsize(ruta)
+        if desde >= tamano:
+            return []
+
+        entradas = []
+        with open(ruta, "rb") as archivo:
+            archivo.seek(desde)
+            offset = desde
+            while offset + ENCABEZADO.size <= tamano:
+                magia, numero, longitud, _ = ENCABEZADO.unpack(archivo.read(ENCABEZADO.size))
+                if magia != MAGIA or offset + ENCABEZADO.size + longitud > tamano:
+                    break
+                archivo.seek(longitud, os.SEEK_CUR)
+                entradas.append((numero, segmento, offset, longitud))
+                self._indice[numero] = (segmento, offset)
+                offset += ENCABEZADO.size + longitud
+
+        if offset < tamano:
+            with open(ruta, "r+b") as archivo:
+                archivo.truncate(offset)
+        return entradas
+
+    def _escribir_indice(self, entradas):
+        with open(self._ruta_indice, "ab") as archivo:
+            archivo.write(b"".join(ENTRADA_INDICE.pack(*entrada) for entrada in entradas))
+            archivo.flush()
+            os.fsync(archivo.fileno())
+
+    def reconstruir_indice(self):
+        """Regenera el índice completo recorriendo todos los segmentos."""
+        with self._lock:
+            self._cerrar_mapas()
+            self._indice.clear()
+            entradas = []
+            for segmento in self._segmentos_existentes():
+                entradas.extend(self._escanear(segmento, 0))
+            temporal = self._ruta_indice + ".tmp"
+            with open(temporal, "wb") as archivo:
+                archivo.write(b"".join(ENTRADA_INDICE.pack(*entrada) for entrada in entradas))
+                archivo.flush()
+                os.fsync(archivo.fileno())
+            os.replace(temporal, self._ruta_indice)
+        print(f"✓ Índice reconstruido: {len(entradas)} tickets")
+        return len(entradas)
+
+    # --- ESCRITURA ---
+    def agregar(self, numero_venta, texto):
+        """Agrega un ticket al archivo."""
+        self.agregar_lote([(numero_venta, texto)])
+
+    def agregar_lote(self, tickets):
+        """
+        Agrega varios tickets [(numero_venta, texto), ...] con un solo
+        fsync del segmento y uno del índice.
+        """
+        if not tickets:
+            return
+        with self._lock:
+            entradas = []
+            ruta = self._ruta_segmento(self._segmento_activo)
+            archivo = open(ruta, "ab")
+            try:
+                offset = archivo.tell()
+                for numero, texto in tickets:
+                    contenido = texto.encode("utf-8")
+                    banderas = 0
+                    if self.comprimir:
+                        contenido = zlib.compress(contenido)
+                        banderas |= BANDERA_ZLIB
+                    registro = ENCABEZADO.pack(MAGIA, numero, len(contenido), banderas) + contenido
+
+                    # Rotar el segmento si este registro lo haría pasar del límite
+                    if offset > 0 and offset + len(registro) > self.tamano_segmento:
+                        archivo.flush()
+                        os.fsync(archivo.fileno())
+                        archivo.close()
+                        self._segmento_activo += 1
+                        archivo = open(self._ruta_segmento(self._segmento_activo), "ab")
+                        offset = 0
+
+                    archivo.write(registro)
+                    entradas.append((numero, self._segmento_activo, offset, len(contenido)))
+                    offset += len(registro)
+                archivo.flush()
+                os.fsync(archivo.fileno())
+            finally:
+                archivo.close()
+
+            self._escribir_indice(entradas)
+            for numero, segmento, offset, _ in entradas:
+                self._indice[numero] = (segmento, offset)
+
+    def importar_archivos_sueltos(self, carpeta=None):
+        """Agrega al archivo los tickets sueltos 'ticket_<n>_<fecha>.txt' que aún no estén indexados."""
+        carpeta = carpeta or self.carpeta
+        pendientes = []
+        for nombre in sorted(os.listdir(carpeta)):
+            coincidencia = PATRON_TICKET_SUELTO.match(nombre)
+            if coincidencia and int(coincidencia.group(1)) not in self._indice:
+                with open(os.path.join(carpeta, nombre), "r", encoding="utf-8") as archivo:
+                    pendientes.append((int(coincidencia.group(1)), archivo.read()))
+        self.agregar_lote(pendientes)
+        print(f"✓ {len(pendientes)} tickets sueltos importados al archivo")
+        return len(pendientes)
+
+    # --- LECTURA ---
+    def _mapa(self, segmento, fin_requerido):
+        """Devuelve el mmap de un segmento, remapeando si el segmento creció."""
+        actual = self._mapas.get(segmento)
+        if actual and actual[1] >= fin_requerido:
+            return actual[0]
+        if actual:
+            actual[0].close()
+            actual[2].close()
+        archivo = open(self._ruta_segmento(segmento), "rb")
+        mapa = mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ)
+        self._mapas[segmento] = (mapa, len(mapa), archivo)
+        return mapa
+
+    def leer(self, numero_venta):
+        """Devuelve el texto del ticket, o None si no está archivado."""
+        with self._lock:
+            ubicacion = self._indice.get(numero_venta)
+            if ubicacion is None:
+                return None
+            segmento, offset = ubicacion
+            mapa = self._mapa(segmento, offset + ENCABEZADO.size)
+            magia, numero, longitud, banderas = ENCABEZADO.unpack_from(mapa, offset)
+            inicio = offset + ENCABEZADO.size
+            if inicio + longitud > len(mapa):
+                mapa = self._mapa(segmento, inicio + longitud)
+            contenido = mapa[inicio:inicio + longitud]
+
+        if magia != MAGIA or numero != numero_venta:
+            print(f"✗ Registro dañado para el ticket #{numero_venta}")
+            return None
+        if banderas & BANDERA_ZLIB:
+            contenido = zlib.decompress(contenido)
+        return contenido.decode("utf-8")
+
+    def contiene(self, numero_venta):
+        return numero_venta in self._indice
+
+    def cantidad(self):
+        """Número de tickets indexados."""
+        return len(self._indice)
+
+    # --- CIERRE ---
+    def _cerrar_mapas(self):
+        for mapa, _, archivo in self._mapas.values():
+            mapa.close()
+            archivo.close()
+        self._mapas.clear()
+
+    def cerrar(self):
+        """Libera los segmentos mapeados en memoria."""
+        with self._lock:
+            self._cerrar_mapas()
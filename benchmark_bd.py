@@ -0,0 +1,257 @@
+"""
+BENCHMARK DE BASE DE DATOS - CAFETERÍA
+  perfiles  Ventas guardadas por segundo con cada perfil de PRAGMA (database.PERFILES_PRAGMA)
+            bajo una carga de cobro: varios cajeros en hilos distintos guardando ventas de 3 productos.
+  grupo     Lo mismo, comparando guardar cada venta en su transacción contra la
+            escritura diferida con group commit (database.EscritorVentas).
+  indices   Tiempo de las consultas de reportes sobre una base sintética, sin y con
+            los índices de migraciones.INDICES.
+Las latencias van desde que el cajero pide guardar la venta hasta el COMMIT.
+
+Uso:
+    python benchmark_bd.py [perfiles] [ventas_por_cajero] [cajeros]
+    python benchmark_bd.py grupo [ventas_por_cajero] [cajeros]
+    python benchmark_bd.py indices [ventas]
+Autor: Sistema de Ventas
+Fecha: Octubre 2026
+"""
+
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from database import PERFILES_PRAGMA, AsignadorNumeros, BaseDatos
+from migraciones import INDICES, reconstruir_resumen_diario, reconstruir_ventas_producto
+from sistema_gestion_productos import Producto
+from sistema_ventas_cafeteria import Venta
+
+CATALOGO = [
+    ("BEN001", "Café Americano", 8.0, 25.0, "Bebidas Calientes"),
+    ("BEN002", "Capuchino", 10.0, 35.0, "Bebidas Calientes"),
+    ("BEN003", "Croissant", 7.0, 22.0, "Panadería"),
+    ("BEN004", "Jugo de Naranja", 9.0, 30.0, "Bebidas Frías"),
+    ("BEN005", "Sándwich", 15.0, 45.0, "Comida"),
+]
+
+
+def _catalogo(stock):
+    return [Producto(codigo, nombre, costo, precio, stock, categoria)
+            for codigo, nombre, costo, precio, categoria in CATALOGO]
+
+
+def _cajero(db, nombre, ventas, latencias):
+    """
+    Cobra 'ventas' tickets de 3 productos y espera a que cada uno quede
+    confirmado antes del siguiente; cada hilo usa su propia conexión.
+    """
+    productos = _catalogo(ventas * 10)
+    for i in range(ventas):
+        venta = Venta(nombre)
+        for j in range(3):
+            venta.agregar_item(productos[(i + j) % len(productos)], 1 + j % 2)
+        venta.completar_venta()
+        inicio = time.perf_counter()
+        db.encolar_venta(venta).result()
+        latencias.append(time.perf_counter() - inicio)
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+
+def medir_perfil(perfil, ventas_por_cajero=200, cajeros=4, diferida=False):
+    """
+    Guarda ventas_por_cajero × cajeros ventas sobre una base nueva.
+    Devuelve (segundos, ventas por segundo, latencia p50 ms, latencia p99 ms).
+    """
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, "benchmark.db")
+        with contextlib.redirect_stdout(io.StringIO()):
+            db = BaseDatos(ruta, perfil)
+            db.conectar()
+            db.crear_tablas()
+            for producto in _catalogo(ventas_por_cajero * cajeros * 10):
+                db.insertar_producto(producto)
+            Venta.asignador_numeros = AsignadorNumeros(ruta)
+            if diferida:
+                db.activar_escritura_diferida()
+
+            latencias = []
+            hilos = [threading.Thread(target=_cajero, args=(db, f"Cajero {n}", ventas_por_cajero, latencias))
+                     for n in range(cajeros)]
+            inicio = time.perf_counter()
+            for hilo in hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+            segundos = time.perf_counter() - inicio
+
+            guardadas = db.resumen_historial()["cantidad"]
+            db.cerrar()
+            Venta.asignador_numeros = None
+
+    esperadas = ventas_por_cajero * cajeros
+    if guardadas != esperadas:
+        print(f"⚠️  Perfil '{perfil}': se guardaron {guardadas} de {esperadas} ventas")
+    return (segundos, esperadas / segundos,
+            _percentil(latencias, 50) * 1000, _percentil(latencias, 99) * 1000)
+
+
+def _generar_ventas(db, ventas, dias=365, seed=7):
+    """Llena la base con 'ventas' tickets sintéticos de 1 a 4 productos repartidos en 'dias'."""
+    azar = random.Random(seed)
+    cajeros = [f"Cajero {n}" for n in range(4)]
+    inicio = datetime(2026, 1, 1, 7)
+    paso = timedelta(days=dias) / ventas
+    detalle = []
+
+    def filas_ventas():
+        for i in range(ventas):
+            numero = 1001 + i
+            fecha = (inicio + paso * i).strftime("%Y-%m-%d %H:%M:%S")
+            total = ganancia = 0.0
+            for codigo, nombre, costo, precio, _ in azar.sample(CATALOGO, azar.randint(1, 4)):
+                cantidad = azar.randint(1, 3)
+                total += cantidad * precio
+                ganancia += cantidad * (precio - costo)
+                detalle.append((numero, codigo, nombre, cantidad, precio,
+                                cantidad * precio, cantidad * (precio - costo)))
+            estado = "Cancelada" if i % 50 == 0 else "Completada"
+            yield numero, fecha, azar.choice(cajeros), total, ganancia, estado
+
+    cur = db.cursor
+    cur.executemany("""
+        INSERT INTO ventas (numero_venta, fecha, cajero, total, ganancia, estado)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, filas_ventas())
+    cur.executemany("""
+        INSERT INTO detalle_ventas (numero_venta, codigo_producto, nombre_producto, cantidad,
+                                    precio_unitario, subtotal, ganancia_item)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, detalle)
+    reconstruir_resumen_diario(db.conexion)
+    reconstruir_ventas_producto(db.conexion)
+    db.conexion.commit()
+    return len(detalle)
+
+
+def _consultas(db, ventas):
+    """Consultas de BaseDatos que usan los reportes, con parámetros dentro de los datos sintéticos."""
+    dia = "2026-06-15"
+    medio = 1001 + ventas // 2
+    return [
+        ("obtener_ventas_del_dia", lambda: db.obtener_ventas_del_dia(dia)),
+        ("resumen_del_dia", lambda: db.resumen_del_dia(dia)),
+        ("obtener_detalle_venta", lambda: db.obtener_detalle_venta(medio)),
+        ("obtener_detalles_ventas(50)", lambda: db.obtener_detalles_ventas(list(range(medio, medio + 50)))),
+        ("ventas_paginadas rango", lambda: db.obtener_ventas_paginadas(200, desde=f"{dia} 00:00:00",
+                                                                          hasta=f"{dia} 23:59:59")),
+        ("ventas_paginadas cajero", lambda: db.obtener_ventas_paginadas(200, despues_de=(f"{dia} 12:00:00", 0),
+                                                                           cajero="Cajero 2")),
+        ("resumen_historial", db.resumen_historial),
+        ("productos_mas_vendidos", db.reporte_productos_mas_vendidos),
+        ("productos_mas_vendidos mes", lambda: db.reporte_productos_mas_vendidos(desde="2026-06-01",
+                                                                                 hasta="2026-06-30")),
+        ("totales_por_producto", db.totales_por_producto),
+    ]
+
+
+def _cronometrar(funcion, repeticiones=3):
+    """Mejor tiempo (ms) de varias ejecuciones."""
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor * 1000
+
+
+def medir_indices(ventas=1_000_000):
+    """Tiempos (ms) de cada consulta sin y con índices: [(consulta, antes, después)]."""
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, "benchmark.db")
+        with contextlib.redirect_stdout(io.StringIO()):
+            db = BaseDatos(ruta, "rapido")
+            db.conectar()
+            db.crear_tablas()
+            for nombre in INDICES:
+                db.conexion.execute(f"DROP INDEX {nombre}")
+        inicio = time.perf_counter()
+        lineas = _generar_ventas(db, ventas)
+        print(f"Base sintética: {ventas:,} ventas, {lineas:,} líneas de detalle "
+              f"({time.perf_counter() - inicio:.1f} s)")
+
+        consultas = _consultas(db, ventas)
+        antes = [_cronometrar(funcion) for _, funcion in consultas]
+
+        inicio = time.perf_counter()
+        for nombre, definicion in INDICES.items():
+            db.conexion.execute(f"CREATE INDEX {nombre} ON {definicion}")
+        db.conexion.execute("ANALYZE")
+        print(f"Índices creados en {time.perf_counter() - inicio:.1f} s")
+        despues = [_cronometrar(funcion) for _, funcion in consultas]
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            db.cerrar()
+    return [(nombre, a, d) for (nombre, _), a, d in zip(consultas, antes, despues)]
+
+
+def main_indices(ventas):
+    print("\n" + "="*60)
+    print(f"BENCHMARK DE ÍNDICES - {ventas:,} ventas")
+    print("="*60)
+    resultados = medir_indices(ventas)
+    print(f"{'Consulta':<30}{'Sin índices':>12}{'Con índices':>12}{'×':>6}")
+    print("-"*60)
+    for nombre, antes, despues in resultados:
+        print(f"{nombre:<30}{antes:>10.1f}ms{despues:>10.1f}ms{antes / despues:>6.0f}")
+    print("="*60 + "\n")
+
+
+def main_grupo(ventas_por_cajero, cajeros):
+    print("\n" + "="*70)
+    print(f"BENCHMARK DE GROUP COMMIT - {cajeros} cajeros × {ventas_por_cajero} ventas")
+    print("="*70)
+    print(f"{'Perfil':<14}{'Escritura':<11}{'Segundos':>9}{'Ventas/s':>12}{'p50 ms':>10}{'p99 ms':>10}")
+    print("-"*70)
+    for perfil in PERFILES_PRAGMA:
+        for diferida in (False, True):
+            segundos, por_segundo, p50, p99 = medir_perfil(perfil, ventas_por_cajero, cajeros, diferida)
+            print(f"{perfil:<14}{'grupo' if diferida else 'directa':<11}{segundos:>9.2f}"
+                  f"{por_segundo:>12,.0f}{p50:>10.2f}{p99:>10.2f}")
+    print("="*70 + "\n")
+
+
+def main():
+    argumentos = sys.argv[1:]
+    modo = argumentos.pop(0) if argumentos and not argumentos[0].isdigit() else "perfiles"
+    if modo == "indices":
+        main_indices(int(argumentos[0]) if argumentos else 1_000_000)
+        return
+
+    ventas_por_cajero = int(argumentos[0]) if len(argumentos) > 0 else 200
+    cajeros = int(argumentos[1]) if len(argumentos) > 1 else 4
+    if modo == "grupo":
+        main_grupo(ventas_por_cajero, cajeros)
+        return
+
+    print("\n" + "="*66)
+    print(f"BENCHMARK DE PERFILES - {cajeros} cajeros × {ventas_por_cajero} ventas")
+    print("="*66)
+    print(f"{'Perfil':<14}{'Segundos':>10}{'Ventas/s':>12}{'p50 ms':>10}{'p99 ms':>10}")
+    print("-"*66)
+    for perfil in PERFILES_PRAGMA:
+        segundos, por_segundo, p50, p99 = medir_perfil(perfil, ventas_por_cajero, cajeros)
+        print(f"{perfil:<14}{segundos:>10.2f}{por_segundo:>12,.0f}{p50:>10.2f}{p99:>10.2f}")
+    print("="*66 + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,10 +5,20 @@ Autor: Sistema de Ventas
 Versión: 1.0.0
 """
 
+import csv
 import sqlite3
 import os
+import queue
+import threading
+import time
+import atexit
+from concurrent.futures import Future
 from datetime import datetime
 
+from migraciones import (MIGRACIONES_CAFETERIA, TABLA_LOG_ACTIVIDADES, migrar,
+                         reconstruir_resumen_diario, reconstruir_ventas_producto,
+                         acumular_ventas_producto)
+
 
 # ============================================================
 # CONFIGURACIÓN DE LA BASE DE DATOS
@@ -16,32 +26,144 @@ from datetime import datetime
 
 DB_PATH = "cafeteria.db"  # Archivo de base de datos (se crea automáticamente)
 
+# Perfiles de PRAGMA seleccionables desde config.json ("base_datos.perfil_pragma")
+#   seguro       valores por defecto de SQLite: diario de rollback y fsync completo por commit
+#   equilibrado  WAL + synchronous NORMAL: un commit no espera al disco, el checkpoint sí;
+#                ante un corte de luz se pueden perder las últimas transacciones, nunca se corrompe
+#   rapido       WAL sin fsync y cachés grandes; sólo para cargas masivas o pruebas
+PERFILES_PRAGMA = {
+    "seguro": {
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+        "busy_timeout": 5000,
+    },
+    "equilibrado": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -16000,           # KiB (16 MB)
+        "mmap_size": 64 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+    "rapido": {
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "cache_size": -64000,           # KiB (64 MB)
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+}
+PERFIL_POR_DEFECTO = "equilibrado"
+
+def rango_fecha(prefijo):
+    """
+    Rango [inicio, fin) de las fechas 'YYYY-MM-DD HH:MM:SS' que empiezan con
+    'prefijo' ('2026-10-19', '2026-10', ...). A diferencia de LIKE 'prefijo%',
+    la comparación por rango sí usa los índices sobre fecha.
+    """
+    return prefijo, prefijo[:-1] + chr(ord(prefijo[-1]) + 1)
+
+
+# ============================================================
+# GESTOR DE CONEXIONES
+# ============================================================
+
+class GestorConexiones:
+    """
+    Entrega una conexión SQLite por hilo, configurada con un perfil de PRAGMA.
+    Cada hilo reutiliza su propia conexión, así que las consultas de un hilo
+    nunca pisan los resultados de otro.
+    """
+
+    def __init__(self, ruta_db=DB_PATH, perfil=PERFIL_POR_DEFECTO, pragmas=None):
+        if perfil not in PERFILES_PRAGMA:
+            print(f"⚠️  Perfil de base de datos '{perfil}' desconocido; se usa '{PERFIL_POR_DEFECTO}'")
+            perfil = PERFIL_POR_DEFECTO
+        self.ruta_db = ruta_db
+        self.perfil = perfil
+        self.pragmas = dict(PERFILES_PRAGMA[perfil], **(pragmas or {}))
+        self._local = threading.local()
+        self._conexiones = []
+        self._lock = threading.Lock()
+
+    def _abrir(self):
+        # check_same_thread=False sólo para poder cerrarlas todas desde cerrar();
+        # cada conexión la usa únicamente el hilo que la abrió
+        conexion = sqlite3.connect(self.ruta_db, check_same_thread=False)
+        conexion.row_factory = sqlite3.Row  # Permite acceder por nombre de columna
+        for nombre, valor in self.pragmas.items():
+            conexion.execute(f"PRAGMA {nombre} = {valor}")
+        return conexion
+
+    def conexion(self):
+        """Conexión del hilo actual (se abre en el primer uso)."""
+        conexion = getattr(self._local, "conexion", None)
+        if conexion is None:
+            conexion = self._local.conexion = self._abrir()
+            with self._lock:
+                self._conexiones.append(conexion)
+        return conexion
+
+    def cursor(self):
+        """Cursor nuevo sobre la conexión del hilo actual."""
+        return self.conexion().cursor()
+
+    def cerrar(self):
+        """Cierra las conexiones de todos los hilos."""
+        with self._lock:
+            for conexion in self._conexiones:
+                conexion.close()
+            self._conexiones.clear()
+        self._local = threading.local()
+
 
 # ============================================================
 # CLASE PRINCIPAL DE BASE DE DATOS
 # ============================================================
 
 class BaseDatos:
-    """Maneja todas las operaciones con la base de datos SQLite."""
+    """
+    Maneja todas las operaciones con la base de datos SQLite.
+    Cada hilo trabaja con su propia conexión (GestorConexiones) y cada
+    método usa su propio cursor.
+    """
 
-    def __init__(self, ruta_db=DB_PATH):
+    def __init__(self, ruta_db=DB_PATH, perfil=PERFIL_POR_DEFECTO):
         self.ruta_db = ruta_db
-        self.conexion = None
-        self.cursor = None
+        self.perfil = perfil
+        self.conexiones = None
+        self.escritor = None  # EscritorVentas opcional (activar_escritura_diferida)
+        self.registro = None  # RegistroActividades opcional (activar_registro_actividades)
+
+    @property
+    def conexion(self):
+        """Conexión del hilo actual."""
+        return self.conexiones.conexion() if self.conexiones else None
+
+    @property
+    def cursor(self):
+        """Cursor nuevo en cada acceso (no se comparte entre consultas)."""
+        return self.conexiones.cursor()
 
     def conectar(self):
         """Abre la conexión a la base de datos."""
-        self.conexion = sqlite3.connect(self.ruta_db)
-        self.conexion.row_factory = sqlite3.Row  # Permite acceder por nombre de columna
-        self.cursor = self.conexion.cursor()
-        print(f"✓ Conectado a la base de datos: {self.ruta_db}")
+        self.conexiones = GestorConexiones(self.ruta_db, self.perfil)
+        self.perfil = self.conexiones.perfil
+        self.conexiones.conexion()
+        print(f"✓ Conectado a la base de datos: {self.ruta_db} (perfil '{self.perfil}')")
 
     def cerrar(self):
         """Cierra la conexión a la base de datos."""
-        if self.conexion:
-            self.conexion.close()
-            self.conexion = None
-            self.cursor = None
+        if self.escritor:
+            self.escritor.cerrar()  # Confirma las ventas que sigan en cola
+            self.escritor = None
+        if self.registro:
+            self.registro.cerrar()  # Escribe las actividades que sigan en cola
+            self.registro = None
+        if self.conexiones:
+            self.conexiones.cerrar()
+            self.conexiones = None
             print("✓ Conexión cerrada")
 
     def __enter__(self):
@@ -62,65 +184,12 @@ class BaseDatos:
     # ============================================================
 
     def crear_tablas(self):
-        """Crea todas las tablas necesarias si no existen."""
-        
-        # Tabla de Productos
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS productos (
-                codigo       TEXT PRIMARY KEY,
-                nombre       TEXT NOT NULL,
-                costo        REAL NOT NULL DEFAULT 0,
-                precio_venta REAL NOT NULL DEFAULT 0,
-                stock        INTEGER NOT NULL DEFAULT 0,
-                categoria    TEXT NOT NULL DEFAULT 'General',
-                activo       INTEGER NOT NULL DEFAULT 1,
-                fecha_alta   TEXT NOT NULL
-            )
-        """)
-
-        # Tabla de Ventas
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS ventas (
-                id           INTEGER PRIMARY KEY AUTOINCREMENT,
-                numero_venta INTEGER UNIQUE NOT NULL,
-                fecha        TEXT NOT NULL,
-                cajero       TEXT NOT NULL,
-                total        REAL NOT NULL DEFAULT 0,
-                ganancia     REAL NOT NULL DEFAULT 0,
-                descuento    REAL NOT NULL DEFAULT 0,
-                estado       TEXT NOT NULL DEFAULT 'Completada'
-            )
-        """)
-
-        # Tabla de Detalle de Ventas (items del carrito)
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS detalle_ventas (
-                id               INTEGER PRIMARY KEY AUTOINCREMENT,
-                numero_venta     INTEGER NOT NULL,
-                codigo_producto  TEXT NOT NULL,
-                nombre_producto  TEXT NOT NULL,
-                cantidad         INTEGER NOT NULL,
-                precio_unitario  REAL NOT NULL,
-                subtotal         REAL NOT NULL,
-                ganancia_item    REAL NOT NULL,
-                FOREIGN KEY (numero_venta) REFERENCES ventas(numero_venta),
-                FOREIGN KEY (codigo_producto) REFERENCES productos(codigo)
-            )
-        """)
-
-        # Tabla de Log de Actividades
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS log_actividades (
-                id          INTEGER PRIMARY KEY AUTOINCREMENT,
-                fecha       TEXT NOT NULL,
-                tipo        TEXT NOT NULL,
-                descripcion TEXT NOT NULL,
-                usuario     TEXT DEFAULT 'Sistema'
-            )
-        """)
-
-        self.conexion.commit()
-        print("✓ Tablas creadas / verificadas correctamente")
+        """
+        Crea o actualiza el esquema aplicando las migraciones pendientes
+        (migraciones.py). Si la base ya está al día no se escribe nada.
+        """
+        version = migrar(self.conexion, MIGRACIONES_CAFETERIA, self.ruta_db)
+        print(f"✓ Tablas creadas / verificadas correctamente (esquema v{version})")
 
     # ============================================================
     # OPERACIONES CON PRODUCTOS
@@ -128,8 +197,9 @@ class BaseDatos:
 
     def insertar_producto(self, producto):
         """Inserta un nuevo producto en la base de datos."""
+        cur = self.conexion.cursor()
         try:
-            self.cursor.execute("""
+            cur.execute("""
                 INSERT INTO productos (codigo, nombre, costo, precio_venta, stock, categoria, fecha_alta)
                 VALUES (?, ?, ?, ?, ?, ?, ?)
             """, (
@@ -142,6 +212,7 @@ class BaseDatos:
                 datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             ))
             self.conexion.commit()
+            self._registrar("PRODUCTO", f"Alta de {producto.get_codigo()} ({producto.get_nombre()})")
             return True
         except sqlite3.IntegrityError:
             print(f"⚠️  El producto '{producto.get_codigo()}' ya existe en la base de datos")
@@ -152,90 +223,163 @@ class BaseDatos:
 
     def actualizar_stock(self, codigo, nuevo_stock):
         """Actualiza el stock de un producto."""
-        self.cursor.execute(
+        cur = self.conexion.cursor()
+        cur.execute(
             "UPDATE productos SET stock = ? WHERE codigo = ?",
             (nuevo_stock, codigo)
         )
         self.conexion.commit()
+        self._registrar("INVENTARIO", f"Stock de {codigo}: {nuevo_stock}")
 
     def actualizar_precio(self, codigo, nuevo_precio):
         """Actualiza el precio de venta de un producto."""
-        self.cursor.execute(
+        cur = self.conexion.cursor()
+        cur.execute(
             "UPDATE productos SET precio_venta = ? WHERE codigo = ?",
             (nuevo_precio, codigo)
         )
         self.conexion.commit()
+        self._registrar("PRODUCTO", f"Precio de {codigo}: ${nuevo_precio:.2f}")
 
     def obtener_producto(self, codigo):
         """Obtiene un producto por su código."""
-        self.cursor.execute(
+        cur = self.conexion.cursor()
+        cur.execute(
             "SELECT * FROM productos WHERE codigo = ? AND activo = 1",
             (codigo,)
         )
-        return self.cursor.fetchone()
+        return cur.fetchone()
 
     def obtener_todos_productos(self):
         """Obtiene todos los productos activos."""
-        self.cursor.execute(
+        cur = self.conexion.cursor()
+        cur.execute(
             "SELECT * FROM productos WHERE activo = 1 ORDER BY categoria, nombre"
         )
-        return self.cursor.fetchall()
+        return cur.fetchall()
 
     def obtener_productos_por_categoria(self, categoria):
         """Obtiene productos filtrados por categoría."""
-        self.cursor.execute(
+        cur = self.conexion.cursor()
+        cur.execute(
             "SELECT * FROM productos WHERE categoria = ? AND activo = 1 ORDER BY nombre",
             (categoria,)
         )
-        return self.cursor.fetchall()
+        return cur.fetchall()
 
     def obtener_productos_stock_bajo(self, minimo=10):
         """Obtiene productos con stock por debajo del mínimo."""
-        self.cursor.execute(
+        cur = self.conexion.cursor()
+        cur.execute(
             "SELECT * FROM productos WHERE stock <= ? AND activo = 1 ORDER BY stock ASC",
             (minimo,)
         )
-        return self.cursor.fetchall()
+        return cur.fetchall()
 
-    def sincronizar_productos_desde_gestor(self, gestor_productos):
+    def guardar_productos(self, productos):
         """
-        Sincroniza todos los productos del GestorProductos a la base de datos.
-        Si ya existen, actualiza stock y precio. Si no, los inserta.
+        Guarda una lista de productos: inserta los nuevos y actualiza stock,
+        precio y costo de los existentes. Un solo executemany con UPSERT en
+        una transacción; las filas que no cambiaron no se reescriben.
+        Retorna (insertados, actualizados), o None si hubo un error.
         """
-        insertados = 0
-        actualizados = 0
+        if self.escritor:
+            # El stock absoluto debe escribirse después de las ventas en cola
+            self.escritor.vaciar()
+        cur = self.conexion.cursor()
+        cur.execute("SELECT COUNT(*) FROM productos")
+        antes = cur.fetchone()[0]
+        ahora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-        for producto in gestor_productos.productos:
-            existente = self.obtener_producto(producto.get_codigo())
-            if existente:
-                # Actualizar stock y precio
-                self.cursor.execute("""
-                    UPDATE productos SET stock = ?, precio_venta = ?, costo = ? WHERE codigo = ?
-                """, (
-                    producto.get_stock(),
-                    producto.get_precio_venta(),
-                    producto.get_costo(),
-                    producto.get_codigo()
-                ))
-                actualizados += 1
-            else:
-                self.insertar_producto(producto)
-                insertados += 1
+        try:
+            cur.executemany("""
+                INSERT INTO productos (codigo, nombre, costo, precio_venta, stock, categoria, fecha_alta)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(codigo) DO UPDATE SET
+                    stock        = excluded.stock,
+                    precio_venta = excluded.precio_venta,
+                    costo        = excluded.costo
+                WHERE stock IS NOT excluded.stock
+                   OR precio_venta IS NOT excluded.precio_venta
+                   OR costo IS NOT excluded.costo
+            """, [(
+                producto.get_codigo(),
+                producto.get_nombre(),
+                producto.get_costo(),
+                producto.get_precio_venta(),
+                producto.get_stock(),
+                producto.get_categoria(),
+                ahora
+            ) for producto in productos])
+            modificados = cur.rowcount  # insertadas + actualizadas (las iguales no cuentan)
+            cur.execute("SELECT COUNT(*) FROM productos")
+            insertados = cur.fetchone()[0] - antes
+            self.conexion.commit()
+        except Exception as e:
+            print(f"✗ Error al guardar productos: {e}")
+            self.conexion.rollback()
+            return None
+        if modificados:
+            self._registrar("INVENTARIO", f"Productos guardados: {insertados} nuevos, "
+                                          f"{modificados - insertados} actualizados")
+        return insertados, modificados - insertados
 
+    def insertar_productos_faltantes(self, productos):
+        """
+        Inserta sólo los productos que aún no están en la base de datos (los
+        existentes conservan su stock y precio). Retorna cuántos se insertaron.
+        """
+        cur = self.conexion.cursor()
+        ahora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        cur.executemany("""
+            INSERT INTO productos (codigo, nombre, costo, precio_venta, stock, categoria, fecha_alta)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(codigo) DO NOTHING
+        """, [(
+            producto.get_codigo(),
+            producto.get_nombre(),
+            producto.get_costo(),
+            producto.get_precio_venta(),
+            producto.get_stock(),
+            producto.get_categoria(),
+            ahora
+        ) for producto in productos])
         self.conexion.commit()
+        return cur.rowcount
+
+    def sincronizar_productos_desde_gestor(self, gestor_productos):
+        """
+        Sincroniza todos los productos del GestorProductos a la base de datos.
+        Si ya existen, actualiza stock, precio y costo. Si no, los inserta.
+        (Para guardar sólo lo modificado: gestor_productos.persistir_cambios(db).)
+        """
+        resultado = self.guardar_productos(gestor_productos.productos)
+        if resultado is None:
+            return
+        insertados, actualizados = resultado
+        gestor_productos.limpiar_cambios()
         print(f"✓ Sincronización: {insertados} insertados, {actualizados} actualizados")
 
     def sincronizar_stock_a_gestor(self, gestor_productos):
         """
         Carga el stock guardado en la BD hacia los objetos Producto en memoria.
         Útil para restaurar el stock al iniciar el sistema.
+        Lee la tabla completa en una consulta y la cruza en memoria con el catálogo.
+        Los productos que no están en la BD conservan sus cambios pendientes.
         """
+        cur = self.conexion.cursor()
+        cur.execute("SELECT codigo, stock, precio_venta FROM productos")
+        guardados = {codigo: (stock, precio) for codigo, stock, precio in cur.fetchall()}
+
+        sincronizados = []
         for producto in gestor_productos.productos:
-            fila = self.obtener_producto(producto.get_codigo())
+            fila = guardados.get(producto.get_codigo())
             if fila:
-                producto.set_stock(fila["stock"])
-                producto.set_precio_venta(fila["precio_venta"])
-        print("✓ Stock y precios restaurados desde la base de datos")
+                producto.restaurar_guardado(*fila)
+                sincronizados.append(producto)
+        # Sólo lo sincronizado coincide ahora con la BD
+        gestor_productos.marcar_guardados(sincronizados)
+        print(f"✓ Stock y precios de {len(sincronizados)} productos restaurados desde la base de datos")
 
     # ============================================================
     # OPERACIONES CON VENTAS
@@ -247,43 +391,10 @@ class BaseDatos:
         Inserta en ventas y en detalle_ventas.
         """
         try:
-            # Insertar cabecera de venta
-            self.cursor.execute("""
-                INSERT INTO ventas (numero_venta, fecha, cajero, total, ganancia, estado)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (
-                venta.get_numero_venta(),
-                venta.get_fecha().strftime("%Y-%m-%d %H:%M:%S"),
-                venta.get_cajero(),
-                venta.get_total(),
-                venta.get_ganancia_total(),
-                venta.get_estado()
-            ))
-
-            # Insertar detalle (items del carrito)
-            for item in venta.get_items():
-                self.cursor.execute("""
-                    INSERT INTO detalle_ventas
-                        (numero_venta, codigo_producto, nombre_producto, cantidad,
-                         precio_unitario, subtotal, ganancia_item)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    venta.get_numero_venta(),
-                    item["codigo"],
-                    item["nombre"],
-                    item["cantidad"],
-                    item["precio_unitario"],
-                    item["subtotal"],
-                    item["ganancia_item"]
-                ))
-
-                # Actualizar stock del producto en la BD
-                self.cursor.execute("""
-                    UPDATE productos SET stock = stock - ? WHERE codigo = ?
-                """, (item["cantidad"], item["codigo"]))
-
+            self._insertar_venta(self.conexion.cursor(), venta)
             self.conexion.commit()
             print(f"✓ Venta #{venta.get_numero_venta()} guardada en la base de datos")
+            self._registrar_venta(venta)
             return True
 
         except sqlite3.IntegrityError:
@@ -295,84 +406,442 @@ class BaseDatos:
             self.conexion.rollback()
             return False
 
+    def encolar_venta(self, venta):
+        """
+        Guarda una venta y devuelve un Future que se resuelve (True/False)
+        cuando la venta quedó confirmada en la base de datos.
+        Con escritura diferida activa, la venta se agrupa con otras en una
+        sola transacción (EscritorVentas); si no, se guarda en el acto.
+        La durabilidad la garantiza el Future, no esta llamada: sólo con
+        result() en True la venta está guardada. Un fallo llega como False o
+        como excepción del Future (SistemaPOS.confirmar_guardado lo atiende).
+        """
+        if self.escritor:
+            return self.escritor.encolar(venta)
+        resultado = Future()
+        resultado.set_result(self.guardar_venta(venta))
+        return resultado
+
+    def activar_escritura_diferida(self, ventana_ms=2, lote_maximo=64, capacidad=1024):
+        """Agrupa las ventas de encolar_venta en transacciones compartidas."""
+        if not self.escritor:
+            self.escritor = EscritorVentas(self, ventana_ms, lote_maximo, capacidad)
+        return self.escritor
+
+    def _registrar_venta(self, venta):
+        self._registrar("VENTA", f"Venta #{venta.get_numero_venta()} por ${venta.get_total():.2f} "
+                                 f"({venta.get_estado()})", venta.get_cajero())
+
+    def _insertar_venta(self, cur, venta):
+        """Sentencias de una venta (sin commit): cabecera, detalle, stock y totales del cajero."""
+        # Insertar cabecera de venta
+        cur.execute("""
+            INSERT INTO ventas (numero_venta, fecha, cajero, total, ganancia, descuento, estado)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (
+            venta.get_numero_venta(),
+            venta.get_fecha().strftime("%Y-%m-%d %H:%M:%S"),
+            venta.get_cajero(),
+            venta.get_total(),
+            venta.get_ganancia_total(),
+            venta.get_descuento(),
+            venta.get_estado()
+        ))
+
+        # Insertar detalle (items del carrito) en una sola llamada
+        cur.executemany("""
+            INSERT INTO detalle_ventas
+                (numero_venta, codigo_producto, nombre_producto, cantidad,
+                 precio_unitario, subtotal, ganancia_item)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, [(
+            venta.get_numero_venta(),
+            item["codigo"],
+            item["nombre"],
+            item["cantidad"],
+            item["precio_unitario"],
+            item["subtotal"],
+            item["ganancia_item"]
+        ) for item in venta.get_items()])
+
+        # Descontar el stock de todos los productos de la venta con una sola sentencia
+        cur.execute("""
+            UPDATE productos SET stock = stock - d.cantidad
+            FROM (
+                SELECT codigo_producto, SUM(cantidad) AS cantidad
+                FROM detalle_ventas
+                WHERE numero_venta = ?
+                GROUP BY codigo_producto
+            ) AS d
+            WHERE productos.codigo = d.codigo_producto
+        """, (venta.get_numero_venta(),))
+
+        # Acumular en los totales del cajero y del día (misma transacción)
+        if venta.get_estado() == "Completada":
+            cur.execute("""
+                INSERT INTO totales_cajero (cajero, num_ventas, total_vendido, total_ganancia)
+                VALUES (?, 1, ?, ?)
+                ON CONFLICT(cajero) DO UPDATE SET
+                    num_ventas     = num_ventas + 1,
+                    total_vendido  = total_vendido + excluded.total_vendido,
+                    total_ganancia = total_ganancia + excluded.total_ganancia
+            """, (venta.get_cajero(), venta.get_total(), venta.get_ganancia_total()))
+            cur.execute("""
+                INSERT INTO resumen_diario (fecha, cajero, num_ventas, total, ganancia, descuento)
+                VALUES (?, ?, 1, ?, ?, ?)
+                ON CONFLICT(fecha, cajero) DO UPDATE SET
+                    num_ventas = num_ventas + 1,
+                    total      = total + excluded.total,
+                    ganancia   = ganancia + excluded.ganancia,
+                    descuento  = descuento + excluded.descuento
+            """, (
+                venta.get_fecha().strftime("%Y-%m-%d"),
+                venta.get_cajero(),
+                venta.get_total(),
+                venta.get_ganancia_total(),
+                venta.get_descuento()
+            ))
+            acumular_ventas_producto(cur, venta.get_numero_venta(), venta.get_fecha().strftime("%Y-%m-%d"))
+
     def obtener_ventas_del_dia(self, fecha=None):
         """Obtiene todas las ventas de un día específico (hoy por default)."""
+        cur = self.conexion.cursor()
         if not fecha:
             fecha = datetime.now().strftime("%Y-%m-%d")
-        self.cursor.execute("""
+        cur.execute("""
             SELECT * FROM ventas
-            WHERE fecha LIKE ? AND estado = 'Completada'
+            WHERE estado = 'Completada' AND fecha >= ? AND fecha < ?
             ORDER BY fecha DESC
-        """, (f"{fecha}%",))
-        return self.cursor.fetchall()
+        """, rango_fecha(fecha))
+        return cur.fetchall()
 
     def obtener_todas_ventas(self, limite=None):
         """Obtiene todas las ventas registradas."""
+        cur = self.conexion.cursor()
         query = "SELECT * FROM ventas WHERE estado = 'Completada' ORDER BY fecha DESC"
         if limite:
             query += f" LIMIT {limite}"
-        self.cursor.execute(query)
-        return self.cursor.fetchall()
+        cur.execute(query)
+        return cur.fetchall()
+
+    def obtener_venta(self, numero_venta):
+        """Obtiene la cabecera de una venta por su número (None si no existe)."""
+        cur = self.conexion.cursor()
+        cur.execute(
+            "SELECT * FROM ventas WHERE numero_venta = ?",
+            (numero_venta,)
+        )
+        return cur.fetchone()
+
+    def obtener_ventas_paginadas(self, limite=200, despues_de=None, desde=None, hasta=None,
+                                 cajero=None, descendente=False):
+        """
+        Obtiene una página de ventas completadas ordenadas por (fecha, numero_venta).
+        despues_de = (fecha, numero_venta) de la última fila de la página anterior.
+        """
+        cur = self.conexion.cursor()
+        condiciones = ["estado = 'Completada'"]
+        parametros = []
+        if despues_de:
+            condiciones.append(f"(fecha, numero_venta) {'<' if descendente else '>'} (?, ?)")
+            parametros.extend(despues_de)
+        if desde:
+            condiciones.append("fecha >= ?")
+            parametros.append(desde)
+        if hasta:
+            condiciones.append("fecha <= ?")
+            parametros.append(hasta)
+        if cajero:
+            condiciones.append("cajero = ?")
+            parametros.append(cajero)
+        orden = "DESC" if descendente else "ASC"
+        parametros.append(limite)
+        cur.execute(f"""
+            SELECT * FROM ventas
+            WHERE {' AND '.join(condiciones)}
+            ORDER BY fecha {orden}, numero_venta {orden}
+            LIMIT ?
+        """, parametros)
+        return cur.fetchall()
+
+    def obtener_detalles_ventas(self, numeros_venta):
+        """Obtiene el detalle de varias ventas en una sola consulta: {numero_venta: [filas]}."""
+        cur = self.conexion.cursor()
+        detalles = {numero: [] for numero in numeros_venta}
+        if not numeros_venta:
+            return detalles
+        marcadores = ",".join("?" * len(numeros_venta))
+        cur.execute(
+            f"SELECT * FROM detalle_ventas WHERE numero_venta IN ({marcadores}) ORDER BY id",
+            list(numeros_venta)
+        )
+        for fila in cur.fetchall():
+            detalles[fila['numero_venta']].append(fila)
+        return detalles
 
     def obtener_detalle_venta(self, numero_venta):
         """Obtiene el detalle completo de una venta."""
-        self.cursor.execute(
+        cur = self.conexion.cursor()
+        cur.execute(
             "SELECT * FROM detalle_ventas WHERE numero_venta = ?",
             (numero_venta,)
         )
-        return self.cursor.fetchall()
+        return cur.fetchall()
 
-    def reporte_productos_mas_vendidos(self, top=10):
-        """Genera un reporte de productos más vendidos."""
-        self.cursor.execute("""
+    def reporte_productos_mas_vendidos(self, top=10, desde=None, hasta=None):
+        """
+        Genera un reporte de productos más vendidos desde los acumulados por
+        producto; con desde/hasta ('YYYY-MM-DD', inclusive) usa los acumulados por día.
+        """
+        cur = self.conexion.cursor()
+        if desde or hasta:
+            cur.execute("""
+                SELECT
+                    d.codigo AS codigo_producto,
+                    p.nombre AS nombre_producto,
+                    SUM(d.unidades) AS total_vendido,
+                    SUM(d.ingresos) AS total_ingresos,
+                    SUM(d.ganancia) AS total_ganancia
+                FROM ventas_producto_dia d
+                JOIN ventas_producto p ON p.codigo = d.codigo
+                WHERE d.fecha >= ? AND d.fecha <= ?
+                GROUP BY d.codigo
+                ORDER BY total_vendido DESC
+                LIMIT ?
+            """, (desde or "", hasta or "9999-12-31", top))
+            return cur.fetchall()
+        cur.execute("""
             SELECT
-                codigo_producto,
-                nombre_producto,
-                SUM(cantidad)  AS total_vendido,
-                SUM(subtotal)  AS total_ingresos,
-                SUM(ganancia_item) AS total_ganancia
-            FROM detalle_ventas
-            GROUP BY codigo_producto, nombre_producto
-            ORDER BY total_vendido DESC
+                codigo   AS codigo_producto,
+                nombre   AS nombre_producto,
+                unidades AS total_vendido,
+                ingresos AS total_ingresos,
+                ganancia AS total_ganancia
+            FROM ventas_producto
+            ORDER BY unidades DESC
             LIMIT ?
         """, (top,))
-        return self.cursor.fetchall()
+        return cur.fetchall()
 
-    def reporte_ventas_por_cajero(self):
-        """Genera un reporte de ventas agrupado por cajero."""
-        self.cursor.execute("""
+    def totales_por_producto(self):
+        """Cantidad, ingresos y ganancia vendidos de cada producto (mayor cantidad primero)."""
+        return self.reporte_productos_mas_vendidos(top=-1)  # LIMIT -1: sin límite
+
+    def reconstruir_ventas_producto(self):
+        """Recalcula los acumulados por producto a partir de todas las ventas guardadas."""
+        if self.escritor:
+            self.escritor.vaciar()
+        try:
+            reconstruir_ventas_producto(self.conexion)
+            self.conexion.commit()
+        except Exception as e:
+            print(f"✗ Error al reconstruir las ventas por producto: {e}")
+            self.conexion.rollback()
+            return False
+        print("✓ Ventas por producto reconstruidas")
+        self._registrar("MANTENIMIENTO", "Ventas por producto reconstruidas")
+        return True
+
+    def resumen_historial(self):
+        """Conteo, sumas, suma de cuadrados, extremos y rango de fechas de las ventas completadas."""
+        cur = self.conexion.cursor()
+        cur.execute("""
             SELECT
-                cajero,
-                COUNT(*) AS num_ventas,
-                SUM(total) AS total_vendido,
-                SUM(ganancia) AS total_ganancia
+                COUNT(*) AS cantidad,
+                COALESCE(SUM(total), 0) AS total,
+                COALESCE(SUM(ganancia), 0) AS ganancia,
+                COALESCE(SUM(total * total), 0) AS suma_cuadrados,
+                MAX(total) AS maximo,
+                MIN(total) AS minimo,
+                MIN(fecha) AS primera_fecha,
+                MAX(fecha) AS ultima_fecha
             FROM ventas
             WHERE estado = 'Completada'
-            GROUP BY cajero
+        """)
+        return cur.fetchone()
+
+    def reporte_ventas_por_cajero(self):
+        """Genera un reporte de ventas agrupado por cajero (desde los totales acumulados)."""
+        cur = self.conexion.cursor()
+        cur.execute("""
+            SELECT cajero, num_ventas, total_vendido, total_ganancia
+            FROM totales_cajero
             ORDER BY total_vendido DESC
         """)
-        return self.cursor.fetchall()
+        return cur.fetchall()
 
     def total_vendido_hoy(self):
         """Calcula el total vendido en el día de hoy."""
-        fecha_hoy = datetime.now().strftime("%Y-%m-%d")
-        self.cursor.execute("""
+        return self.resumen_del_dia()
+
+    def resumen_del_dia(self, fecha=None):
+        """
+        Ventas, total, ganancia y descuento de un día (hoy por default),
+        leídos de resumen_diario: una búsqueda por clave primaria.
+        """
+        cur = self.conexion.cursor()
+        if not fecha:
+            fecha = datetime.now().strftime("%Y-%m-%d")
+        cur.execute("""
             SELECT
-                COUNT(*) AS num_ventas,
+                COALESCE(SUM(num_ventas), 0) AS num_ventas,
                 COALESCE(SUM(total), 0) AS total,
-                COALESCE(SUM(ganancia), 0) AS ganancia
-            FROM ventas
-            WHERE fecha LIKE ? AND estado = 'Completada'
-        """, (f"{fecha_hoy}%",))
-        return self.cursor.fetchone()
+                COALESCE(SUM(ganancia), 0) AS ganancia,
+                COALESCE(SUM(descuento), 0) AS descuento
+            FROM resumen_diario
+            WHERE fecha = ?
+        """, (fecha,))
+        return cur.fetchone()
+
+    def resumen_del_dia_por_cajero(self, fecha=None):
+        """Totales de un día (hoy por default) desglosados por cajero."""
+        cur = self.conexion.cursor()
+        if not fecha:
+            fecha = datetime.now().strftime("%Y-%m-%d")
+        cur.execute("""
+            SELECT cajero, num_ventas, total, ganancia, descuento
+            FROM resumen_diario
+            WHERE fecha = ?
+            ORDER BY total DESC
+        """, (fecha,))
+        return cur.fetchall()
+
+    def reconstruir_resumen_diario(self):
+        """Recalcula resumen_diario a partir de todas las ventas guardadas."""
+        if self.escritor:
+            self.escritor.vaciar()
+        try:
+            reconstruir_resumen_diario(self.conexion)
+            self.conexion.commit()
+        except Exception as e:
+            print(f"✗ Error al reconstruir el resumen diario: {e}")
+            self.conexion.rollback()
+            return False
+        dias = self.conexion.execute("SELECT COUNT(DISTINCT fecha) FROM resumen_diario").fetchone()[0]
+        print(f"✓ Resumen diario reconstruido ({dias} días)")
+        self._registrar("MANTENIMIENTO", f"Resumen diario reconstruido ({dias} días)")
+        return True
+
+    # ============================================================
+    # EXPORTACIÓN INCREMENTAL A CSV
+    # ============================================================
+
+    def exportar_ventas_csv(self, archivo="historial_ventas.csv", archivo_detalle=None, tamano_lote=1000):
+        """
+        Agrega al CSV sólo las ventas guardadas desde la última exportación
+        (marca de agua = último ventas.id exportado a ese archivo), con su
+        detalle en un segundo CSV. Las filas se leen con fetchmany, así que
+        la memoria no depende del tamaño del historial.
+        Retorna el número de ventas exportadas.
+        """
+        cur = self.conexion.cursor()
+        if archivo_detalle is None:
+            archivo_detalle = os.path.splitext(archivo)[0] + "_detalle.csv"
+
+        cur.execute("SELECT ultimo_id FROM exportaciones WHERE archivo = ?", (archivo,))
+        fila = cur.fetchone()
+        ultimo_id = fila[0] if fila else 0
+        if not (os.path.exists(archivo) and os.path.exists(archivo_detalle)):
+            ultimo_id = 0  # Los archivos no existen: exportación completa
+
+        lector = self.conexion.cursor()
+        lector.execute("""
+            SELECT v.id, v.numero_venta, v.fecha, v.cajero, v.total, v.ganancia,
+                   v.descuento, v.estado,
+                   d.codigo_producto, d.nombre_producto, d.cantidad,
+                   d.precio_unitario, d.subtotal, d.ganancia_item
+            FROM ventas v
+            LEFT JOIN detalle_ventas d ON d.numero_venta = v.numero_venta
+            WHERE v.id > ?
+            ORDER BY v.id, d.id
+        """, (ultimo_id,))
+
+        modo = "a" if ultimo_id else "w"
+        exportadas = 0
+        try:
+            with open(archivo, modo, newline='', encoding='utf-8') as f_ventas, \
+                 open(archivo_detalle, modo, newline='', encoding='utf-8') as f_detalle:
+                ventas_csv = csv.writer(f_ventas)
+                detalle_csv = csv.writer(f_detalle)
+                if modo == "w":
+                    ventas_csv.writerow(['Numero_Venta', 'Fecha', 'Hora', 'Cajero', 'Items',
+                                         'Total', 'Ganancia', 'Descuento', 'Estado'])
+                    detalle_csv.writerow(['Numero_Venta', 'Codigo', 'Producto', 'Cantidad',
+                                          'Precio_Unitario', 'Subtotal', 'Ganancia'])
+
+                actual = None   # Cabecera de la venta en curso
+                items = 0
+                while True:
+                    filas = lector.fetchmany(tamano_lote)
+                    if not filas:
+                        break
+                    for f in filas:
+                        if actual is None or f[0] != actual[0]:
+                            if actual is not None:
+                                self.__escribir_venta_csv(ventas_csv, actual, items)
+                                exportadas += 1
+                            actual, items = f, 0
+                        if f[8] is not None:
+                            detalle_csv.writerow((f[1],) + tuple(f[8:14]))
+                            items += 1
+                if actual is not None:
+                    self.__escribir_venta_csv(ventas_csv, actual, items)
+                    exportadas += 1
+                    ultimo_id = actual[0]
+
+                for archivo_abierto in (f_ventas, f_detalle):
+                    archivo_abierto.flush()
+                    os.fsync(archivo_abierto.fileno())
+        finally:
+            lector.close()
+
+        # Avanzar la marca de agua sólo después de escribir los archivos
+        cur.execute("""
+            INSERT INTO exportaciones (archivo, ultimo_id, fecha) VALUES (?, ?, ?)
+            ON CONFLICT(archivo) DO UPDATE SET ultimo_id = excluded.ultimo_id, fecha = excluded.fecha
+        """, (archivo, ultimo_id, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+        self.conexion.commit()
+        print(f"✓ {exportadas} ventas nuevas exportadas a '{archivo}' (detalle en '{archivo_detalle}')")
+        self._registrar("EXPORTACION", f"{exportadas} ventas exportadas a '{archivo}'")
+        return exportadas
+
+    @staticmethod
+    def __escribir_venta_csv(escritor, f, items):
+        fecha = f[2]  # 'YYYY-MM-DD HH:MM:SS'
+        escritor.writerow((f[1], f"{fecha[8:10]}/{fecha[5:7]}/{fecha[0:4]}", fecha[11:19],
+                           f[3], items, f[4], f[5], f[6], f[7]))
 
     # ============================================================
     # LOG DE ACTIVIDADES
     # ============================================================
 
+    def activar_registro_actividades(self, carpeta=None, **opciones):
+        """
+        Envía el log de actividades a un RegistroActividades (en segundo
+        plano, particionado por mes) y registra las operaciones de esta
+        clase. Por defecto las particiones van en 'logs' junto a la base.
+        """
+        if not self.registro:
+            if carpeta is None:
+                carpeta = os.path.join(os.path.dirname(self.ruta_db), "logs")
+            self.registro = RegistroActividades(carpeta, **opciones)
+        return self.registro
+
+    def _registrar(self, tipo, descripcion, usuario="Sistema"):
+        """Actividad de una operación; sólo con el registro de actividades activo."""
+        if self.registro:
+            self.registro.registrar(tipo, descripcion, usuario)
+
     def registrar_log(self, tipo, descripcion, usuario="Sistema"):
-        """Registra una actividad en el log."""
-        self.cursor.execute("""
+        """
+        Registra una actividad en el log. Con el registro de actividades
+        activo sólo se encola; si no, se inserta en log_actividades y se confirma.
+        """
+        if self.registro:
+            self.registro.registrar(tipo, descripcion, usuario)
+            return
+        cur = self.conexion.cursor()
+        cur.execute("""
             INSERT INTO log_actividades (fecha, tipo, descripcion, usuario)
             VALUES (?, ?, ?, ?)
         """, (
@@ -389,14 +858,15 @@ class BaseDatos:
 
     def mostrar_resumen_bd(self):
         """Muestra un resumen del estado de la base de datos."""
-        self.cursor.execute("SELECT COUNT(*) FROM productos WHERE activo = 1")
-        num_productos = self.cursor.fetchone()[0]
+        cur = self.conexion.cursor()
+        cur.execute("SELECT COUNT(*) FROM productos WHERE activo = 1")
+        num_productos = cur.fetchone()[0]
 
-        self.cursor.execute("SELECT COUNT(*) FROM ventas WHERE estado = 'Completada'")
-        num_ventas = self.cursor.fetchone()[0]
+        cur.execute("SELECT COUNT(*) FROM ventas WHERE estado = 'Completada'")
+        num_ventas = cur.fetchone()[0]
 
-        self.cursor.execute("SELECT COALESCE(SUM(total), 0) FROM ventas WHERE estado = 'Completada'")
-        total_acumulado = self.cursor.fetchone()[0]
+        cur.execute("SELECT COALESCE(SUM(total), 0) FROM ventas WHERE estado = 'Completada'")
+        total_acumulado = cur.fetchone()[0]
 
         print("\n" + "="*60)
         print("RESUMEN - BASE DE DATOS CAFETERÍA")
@@ -408,11 +878,528 @@ class BaseDatos:
         print("="*60 + "\n")
 
 
+# ============================================================
+# ESCRITURA DIFERIDA DE VENTAS (GROUP COMMIT)
+# ============================================================
+
+class EscritorVentas:
+    """
+    Hilo escritor de ventas.
+    Las ventas que llegan dentro de una ventana corta (ventana_ms) se
+    guardan juntas en una sola transacción: un commit (y un fsync) por
+    lote en lugar de uno por venta. Cada venta va en su propio SAVEPOINT,
+    así que una venta rechazada (p. ej. número duplicado) no anula el lote.
+    Quien encola recibe un Future que se resuelve después del COMMIT.
+    """
+
+    def __init__(self, db, ventana_ms=2, lote_maximo=64, capacidad=1024):
+        self.db = db
+        self.ventana = ventana_ms / 1000
+        self.lote_maximo = lote_maximo
+        self._cola = queue.Queue(maxsize=capacidad)
+        self._cerrado = False
+        # Hace atómicos "¿cerrado?" + put(): nada entra a la cola después del fin
+        self._lock_cierre = threading.Lock()
+
+        # Estadísticas
+        self._escritas = 0
+        self._lotes = 0
+        self._errores = 0
+        self._latencia_total = 0.0
+        self._latencia_maxima = 0.0
+
+        self._hilo = threading.Thread(target=self._ejecutar, name="EscritorVentas", daemon=True)
+        self._hilo.start()
+        atexit.register(self.cerrar)  # Confirma la cola aunque no se llame a cerrar()
+
+    def encolar(self, venta):
+        """
+        Agrega una venta a la cola y devuelve su Future (True si se guardó,
+        False si ya existía). Si la cola está llena espera (contrapresión).
+        """
+        resultado = Future()
+        with self._lock_cierre:
+            if not self._cerrado:
+                self._cola.put((venta, resultado, time.perf_counter()))
+                return resultado
+        self._escribir_lote([(venta, resultado, time.perf_counter())])
+        return resultado
+
+    def vaciar(self):
+        """Bloquea hasta que todas las ventas encoladas estén confirmadas."""
+        self._cola.join()
+
+    def cerrar(self):
+        """Confirma las ventas pendientes y detiene el hilo."""
+        with self._lock_cierre:
+            if self._cerrado:
+                return
+            self._cerrado = True
+            self._cola.put(None)
+        self._hilo.join()
+
+    # --- HILO DE ESCRITURA ---
+    def _ejecutar(self):
+        while True:
+            primero = self._cola.get()
+            if primero is None:
+                self._cola.task_done()
+                return
+
+            # Esperar a que lleguen más ventas hasta que cierre la ventana
+            # (la ventana cuenta desde que se encoló la primera: si ya esperó
+            # mientras se confirmaba el lote anterior, no se le agrega demora)
+            lote = [primero]
+            terminar = False
+            limite = primero[2] + self.ventana
+            while len(lote) < self.lote_maximo:
+                restante = limite - time.perf_counter()
+                try:
+                    siguiente = self._cola.get(timeout=restante) if restante > 0 else self._cola.get_nowait()
+                except queue.Empty:
+                    break
+                if siguiente is None:
+                    terminar = True
+                    break
+                lote.append(siguiente)
+
+            self._escribir_lote(lote)
+            for _ in range(len(lote) + terminar):
+                self._cola.task_done()
+            if terminar:
+                return
+
+    def _escribir_lote(self, lote):
+        """Guarda el lote en una transacción y resuelve los Future al confirmar."""
+        conexion = self.db.conexion
+        cur = conexion.cursor()
+        guardadas = []
+        try:
+            if not conexion.in_transaction:
+                cur.execute("BEGIN IMMEDIATE")
+            for venta, resultado, _ in lote:
+                cur.execute("SAVEPOINT venta")
+                try:
+                    self.db._insertar_venta(cur, venta)
+                except sqlite3.IntegrityError:
+                    cur.execute("ROLLBACK TO venta")
+                    print(f"⚠️  La venta #{venta.get_numero_venta()} ya existe en la base de datos")
+                    guardadas.append(False)
+                else:
+                    guardadas.append(True)
+                cur.execute("RELEASE venta")
+            conexion.commit()
+        except Exception as e:
+            conexion.rollback()
+            self._errores += len(lote)
+            print(f"✗ Error al guardar {len(lote)} ventas: {e}")
+            for _, resultado, _ in lote:
+                resultado.set_exception(e)
+            return
+
+        ahora = time.perf_counter()
+        for (venta, resultado, encolada), guardada in zip(lote, guardadas):
+            if guardada:
+                self.db._registrar_venta(venta)
+            latencia = ahora - encolada
+            self._latencia_total += latencia
+            if latencia > self._latencia_maxima:
+                self._latencia_maxima = latencia
+            resultado.set_result(guardada)
+        self._escritas += len(lote)
+        self._lotes += 1
+
+    # --- ESTADÍSTICAS ---
+    def estadisticas(self):
+        """Retorna profundidad de la cola, ventas por lote y latencias hasta el commit (ms)."""
+        return {
+            'en_cola': self._cola.qsize(),
+            'escritas': self._escritas,
+            'lotes': self._lotes,
+            'errores': self._errores,
+            'ventas_por_lote': (self._escritas / self._lotes) if self._lotes else 0.0,
+            'latencia_promedio_ms': (self._latencia_total / self._escritas * 1000) if self._escritas else 0.0,
+            'latencia_maxima_ms': self._latencia_maxima * 1000,
+        }
+
+    def mostrar_estadisticas(self):
+        """Muestra las estadísticas del escritor."""
+        datos = self.estadisticas()
+        print("\n" + "="*60)
+        print("ESCRITOR DE VENTAS (GROUP COMMIT)")
+        print("="*60)
+        print(f"Ventas en cola:       {datos['en_cola']}")
+        print(f"Ventas guardadas:     {datos['escritas']} en {datos['lotes']} lotes "
+              f"({datos['ventas_por_lote']:.1f} por lote)")
+        print(f"Errores:              {datos['errores']}")
+        print(f"Latencia promedio:    {datos['latencia_promedio_ms']:.2f} ms")
+        print(f"Latencia máxima:      {datos['latencia_maxima_ms']:.2f} ms")
+        print("="*60 + "\n")
+
+
+# ============================================================
+# REGISTRO DE ACTIVIDADES EN SEGUNDO PLANO
+# ============================================================
+
+def _mes_anterior(mes, meses):
+    """'AAAA-MM' menos 'meses' meses."""
+    indice = int(mes[:4]) * 12 + int(mes[5:7]) - 1 - meses
+    return f"{indice // 12:04d}-{indice % 12 + 1:02d}"
+
+
+class RegistroActividades:
+    """
+    Log de actividades con escritura diferida, particionado por mes.
+    registrar() sólo deja la entrada en una cola en memoria; un hilo junta
+    las entradas de cada intervalo (intervalo_ms) y las inserta en una sola
+    transacción: un commit por lote en lugar de uno por actividad.
+    Cada mes es un archivo propio (<carpeta>/actividades_AAAA-MM.db, con la
+    tabla log_actividades) con su propio bloqueo, así que escribir el log
+    nunca compite con las transacciones de ventas de la base principal.
+
+    Rotación: se borran los meses que superan meses_retencion y, mientras
+    el total pase de tamano_maximo_mb, el mes más antiguo (del mes actual,
+    sus filas más antiguas). Si la cola se llena la entrada se descarta y
+    se cuenta: el log nunca hace esperar al cajero.
+    """
+
+    PREFIJO = "actividades_"
+
+    def __init__(self, carpeta="logs", intervalo_ms=1000, lote_maximo=500, capacidad=10000,
+                 meses_retencion=12, tamano_maximo_mb=50):
+        self.carpeta = carpeta
+        self.intervalo = intervalo_ms / 1000
+        self.lote_maximo = lote_maximo
+        self.meses_retencion = meses_retencion
+        self.tamano_maximo = tamano_maximo_mb * 1024 * 1024 if tamano_maximo_mb else None
+        self._cola = queue.Queue(maxsize=capacidad)
+        self._cerrado = False
+        self._lock = threading.Lock()  # Escrituras directas después de cerrar()
+        self._lock_cierre = threading.Lock()  # "¿cerrado?" + put() atómicos
+        self._mes = None               # Partición abierta
+        self._conexion = None
+
+        # Estadísticas
+        self._escritas = 0
+        self._lotes = 0
+        self._descartadas = 0
+        self._errores = 0
+        self._particiones_borradas = 0
+
+        os.makedirs(carpeta, exist_ok=True)
+        self._hilo = threading.Thread(target=self._ejecutar, name="RegistroActividades", daemon=True)
+        self._hilo.start()
+        atexit.register(self.cerrar)  # Escribe la cola aunque no se llame a cerrar()
+
+    def registrar(self, tipo, descripcion, usuario="Sistema"):
+        """Agrega una actividad a la cola (no espera al disco)."""
+        entrada = (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), tipo, descripcion, usuario)
+        with self._lock_cierre:
+            if not self._cerrado:
+                try:
+                    self._cola.put_nowait(entrada)
+                except queue.Full:
+                    self._descartadas += 1
+                return
+        with self._lock:
+            self._escribir_lote([entrada])
+
+    def vaciar(self):
+        """Bloquea hasta que todas las entradas encoladas estén escritas."""
+        self._cola.join()
+
+    def cerrar(self):
+        """Escribe las entradas pendientes y detiene el hilo."""
+        with self._lock_cierre:
+            if self._cerrado:
+                return
+            self._cerrado = True
+            self._cola.put(None)
+        self._hilo.join()
+
+    # --- HILO DE ESCRITURA ---
+    def _ejecutar(self):
+        while True:
+            primero = self._cola.get()
+            if primero is None:
+                self._cola.task_done()
+                self._cerrar_particion()
+                return
+
+            # Juntar lo que llegue durante el intervalo, hasta el tamaño de lote
+            lote = [primero]
+            terminar = False
+            limite = time.perf_counter() + self.intervalo
+            while len(lote) < self.lote_maximo:
+                restante = limite - time.perf_counter()
+                try:
+                    siguiente = self._cola.get(timeout=restante) if restante > 0 else self._cola.get_nowait()
+                except queue.Empty:
+                    break
+                if siguiente is None:
+                    terminar = True
+                    break
+                lote.append(siguiente)
+
+            with self._lock:
+                self._escribir_lote(lote)
+            for _ in range(len(lote) + terminar):
+                self._cola.task_done()
+            if terminar:
+                self._cerrar_particion()
+                return
+
+    def _escribir_lote(self, lote):
+        """Inserta el lote (una transacción por mes) y aplica la rotación."""
+        try:
+            for mes in sorted({entrada[0][:7] for entrada in lote}):
+                conexion = self._particion(mes)
+                conexion.executemany("""
+                    INSERT INTO log_actividades (fecha, tipo, descripcion, usuario)
+                    VALUES (?, ?, ?, ?)
+                """, [entrada for entrada in lote if entrada[0].startswith(mes)])
+                conexion.commit()
+            self._escritas += len(lote)
+            self._lotes += 1
+            self._rotar()
+        except (sqlite3.Error, OSError) as e:
+            self._errores += len(lote)
+            print(f"✗ Error al escribir {len(lote)} actividades en el log: {e}")
+
+    # --- PARTICIONES ---
+    def _ruta(self, mes):
+        return os.path.join(self.carpeta, f"{self.PREFIJO}{mes}.db")
+
+    def particiones(self):
+        """Meses con partición en disco, del más antiguo al más reciente: [(mes, ruta)]."""
+        meses = sorted(nombre[len(self.PREFIJO):-3] for nombre in os.listdir(self.carpeta)
+                       if nombre.startswith(self.PREFIJO) and nombre.endswith(".db"))
+        return [(mes, self._ruta(mes)) for mes in meses]
+
+    def _particion(self, mes):
+        """Conexión a la partición del mes (la crea si no existe)."""
+        if mes != self._mes:
+            self._cerrar_particion()
+            conexion = sqlite3.connect(self._ruta(mes), check_same_thread=False)
+            conexion.execute("PRAGMA journal_mode = WAL")
+            conexion.execute("PRAGMA synchronous = NORMAL")
+            # WAL pequeño: se vuelca cada 256 páginas y se trunca a 1 MB
+            conexion.execute("PRAGMA wal_autocheckpoint = 256")
+            conexion.execute(f"PRAGMA journal_size_limit = {1024 * 1024}")
+            conexion.execute(TABLA_LOG_ACTIVIDADES)
+            conexion.execute("CREATE INDEX IF NOT EXISTS idx_log_fecha ON log_actividades (fecha)")
+            conexion.commit()
+            self._conexion, self._mes = conexion, mes
+        return self._conexion
+
+    def _cerrar_particion(self):
+        if self._conexion:
+            self._conexion.close()
+            self._conexion = self._mes = None
+
+    def _tamano(self, mes, ruta):
+        """Bytes ocupados por una partición (en la abierta, sin las páginas libres)."""
+        if self._conexion is not None and mes == self._mes:
+            paginas, libres, tamano_pagina = (self._conexion.execute(f"PRAGMA {pragma}").fetchone()[0]
+                                              for pragma in ("page_count", "freelist_count", "page_size"))
+            return (paginas - libres) * tamano_pagina
+        return sum(os.path.getsize(archivo) for archivo in (ruta, ruta + "-wal") if os.path.exists(archivo))
+
+    def _borrar_particion(self, mes, ruta):
+        for archivo in (ruta, ruta + "-wal", ruta + "-shm"):
+            if os.path.exists(archivo):
+                os.remove(archivo)
+        self._particiones_borradas += 1
+        print(f"✓ Log de actividades: partición {mes} eliminada (rotación)")
+
+    def _rotar(self):
+        """Aplica la retención por meses y el tamaño máximo."""
+        particiones = self.particiones()
+        if self.meses_retencion and self._mes:
+            primer_mes = _mes_anterior(self._mes, self.meses_retencion - 1)
+            for mes, ruta in [p for p in particiones if p[0] < primer_mes]:
+                self._borrar_particion(mes, ruta)
+            particiones = [p for p in particiones if p[0] >= primer_mes]
+
+        if not self.tamano_maximo:
+            return
+        tamanos = [(mes, ruta, self._tamano(mes, ruta)) for mes, ruta in particiones]
+        total = sum(tamano for _, _, tamano in tamanos)
+        for mes, ruta, tamano in tamanos:
+            if total <= self.tamano_maximo:
+                break
+            if mes == self._mes:
+                self._recortar_particion_actual(total - self.tamano_maximo, tamano)
+                break
+            self._borrar_particion(mes, ruta)
+            total -= tamano
+
+    def _recortar_particion_actual(self, exceso, tamano):
+        """
+        Borra las filas más antiguas del mes actual (al menos un 10%). Las
+        páginas liberadas se reutilizan, así que el archivo deja de crecer.
+        """
+        conexion = self._conexion
+        filas, primer_id = conexion.execute("SELECT COUNT(*), MIN(id) FROM log_actividades").fetchone()
+        if not filas:
+            return
+        borrar = max(filas // 10, -(-exceso * filas // tamano))
+        conexion.execute("DELETE FROM log_actividades WHERE id < ?", (primer_id + borrar,))
+        conexion.commit()
+
+    # --- CONSULTAS ---
+    def consultar(self, tipo=None, desde=None, hasta=None, limite=100):
+        """
+        Actividades más recientes primero. desde/hasta: 'AAAA-MM-DD'
+        (inclusive). Sólo abre las particiones de los meses del rango.
+        """
+        self.vaciar()
+        inicio = desde or ""
+        fin = rango_fecha(hasta)[1] if hasta else "9999"
+        condiciones, parametros = ["fecha >= ?", "fecha < ?"], [inicio, fin]
+        if tipo:
+            condiciones.append("tipo = ?")
+            parametros.append(tipo)
+
+        resultado = []
+        for mes, ruta in reversed(self.particiones()):
+            if len(resultado) >= limite:
+                break
+            if mes < inicio[:7] or mes > fin[:7]:
+                continue
+            conexion = sqlite3.connect(f"file:{ruta}?mode=ro", uri=True)
+            conexion.row_factory = sqlite3.Row
+            try:
+                resultado.extend(conexion.execute(f"""
+                    SELECT fecha, tipo, descripcion, usuario
+                    FROM log_actividades
+                    WHERE {' AND '.join(condiciones)}
+                    ORDER BY id DESC
+                    LIMIT ?
+                """, parametros + [limite - len(resultado)]).fetchall())
+            finally:
+                conexion.close()
+        return resultado
+
+    def mostrar(self, tipo=None, limite=30):
+        """Muestra las últimas actividades registradas."""
+        actividades = self.consultar(tipo, limite=limite)
+        print("\n" + "="*70)
+        print("REGISTRO DE ACTIVIDADES" + (f" - {tipo}" if tipo else ""))
+        print("="*70)
+        if not actividades:
+            print("No hay actividades registradas")
+        for fila in actividades:
+            print(f"{fila['fecha']}  {fila['tipo']:<13} {fila['usuario']:<12} {fila['descripcion']}")
+        print("="*70 + "\n")
+
+    # --- ESTADÍSTICAS ---
+    def estadisticas(self):
+        """Retorna profundidad de la cola, entradas escritas y descartadas, y tamaño en disco."""
+        with self._lock:
+            particiones = self.particiones()
+            tamano = sum(self._tamano(None, ruta) for _, ruta in particiones)
+        return {
+            'en_cola': self._cola.qsize(),
+            'escritas': self._escritas,
+            'lotes': self._lotes,
+            'descartadas': self._descartadas,
+            'errores': self._errores,
+            'particiones': len(particiones),
+            'particiones_borradas': self._particiones_borradas,
+            'tamano_mb': tamano / (1024 * 1024),
+        }
+
+    def mostrar_estadisticas(self):
+        """Muestra las estadísticas del registro."""
+        datos = self.estadisticas()
+        print("\n" + "="*60)
+        print("REGISTRO DE ACTIVIDADES")
+        print("="*60)
+        print(f"Entradas en cola:     {datos['en_cola']}")
+        print(f"Entradas escritas:    {datos['escritas']} en {datos['lotes']} lotes")
+        print(f"Descartadas:          {datos['descartadas']} (cola llena)")
+        print(f"Errores:              {datos['errores']}")
+        print(f"Particiones:          {datos['particiones']} ({datos['tamano_mb']:.2f} MB), "
+              f"{datos['particiones_borradas']} eliminadas por rotación")
+        print("="*60 + "\n")
+
+
+# ============================================================
+# ASIGNACIÓN DE NÚMEROS DE VENTA (HI/LO)
+# ============================================================
+
+class AsignadorNumeros:
+    """
+    Asignador hi/lo de números de venta.
+    Reserva bloques de números en config_contador con una transacción
+    BEGIN IMMEDIATE y los entrega desde memoria: no hay viaje a la base de
+    datos por venta y dos terminales (o un reinicio) nunca reciben el mismo
+    número. Los números sobrantes de un bloque se pierden al cerrar: puede
+    haber huecos en la numeración, pero no duplicados.
+    """
+
+    def __init__(self, ruta_db=DB_PATH, tamano_bloque=20, inicial=1000, clave="ultimo_numero"):
+        self.ruta_db = ruta_db
+        self.tamano_bloque = max(1, int(tamano_bloque))
+        self.inicial = inicial
+        self.clave = clave
+        self._siguiente = 1
+        self._limite = 0  # Último número del bloque reservado
+        self._lock = threading.Lock()
+
+    def _reservar_bloque(self):
+        """Reserva atómicamente el siguiente bloque de números."""
+        conexion = sqlite3.connect(self.ruta_db, timeout=30, isolation_level=None)
+        try:
+            conexion.execute("BEGIN IMMEDIATE")
+            conexion.execute(
+                "CREATE TABLE IF NOT EXISTS config_contador (clave TEXT PRIMARY KEY, valor INTEGER NOT NULL)"
+            )
+            fila = conexion.execute(
+                "SELECT valor FROM config_contador WHERE clave=?", (self.clave,)
+            ).fetchone()
+            ultimo = max(fila[0] if fila else 0, self.inicial or 0)
+
+            # Nunca reservar por debajo de una venta ya guardada
+            # (bases creadas antes del asignador o contador reiniciado a mano)
+            try:
+                maximo = conexion.execute("SELECT MAX(numero_venta) FROM ventas").fetchone()[0]
+                ultimo = max(ultimo, maximo or 0)
+            except sqlite3.OperationalError:
+                pass  # Aún no existe la tabla de ventas
+
+            limite = ultimo + self.tamano_bloque
+            conexion.execute("""
+                INSERT INTO config_contador (clave, valor) VALUES (?, ?)
+                ON CONFLICT(clave) DO UPDATE SET valor = excluded.valor
+            """, (self.clave, limite))
+            conexion.execute("COMMIT")
+        except Exception:
+            if conexion.in_transaction:
+                conexion.execute("ROLLBACK")
+            raise
+        finally:
+            conexion.close()
+
+        self._siguiente = ultimo + 1
+        self._limite = limite
+
+    def siguiente(self):
+        """Devuelve el siguiente número de venta (sólo consulta la base al agotar el bloque)."""
+        with self._lock:
+            if self._siguiente > self._limite:
+                self._reservar_bloque()
+            numero = self._siguiente
+            self._siguiente += 1
+            return numero
+
+
 # ============================================================
 # FUNCIÓN DE INICIALIZACIÓN RÁPIDA
 # ============================================================
 
-def inicializar_base_de_datos(gestor_productos=None):
+def inicializar_base_de_datos(gestor_productos=None, perfil=PERFIL_POR_DEFECTO, ruta_db=DB_PATH):
     """
     Inicializa la base de datos: crea el archivo, las tablas
     y opcionalmente carga el catálogo de productos.
@@ -420,12 +1407,16 @@ def inicializar_base_de_datos(gestor_productos=None):
     Uso:
         db = inicializar_base_de_datos(gestor_productos)
     """
-    db = BaseDatos()
+    db = BaseDatos(ruta_db, perfil)
     db.conectar()
     db.crear_tablas()
 
     if gestor_productos:
-        db.sincronizar_productos_desde_gestor(gestor_productos)
+        # Sólo los productos nuevos del catálogo: los existentes conservan el
+        # stock guardado (sincronizar_stock_a_gestor lo carga después)
+        insertados = db.insertar_productos_faltantes(gestor_productos.productos)
+        if insertados:
+            print(f"✓ {insertados} productos nuevos agregados a la base de datos")
 
     print("✓ Base de datos lista")
     return db
@@ -455,11 +1446,9 @@ CÓMO INTEGRAR database.py EN TU PROYECTO
     if hasattr(self, 'db') and self.db:
         self.db.guardar_venta(venta)
 
-4. Al cerrar el sistema (opción 26 de main.py), sincroniza el stock:
+4. Al cerrar el sistema (opción 26 de main.py), guarda los productos modificados:
 
-    sistema.db.sincronizar_productos_desde_gestor(
-        sistema.gestor_productos
-    )
+    sistema.gestor_productos.persistir_cambios(sistema.db)
     sistema.db.cerrar()
 """
 
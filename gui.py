@@ -6,10 +6,14 @@ Versión: 2.0.0  |  Fecha: 2026-02-26
 
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
-import sqlite3
 import json
 import os
 from datetime import datetime
+from promociones import cargar_promociones
+from database import AsignadorNumeros, GestorConexiones, rango_fecha
+from analitica import CoocurrenciaProductos
+from migraciones import (MIGRACIONES_GUI, migrar, reconstruir_resumen_diario,
+                         reconstruir_ventas_producto, acumular_ventas_producto)
 
 # ─────────────────────────────────────────────
 # CARGAR CONFIGURACIÓN
@@ -32,12 +36,15 @@ COLORES = CONFIG.get("colores", {
 })
 
 DB_PATH = CONFIG.get("app", {}).get("db_path", "gui.db")
+PERFIL_PRAGMA = CONFIG.get("app", {}).get("perfil_pragma", "equilibrado")
 CAJEROS = CONFIG.get("cajeros", ["Cajero Principal"])
 CATEGORIAS = CONFIG.get("categorias", ["General"])
 MONEDA = CONFIG.get("negocio", {}).get("moneda", "$")
 STOCK_MIN = CONFIG.get("inventario", {}).get("stock_minimo_alerta", 10)
 CONT_INICIAL = CONFIG.get("ventas", {}).get("contador_inicial", 2000)
+BLOQUE_NUMEROS = CONFIG.get("ventas", {}).get("bloque_numeros", 20)
 DESC_MAX = CONFIG.get("ventas", {}).get("descuento_maximo", 30)
+PROMOCIONES = cargar_promociones(CONFIG.get("promociones"), DESC_MAX)
 
 # ─────────────────────────────────────────────
 # BASE DE DATOS
@@ -45,54 +52,24 @@ DESC_MAX = CONFIG.get("ventas", {}).get("descuento_maximo", 30)
 class DB:
     def __init__(self):
         self.path = DB_PATH
+        # Una conexión por hilo, reutilizada entre llamadas
+        self.conexiones = GestorConexiones(self.path, PERFIL_PRAGMA)
         self._init_db()
+        self.asignador = AsignadorNumeros(self.path, BLOQUE_NUMEROS, CONT_INICIAL)
 
     def _conn(self):
-        c = sqlite3.connect(self.path)
-        c.row_factory = sqlite3.Row
-        return c
+        # "with self._conn() as con" confirma o revierte, pero no cierra
+        return self.conexiones.conexion()
+
+    def cerrar(self):
+        self.conexiones.cerrar()
 
     def _init_db(self):
-        with self._conn() as con:
+        con = self._conn()
+        # Esquema versionado (PRAGMA user_version): sólo corre lo pendiente
+        migrar(con, MIGRACIONES_GUI, self.path)
+        with con:
             cur = con.cursor()
-            cur.executescript("""
-                CREATE TABLE IF NOT EXISTS productos (
-                    codigo       TEXT PRIMARY KEY,
-                    nombre       TEXT NOT NULL,
-                    costo        REAL DEFAULT 0,
-                    precio_venta REAL DEFAULT 0,
-                    stock        INTEGER DEFAULT 0,
-                    categoria    TEXT DEFAULT 'General',
-                    activo       INTEGER DEFAULT 1,
-                    fecha_alta   TEXT
-                );
-                CREATE TABLE IF NOT EXISTS ventas (
-                    id           INTEGER PRIMARY KEY AUTOINCREMENT,
-                    numero_venta INTEGER UNIQUE,
-                    fecha        TEXT,
-                    cajero       TEXT,
-                    total        REAL DEFAULT 0,
-                    ganancia     REAL DEFAULT 0,
-                    descuento    REAL DEFAULT 0,
-                    estado       TEXT DEFAULT 'Completada'
-                );
-                CREATE TABLE IF NOT EXISTS detalle_ventas (
-                    id              INTEGER PRIMARY KEY AUTOINCREMENT,
-                    numero_venta    INTEGER,
-                    codigo_producto TEXT,
-                    nombre_producto TEXT,
-                    cantidad        INTEGER,
-                    precio_unitario REAL,
-                    subtotal        REAL,
-                    ganancia_item   REAL
-                );
-                CREATE TABLE IF NOT EXISTS config_contador (
-                    clave TEXT PRIMARY KEY,
-                    valor INTEGER
-                );
-                INSERT OR IGNORE INTO config_contador (clave, valor)
-                VALUES ('ultimo_numero', 2000);
-            """)
             # Poblar catálogo si está vacío
             cur.execute("SELECT COUNT(*) FROM productos")
             if cur.fetchone()[0] == 0:
@@ -146,6 +123,17 @@ class DB:
             cur.execute("SELECT * FROM productos WHERE codigo=? AND activo=1", (codigo,))
             return cur.fetchone()
 
+    def get_productos_por_codigo(self, codigos):
+        """Productos activos de varios códigos en una consulta: {codigo: fila}."""
+        codigos = list(codigos)
+        if not codigos:
+            return {}
+        with self._conn() as con:
+            cur = con.cursor()
+            cur.execute(f"SELECT * FROM productos WHERE activo=1 AND codigo IN ({','.join('?' * len(codigos))})",
+                        codigos)
+            return {p["codigo"]: p for p in cur.fetchall()}
+
     def agregar_producto(self, codigo, nombre, costo, precio, stock, categoria):
         with self._conn() as con:
             cur = con.cursor()
@@ -179,11 +167,8 @@ class DB:
 
     # --- Contador ventas ---
     def siguiente_numero(self):
-        with self._conn() as con:
-            cur = con.cursor()
-            cur.execute("UPDATE config_contador SET valor=valor+1 WHERE clave='ultimo_numero'")
-            cur.execute("SELECT valor FROM config_contador WHERE clave='ultimo_numero'")
-            return cur.fetchone()[0]
+        # Se toma del bloque reservado en memoria: sin commit extra por venta
+        return self.asignador.siguiente()
 
     # --- Ventas ---
     def guardar_venta(self, cajero, items, total, ganancia, descuento):
@@ -195,12 +180,24 @@ class DB:
                 "INSERT INTO ventas (numero_venta,fecha,cajero,total,ganancia,descuento) VALUES (?,?,?,?,?,?)",
                 (num, fecha, cajero, total, ganancia, descuento)
             )
-            for it in items:
-                cur.execute(
-                    "INSERT INTO detalle_ventas (numero_venta,codigo_producto,nombre_producto,cantidad,precio_unitario,subtotal,ganancia_item) VALUES (?,?,?,?,?,?,?)",
-                    (num, it["codigo"], it["nombre"], it["cantidad"], it["precio"], it["subtotal"], it["ganancia"])
-                )
-                cur.execute("UPDATE productos SET stock=stock-? WHERE codigo=?", (it["cantidad"], it["codigo"]))
+            cur.executemany(
+                "INSERT INTO detalle_ventas (numero_venta,codigo_producto,nombre_producto,cantidad,precio_unitario,subtotal,ganancia_item) VALUES (?,?,?,?,?,?,?)",
+                [(num, it["codigo"], it["nombre"], it["cantidad"], it["precio"], it["subtotal"], it["ganancia"]) for it in items]
+            )
+            # Stock de todas las líneas en una sola sentencia
+            cur.execute("""
+                UPDATE productos SET stock = stock - d.cantidad
+                FROM (SELECT codigo_producto, SUM(cantidad) AS cantidad
+                      FROM detalle_ventas WHERE numero_venta=? GROUP BY codigo_producto) AS d
+                WHERE productos.codigo = d.codigo_producto
+            """, (num,))
+            cur.execute("""
+                INSERT INTO resumen_diario (fecha,cajero,num_ventas,total,ganancia,descuento) VALUES (?,?,1,?,?,?)
+                ON CONFLICT(fecha,cajero) DO UPDATE SET
+                    num_ventas=num_ventas+1, total=total+excluded.total,
+                    ganancia=ganancia+excluded.ganancia, descuento=descuento+excluded.descuento
+            """, (fecha[:10], cajero, total, ganancia, descuento))
+            acumular_ventas_producto(cur, num, fecha[:10])
             con.commit()
         return num
 
@@ -208,11 +205,15 @@ class DB:
         with self._conn() as con:
             cur = con.cursor()
             if fecha:
-                cur.execute("SELECT * FROM ventas WHERE fecha LIKE ? ORDER BY fecha DESC", (f"{fecha}%",))
+                cur.execute("SELECT * FROM ventas WHERE fecha >= ? AND fecha < ? ORDER BY fecha DESC", rango_fecha(fecha))
             else:
                 cur.execute("SELECT * FROM ventas ORDER BY fecha DESC LIMIT 200")
             return cur.fetchall()
 
+    def cargar_coocurrencia(self, coocurrencia):
+        with self._conn() as con:
+            coocurrencia.cargar_desde_bd(con.cursor())
+
     def get_detalle(self, num):
         with self._conn() as con:
             cur = con.cursor()
@@ -224,18 +225,24 @@ class DB:
         with self._conn() as con:
             cur = con.cursor()
             cur.execute(
-                "SELECT COUNT(*),COALESCE(SUM(total),0),COALESCE(SUM(ganancia),0) FROM ventas WHERE fecha LIKE ?",
-                (f"{hoy}%",)
+                "SELECT COALESCE(SUM(num_ventas),0),COALESCE(SUM(total),0),COALESCE(SUM(ganancia),0) FROM resumen_diario WHERE fecha=?",
+                (hoy,)
             )
             return cur.fetchone()
 
+    def reconstruir_resumen_diario(self):
+        with self._conn() as con:
+            reconstruir_resumen_diario(con)
+            reconstruir_ventas_producto(con)
+
     def top_productos(self, n=5):
         with self._conn() as con:
             cur = con.cursor()
+            # Acumulado por código: un producto renombrado no se divide
             cur.execute("""
-                SELECT nombre_producto, SUM(cantidad) AS total
-                FROM detalle_ventas GROUP BY nombre_producto
-                ORDER BY total DESC LIMIT ?
+                SELECT nombre AS nombre_producto, unidades AS total
+                FROM ventas_producto
+                ORDER BY unidades DESC LIMIT ?
             """, (n,))
             return cur.fetchall()
 
@@ -254,6 +261,9 @@ class App(tk.Tk):
         super().__init__()
         self.db = DB()
         self.carrito = []
+        self.promos = PROMOCIONES.nuevo_carrito()
+        self.coocurrencia = CoocurrenciaProductos()
+        self.db.cargar_coocurrencia(self.coocurrencia)
         self.cajero_var = tk.StringVar(value=CAJEROS[0])
         self.descuento_var = tk.DoubleVar(value=0.0)
 
@@ -402,6 +412,9 @@ class App(tk.Tk):
         self.lbl_total = tk.Label(tot, text="TOTAL:     $0.00", font=("Arial",13,"bold"),
                                    bg=COLORES["fondo"], fg=COLORES["primario"])
         self.lbl_total.pack(anchor="e")
+        self.lbl_sugerencias = tk.Label(tot, text="", font=("Arial",9,"italic"), bg=COLORES["fondo"],
+                                        fg=COLORES["secundario"], wraplength=300, justify="right")
+        self.lbl_sugerencias.pack(anchor="e", pady=(4,0))
 
         # Botones
         btns = tk.Frame(right, bg=COLORES["fondo"])
@@ -448,17 +461,24 @@ class App(tk.Tk):
                 it["cantidad"] = nueva
                 it["subtotal"] = round(nueva * it["precio"], 2)
                 it["ganancia"] = round(nueva * (it["precio"] - prod["costo"]), 2)
+                self.promos.actualizar_linea(codigo, it["categoria"], nueva, it["precio"])
                 self._render_carrito()
                 return
+        if not self.carrito:
+            # Reglas vigentes (happy hour) a la hora de la primera línea, no a la
+            # del arranque o de la venta anterior
+            self.promos = PROMOCIONES.nuevo_carrito()
         self.carrito.append({
             "codigo": codigo,
             "nombre": prod["nombre"],
             "precio": prod["precio_venta"],
             "costo": prod["costo"],
+            "categoria": prod["categoria"],
             "cantidad": cant,
             "subtotal": round(prod["precio_venta"] * cant, 2),
             "ganancia": round((prod["precio_venta"] - prod["costo"]) * cant, 2)
         })
+        self.promos.actualizar_linea(codigo, prod["categoria"], cant, prod["precio_venta"])
         self._render_carrito()
 
     def _quitar_del_carrito(self):
@@ -466,12 +486,14 @@ class App(tk.Tk):
         if not sel:
             return
         idx = int(sel[0])
-        del self.carrito[idx]
+        it = self.carrito.pop(idx)
+        self.promos.actualizar_linea(it["codigo"], it["categoria"], 0, it["precio"])
         self._render_carrito()
 
     def _vaciar_carrito(self):
         if self.carrito and messagebox.askyesno("Confirmar", "¿Vaciar el carrito?"):
             self.carrito.clear()
+            self.promos = PROMOCIONES.nuevo_carrito()
             self._render_carrito()
 
     def _render_carrito(self):
@@ -482,38 +504,55 @@ class App(tk.Tk):
                                       values=(it["nombre"], it["cantidad"],
                                               f"${it['precio']:.2f}", f"${it['subtotal']:.2f}"))
         self._recalcular()
+        self._refresh_sugerencias()
+
+    def _refresh_sugerencias(self):
+        codigos = [codigo for codigo, _, _ in self.coocurrencia.sugerencias(it["codigo"] for it in self.carrito)]
+        prods = self.db.get_productos_por_codigo(codigos)
+        nombres = [prods[c]["nombre"] for c in codigos if c in prods and prods[c]["stock"] > 0]
+        self.lbl_sugerencias.config(text=f"💡 Sugerencia: {', '.join(nombres)}" if nombres else "")
+
+    def _totales(self):
+        """Subtotal, descuento por promociones, descuento total y total del carrito.
+        El descuento manual se suma al de promociones; entre ambos no pasan de DESC_MAX."""
+        subtotal = round(sum(it["subtotal"] for it in self.carrito), 2)
+        desc_promo = self.promos.descuento()
+        desc_manual = subtotal * self.descuento_var.get() / 100
+        desc_amt = round(min(desc_promo + desc_manual, subtotal * DESC_MAX / 100), 2)
+        return subtotal, desc_promo, desc_amt, round(subtotal - desc_amt, 2)
 
     def _recalcular(self):
-        subtotal = sum(it["subtotal"] for it in self.carrito)
+        subtotal, desc_promo, desc_amt, total = self._totales()
         desc_pct = self.descuento_var.get()
-        desc_amt = round(subtotal * desc_pct / 100, 2)
-        total = round(subtotal - desc_amt, 2)
         self.lbl_subtotal.config(text=f"Subtotal:  {MONEDA}{subtotal:.2f}")
-        self.lbl_desc.config(text=f"Descuento: -{MONEDA}{desc_amt:.2f} ({desc_pct:.0f}%)")
+        if desc_promo:
+            self.lbl_desc.config(text=f"Descuento: -{MONEDA}{desc_amt:.2f} (promos {MONEDA}{desc_promo:.2f} + {desc_pct:.0f}%)")
+        else:
+            self.lbl_desc.config(text=f"Descuento: -{MONEDA}{desc_amt:.2f} ({desc_pct:.0f}%)")
         self.lbl_total.config(text=f"TOTAL:     {MONEDA}{total:.2f}")
 
     def _cobrar(self):
         if not self.carrito:
             messagebox.showwarning("Carrito vacío", "Agrega productos antes de cobrar.")
             return
-        subtotal = sum(it["subtotal"] for it in self.carrito)
-        desc_pct = self.descuento_var.get()
-        desc_amt = round(subtotal * desc_pct / 100, 2)
-        total = round(subtotal - desc_amt, 2)
+        subtotal, desc_promo, desc_amt, total = self._totales()
         ganancia = round(sum(it["ganancia"] for it in self.carrito) - desc_amt, 2)
         cajero = self.cajero_var.get()
 
+        promos = "".join(f"\n  🎁 {nombre}: -{MONEDA}{monto:.2f}" for nombre, monto in self.promos.aplicadas())
         confirmar = messagebox.askyesno(
             "Confirmar cobro",
-            f"Cajero: {cajero}\nTotal a cobrar: {MONEDA}{total:.2f}\n\n¿Confirmar venta?"
+            f"Cajero: {cajero}{promos}\nTotal a cobrar: {MONEDA}{total:.2f}\n\n¿Confirmar venta?"
         )
         if not confirmar:
             return
         try:
             num = self.db.guardar_venta(cajero, self.carrito, total, ganancia, desc_amt)
+            self.coocurrencia.agregar_ticket(it["codigo"] for it in self.carrito)
             messagebox.showinfo("✅ Venta completada",
                                 f"Venta #{num} registrada exitosamente.\nTotal cobrado: {MONEDA}{total:.2f}")
             self.carrito.clear()
+            self.promos = PROMOCIONES.nuevo_carrito()
             self._render_carrito()
             self._refresh_catalogo()
         except Exception as e:
@@ -795,3 +834,4 @@ class App(tk.Tk):
 if __name__ == "__main__":
     app = App()
     app.mainloop()
+    app.db.cerrar()
@@ -11,6 +11,11 @@ import json
 from datetime import datetime
 from sistema_gestion_productos import crear_catalogo_cafeteria
 from sistema_ventas_cafeteria import Venta, HistorialVentas, SistemaPOS
+from tickets import EscritorTickets, PlantillaTicket
+from archivo_tickets import ArchivoTickets
+from promociones import cargar_promociones
+from database import DB_PATH, AsignadorNumeros, inicializar_base_de_datos
+from analitica import CoocurrenciaProductos
 
 # ============================================================
 # COLORES Y ESTILOS
@@ -46,6 +51,67 @@ class CafeteriaApp:
         self.pos = SistemaPOS(self.gestor)
         self.cajero = "Cajero Principal"
         
+        # Promociones definidas en config.json (mismas reglas que la consola)
+        try:
+            with open("config.json", "r", encoding="utf-8") as archivo:
+                config = json.load(archivo)
+        except (OSError, json.JSONDecodeError):
+            config = {}
+        Venta.motor_promociones = cargar_promociones(
+            config.get("promociones"),
+            config.get("ventas", {}).get("descuento_maximo_permitido")
+        )
+        Venta.descuento_maximo = config.get("ventas", {}).get("descuento_maximo_permitido")
+        
+        # Plantilla de tickets con los datos del negocio (se compila una sola vez)
+        Venta.plantilla_ticket = PlantillaTicket(config.get("configuracion_general"))
+        
+        # Tickets: archivo segmentado y escritura en segundo plano según
+        # config.json, igual que la consola
+        config_ventas = config.get("ventas", {})
+        self.carpeta_tickets = config_ventas.get("carpeta_tickets") or "tickets"
+        Venta.archivo_tickets = None
+        Venta.escritor_tickets = None
+        if config_ventas.get("archivo_tickets_segmentado"):
+            Venta.archivo_tickets = ArchivoTickets(
+                self.carpeta_tickets,
+                tamano_segmento=(config_ventas.get("tamano_segmento_mb") or 16) * 1024 * 1024,
+                comprimir=bool(config_ventas.get("comprimir_tickets"))
+            )
+            # Los tickets sueltos de versiones anteriores también se pueden reimprimir
+            Venta.archivo_tickets.importar_archivos_sueltos()
+        if config_ventas.get("tickets_en_segundo_plano"):
+            Venta.escritor_tickets = EscritorTickets(config_ventas.get("capacidad_cola_tickets") or 256,
+                                                     archivo=Venta.archivo_tickets)
+        
+        # Base de datos: las ventas se guardan en base_datos.archivo y el historial
+        # incluye las de sesiones anteriores (leídas por páginas)
+        config_bd = config.get("base_datos", {})
+        self.db = inicializar_base_de_datos(self.gestor, config_bd.get("perfil_pragma", "equilibrado"),
+                                            config_bd.get("archivo") or DB_PATH)
+        if config_bd.get("escritura_diferida"):
+            self.db.activar_escritura_diferida(config_bd.get("ventana_grupo_ms", 2),
+                                               config_bd.get("lote_maximo_ventas", 64))
+        config_seguridad = config.get("seguridad", {})
+        if config_seguridad.get("registrar_log_actividades"):
+            self.db.activar_registro_actividades(
+                config_seguridad.get("carpeta_log"),
+                intervalo_ms=config_seguridad.get("log_intervalo_ms", 1000),
+                meses_retencion=config_seguridad.get("log_meses_retencion", 12),
+                tamano_maximo_mb=config_seguridad.get("log_tamano_maximo_mb", 50)
+            )
+        self.db.sincronizar_stock_a_gestor(self.gestor)
+        self.pos.db = self.db
+        self.pos.historial.vincular_base_datos(self.db)
+        self.pos.historial.max_en_memoria = config_ventas.get("ventas_en_memoria")
+        self.pos.historial.coocurrencia = CoocurrenciaProductos()
+        self.pos.historial.coocurrencia.cargar_desde_bd(self.db.cursor)
+        Venta.asignador_numeros = AsignadorNumeros(
+            self.db.ruta_db,
+            config.get("ventas", {}).get("bloque_numeros", 20),
+            config.get("ventas", {}).get("contador_inicial", Venta.contador_ventas)
+        )
+        
         # Variables
         self.carrito_items = []
         self.productos_filtrados = []
@@ -299,6 +365,16 @@ class CafeteriaApp:
                                  fg=COLORES['acento'])
         self.lbl_total.pack(side='right', padx=10)
         
+        # Sugerencias de productos que suelen comprarse juntos
+        self.lbl_sugerencias = tk.Label(frame,
+                                       text="",
+                                       font=('Arial', 10, 'italic'),
+                                       bg=COLORES['fondo'],
+                                       fg=COLORES['secundario'],
+                                       wraplength=350,
+                                       justify='left')
+        self.lbl_sugerencias.pack(fill='x', pady=(5, 0))
+        
         parent.grid_columnconfigure(1, weight=2)
     
     def crear_panel_acciones(self, parent):
@@ -411,7 +487,7 @@ class CafeteriaApp:
         self.lbl_productos.pack(side='right', padx=10)
         
         self.lbl_ventas = tk.Label(status,
-                                   text=f"Ventas hoy: {len(self.pos.historial.ventas)}",
+                                   text=f"Ventas hoy: {self.db.total_vendido_hoy()['num_ventas']}",
                                    font=('Arial', 9),
                                    bg=COLORES['secundario'],
                                    fg=COLORES['blanco'])
@@ -555,6 +631,7 @@ class CafeteriaApp:
         
         if not self.pos.venta_actual:
             self.lbl_total.config(text="$0.00")
+            self.lbl_sugerencias.config(text="")
             return
         
         # Cargar items
@@ -570,6 +647,17 @@ class CafeteriaApp:
         # Actualizar total
         total = self.pos.venta_actual.get_total()
         self.lbl_total.config(text=f"${total:.2f}")
+        self.actualizar_sugerencias()
+    
+    def actualizar_sugerencias(self):
+        """Muestra los productos que más se compran junto con los del carrito."""
+        codigos = [item['codigo'] for item in self.pos.venta_actual.get_items()]
+        nombres = []
+        for codigo, _, _ in self.pos.historial.coocurrencia.sugerencias(codigos):
+            producto = self.gestor.buscar_por_codigo(codigo)
+            if producto and producto.get_stock() > 0:
+                nombres.append(producto.get_nombre())
+        self.lbl_sugerencias.config(text=f"💡 Sugerencia: {', '.join(nombres)}" if nombres else "")
     
     def vaciar_carrito(self):
         """Vacía todo el carrito."""
@@ -603,13 +691,13 @@ class CafeteriaApp:
             return
         
         # Ventana de pago
-        VentanaPago(self.root, self.pos, self.actualizar_despues_venta)
+        VentanaPago(self.root, self.pos, self.actualizar_despues_venta, self.carpeta_tickets)
     
     def actualizar_despues_venta(self):
         """Actualiza la interfaz después de completar una venta."""
         self.actualizar_carrito()
         self.cargar_productos()
-        self.lbl_ventas.config(text=f"Ventas hoy: {len(self.pos.historial.ventas)}")
+        self.lbl_ventas.config(text=f"Ventas hoy: {self.db.total_vendido_hoy()['num_ventas']}")
         self.actualizar_status("✓ Venta completada exitosamente")
     
     # ============================================================
@@ -759,6 +847,18 @@ class CafeteriaApp:
         if messagebox.askyesno("Salir", "¿Guardar datos antes de salir?"):
             self.guardar_datos()
         
+        if self.gestor.persistir_cambios(self.db) is None:
+            pendientes = len(self.gestor.get_pendientes())
+            if not messagebox.askyesno("Error",
+                                       f"No se pudieron guardar {pendientes} productos modificados en la "
+                                       "base de datos.\n¿Salir de todas formas? (los cambios se perderán)"):
+                return
+        
+        if Venta.escritor_tickets:
+            Venta.escritor_tickets.cerrar()
+        if Venta.archivo_tickets:
+            Venta.archivo_tickets.cerrar()
+        self.db.cerrar()
         self.root.destroy()
 
 
@@ -769,9 +869,10 @@ class CafeteriaApp:
 class VentanaPago:
     """Ventana para procesar el pago."""
     
-    def __init__(self, parent, pos, callback):
+    def __init__(self, parent, pos, callback, carpeta_tickets="tickets"):
         self.pos = pos
         self.callback = callback
+        self.carpeta_tickets = carpeta_tickets
         
         self.ventana = tk.Toplevel(parent)
         self.ventana.title("💰 Procesar Pago")
@@ -800,7 +901,8 @@ class VentanaPago:
         frame_resumen.pack(fill='x', padx=20, pady=10)
         
         items = len(self.pos.venta_actual.get_items())
-        subtotal = self.pos.venta_actual.get_total()
+        subtotal = self.pos.venta_actual.get_subtotal()
+        total = self.pos.venta_actual.get_total()
         
         tk.Label(frame_resumen,
                 text=f"Productos: {items}",
@@ -812,6 +914,13 @@ class VentanaPago:
                 font=('Arial', 11),
                 bg=COLORES['fondo']).pack(anchor='w')
         
+        for nombre, monto in self.pos.venta_actual.get_promociones_aplicadas():
+            tk.Label(frame_resumen,
+                    text=f"🎁 {nombre}: -${monto:.2f}",
+                    font=('Arial', 11),
+                    bg=COLORES['fondo'],
+                    fg=COLORES['exito']).pack(anchor='w')
+        
         # Descuento
         frame_descuento = tk.LabelFrame(self.ventana,
                                        text="Descuento (Opcional)",
@@ -848,7 +957,7 @@ class VentanaPago:
                 fg=COLORES['blanco']).pack()
         
         self.lbl_total = tk.Label(frame_total,
-                                 text=f"${subtotal:.2f}",
+                                 text=f"${total:.2f}",
                                  font=('Arial', 28, 'bold'),
                                  bg=COLORES['primario'],
                                  fg=COLORES['acento'])
@@ -873,14 +982,12 @@ class VentanaPago:
         try:
             porcentaje = float(self.entry_descuento.get())
             if 0 <= porcentaje <= 100:
-                # Crear copia del total original
+                # La venta suma promociones y descuento manual con el tope configurado
                 venta = self.pos.venta_actual
-                total_original = sum(item['subtotal'] for item in venta.get_items())
-                descuento = (total_original * porcentaje) / 100
-                total_final = total_original - descuento
+                venta.aplicar_descuento(porcentaje)
                 
-                self.lbl_total.config(text=f"${total_final:.2f}")
-                messagebox.showinfo("Descuento", f"Descuento de ${descuento:.2f} aplicado")
+                self.lbl_total.config(text=f"${venta.get_total():.2f}")
+                messagebox.showinfo("Descuento", f"Descuento total: ${venta.get_descuento():.2f}")
             else:
                 messagebox.showerror("Error", "El descuento debe estar entre 0 y 100%")
         except ValueError:
@@ -896,19 +1003,29 @@ class VentanaPago:
             pass
         
         if self.pos.venta_actual.completar_venta():
-            # Mostrar ticket
-            ticket = self.pos.venta_actual.generar_ticket()
+            # Guardar en la base de datos (el commit corre mientras se arma el
+            # ticket; la venta está guardada cuando se resuelve el Future)
+            venta = self.pos.venta_actual
+            guardado = self.pos.db.encolar_venta(venta)
+            ticket = Venta.plantilla_ticket.renderizar(venta)
+            if not self.pos.confirmar_guardado(venta, guardado):
+                self.pos.venta_actual = None
+                messagebox.showerror("Error", f"La venta #{venta.get_numero_venta()} no se pudo guardar "
+                                              "en la base de datos.\nEl stock se restauró; vuelve a cobrarla.")
+                self.ventana.destroy()
+                self.callback()
+                return
             
             # Guardar ticket
-            self.pos.venta_actual.guardar_ticket()
+            venta.guardar_ticket(self.carpeta_tickets, ticket)
             
             # Agregar al historial
-            self.pos.historial.agregar_venta(self.pos.venta_actual)
+            self.pos.historial.agregar_venta(venta)
             
             # Limpiar venta actual
             self.pos.venta_actual = None
             
-            messagebox.showinfo("Éxito", "✅ Venta completada exitosamente\n\nTicket guardado en la carpeta 'tickets/'")
+            messagebox.showinfo("Éxito", f"✅ Venta completada exitosamente\n\nTicket guardado en '{self.carpeta_tickets}/'")
             
             self.ventana.destroy()
             self.callback()
@@ -966,8 +1083,8 @@ class VentanaHistorial:
         tree.pack(side='left', fill='both', expand=True, padx=20, pady=10)
         scrollbar.pack(side='right', fill='y', pady=10)
         
-        # Cargar ventas
-        for venta in self.historial.ventas:
+        # Cargar las ventas más recientes (las anteriores siguen en la BD)
+        for venta in self.historial.ventas_recientes(500):
             tree.insert('', 'end', values=(
                 venta.get_numero_venta(),
                 venta.get_fecha().strftime('%d/%m/%Y'),
@@ -1007,18 +1124,19 @@ class VentanaReporte:
                 bg=COLORES['fondo'],
                 fg=COLORES['primario']).pack(pady=20)
         
-        if not self.historial.ventas:
+        est = self.historial.estadisticas
+        if not est.cantidad:
             tk.Label(self.ventana,
                     text="No hay ventas registradas",
                     font=('Arial', 12),
                     bg=COLORES['fondo']).pack(pady=50)
             return
         
-        # Calcular estadísticas
-        total_ventas = len(self.historial.ventas)
-        monto_total = sum(v.get_total() for v in self.historial.ventas)
-        ganancia_total = sum(v.get_ganancia_total() for v in self.historial.ventas)
-        promedio = monto_total / total_ventas if total_ventas > 0 else 0
+        # Estadísticas acumuladas por el historial
+        total_ventas = est.cantidad
+        monto_total = est.total
+        ganancia_total = est.ganancia
+        promedio = est.media
         
         # Frame de datos
         frame = tk.Frame(self.ventana, bg=COLORES['fondo'])
@@ -1028,7 +1146,10 @@ class VentanaReporte:
             ("Total de ventas:", str(total_ventas)),
             ("Monto total vendido:", f"${monto_total:,.2f}"),
             ("Ganancia total:", f"${ganancia_total:,.2f}"),
-            ("Promedio por venta:", f"${promedio:.2f}")
+            ("Promedio por venta:", f"${promedio:.2f}"),
+            ("Desviación estándar:", f"${est.desviacion_estandar():.2f}"),
+            ("Ticket más alto:", f"${est.maximo:.2f}"),
+            ("Ticket más bajo:", f"${est.minimo:.2f}")
         ]
         
         for etiqueta, valor in datos:
@@ -1135,33 +1256,16 @@ class VentanaTopProductos:
                 bg=COLORES['fondo'],
                 fg=COLORES['primario']).pack(pady=20)
         
-        if not self.historial.ventas:
+        # Contadores mantenidos por el historial en cada venta
+        productos_ordenados = self.historial.productos_vendidos.top(10)
+        
+        if not productos_ordenados:
             tk.Label(self.ventana,
                     text="No hay ventas registradas",
                     font=('Arial', 12),
                     bg=COLORES['fondo']).pack(pady=50)
             return
         
-        # Calcular productos vendidos
-        productos_vendidos = {}
-        
-        for venta in self.historial.ventas:
-            for item in venta.get_items():
-                codigo = item['codigo']
-                if codigo not in productos_vendidos:
-                    productos_vendidos[codigo] = {
-                        'nombre': item['nombre'],
-                        'cantidad': 0,
-                        'monto': 0
-                    }
-                productos_vendidos[codigo]['cantidad'] += item['cantidad']
-                productos_vendidos[codigo]['monto'] += item['subtotal']
-        
-        # Ordenar
-        productos_ordenados = sorted(productos_vendidos.items(),
-                                    key=lambda x: x[1]['cantidad'],
-                                    reverse=True)
-        
         tree = ttk.Treeview(self.ventana,
                            columns=('#', 'Código', 'Producto', 'Cantidad', 'Monto'),
                            show='headings',
@@ -1186,7 +1290,7 @@ class VentanaTopProductos:
         scrollbar.pack(side='right', fill='y', pady=10)
         
         # Cargar top 10
-        for i, (codigo, datos) in enumerate(productos_ordenados[:10], 1):
+        for i, (codigo, datos) in enumerate(productos_ordenados, 1):
             tree.insert('', 'end', values=(
                 i,
                 codigo,
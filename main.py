@@ -11,7 +11,11 @@ import os
 import sys
 import json
 from datetime import datetime
-from database import BaseDatos, inicializar_base_de_datos
+from database import DB_PATH, BaseDatos, AsignadorNumeros, inicializar_base_de_datos
+from tickets import PlantillaTicket, EscritorTickets
+from archivo_tickets import ArchivoTickets
+from promociones import cargar_promociones
+from analitica import MapaCalorVentas, CoocurrenciaProductos
 
 # Importar módulos del sistema
 try:
@@ -78,11 +82,16 @@ class ConfiguracionSistema:
             },
             "ventas": {
                 "contador_inicial": 1000,
+                "bloque_numeros": 20,
+                "ventas_en_memoria": 500,
                 "descuento_maximo_permitido": 30,
                 "carpeta_tickets": "tickets"
             },
             "inventario": {
                 "stock_minimo_alerta": 10
+            },
+            "base_datos": {
+                "perfil_pragma": "equilibrado"
             }
         }
     
@@ -117,6 +126,7 @@ class SistemaIntegrado:
         self.config = ConfiguracionSistema()
         self.gestor_productos = None
         self.sistema_pos = None
+        self.archivo_tickets = None
         self.inicializado = False
     
     def inicializar(self):
@@ -134,17 +144,81 @@ class SistemaIntegrado:
         print("\n2. Inicializando sistema de ventas...")
         self.sistema_pos = SistemaPOS(self.gestor_productos)
         
-        # Configurar contador de ventas
-        contador_inicial = self.config.obtener("ventas", "contador_inicial")
-        if contador_inicial:
-            Venta.contador_ventas = contador_inicial
-        print(f"   ✓ Sistema POS listo (Contador inicial: {Venta.contador_ventas})")
+        print("   ✓ Sistema POS listo")
+        
+        # Plantilla de tickets con los datos del negocio (se compila una sola vez)
+        Venta.plantilla_ticket = PlantillaTicket(self.config.obtener("configuracion_general"))
+        
+        # Motor de promociones (las reglas se compilan una sola vez)
+        Venta.motor_promociones = cargar_promociones(
+            self.config.obtener("promociones"),
+            self.config.obtener("ventas", "descuento_maximo_permitido")
+        )
+        Venta.descuento_maximo = self.config.obtener("ventas", "descuento_maximo_permitido")
+        print(f"   ✓ {len(Venta.motor_promociones.reglas)} promociones activas")
+        
+        # Archivo segmentado de tickets (en lugar de un archivo por venta)
+        if self.config.obtener("ventas", "archivo_tickets_segmentado"):
+            self.archivo_tickets = ArchivoTickets(
+                self.config.obtener("ventas", "carpeta_tickets") or "tickets",
+                tamano_segmento=(self.config.obtener("ventas", "tamano_segmento_mb") or 16) * 1024 * 1024,
+                comprimir=bool(self.config.obtener("ventas", "comprimir_tickets"))
+            )
+            Venta.archivo_tickets = self.archivo_tickets
+            # Los tickets sueltos de versiones anteriores también se pueden reimprimir
+            self.archivo_tickets.importar_archivos_sueltos()
+            print(f"   ✓ Archivo de tickets listo ({self.archivo_tickets.cantidad()} tickets indexados)")
+        
+        # Escritura de tickets en segundo plano
+        if self.config.obtener("ventas", "tickets_en_segundo_plano"):
+            capacidad = self.config.obtener("ventas", "capacidad_cola_tickets") or 256
+            Venta.escritor_tickets = EscritorTickets(capacidad, archivo=self.archivo_tickets)
+            print(f"   ✓ Escritor de tickets en segundo plano (cola de {capacidad})")
 
           # ── BASE DE DATOS SQLITE ──────────────────────────────── NUEVO
         print("\n3. Inicializando base de datos SQLite...")
-        self.db = inicializar_base_de_datos(self.gestor_productos)
+        perfil = self.config.obtener("base_datos", "perfil_pragma") or "equilibrado"
+        self.db = inicializar_base_de_datos(self.gestor_productos, perfil,
+                                            self.config.obtener("base_datos", "archivo") or DB_PATH)
+        # Group commit: las ventas que llegan juntas comparten una transacción
+        if self.config.obtener("base_datos", "escritura_diferida"):
+            ventana = self.config.obtener("base_datos", "ventana_grupo_ms")
+            self.db.activar_escritura_diferida(
+                2 if ventana is None else ventana,
+                self.config.obtener("base_datos", "lote_maximo_ventas") or 64
+            )
+            print("   ✓ Escritura diferida de ventas (group commit)")
+        # Log de actividades en segundo plano, un archivo por mes
+        if self.config.obtener("seguridad", "registrar_log_actividades"):
+            seguridad = self.config.obtener("seguridad")
+            self.db.activar_registro_actividades(
+                seguridad.get("carpeta_log"),
+                intervalo_ms=seguridad.get("log_intervalo_ms", 1000),
+                meses_retencion=seguridad.get("log_meses_retencion", 12),
+                tamano_maximo_mb=seguridad.get("log_tamano_maximo_mb", 50)
+            )
+            self.db.registrar_log("SISTEMA", "Inicio del sistema")
+            print("   ✓ Registro de actividades en segundo plano")
         self.db.sincronizar_stock_a_gestor(self.gestor_productos)
         self.sistema_pos.db = self.db
+        self.sistema_pos.historial.vincular_base_datos(self.db)
+        self.sistema_pos.historial.max_en_memoria = self.config.obtener("ventas", "ventas_en_memoria")
+        
+        # Mapa de calor hora × día: se carga de la BD y se actualiza con cada venta
+        self.sistema_pos.historial.mapa_calor = MapaCalorVentas()
+        self.sistema_pos.historial.mapa_calor.cargar_desde_bd(self.db)
+        
+        # Productos que se compran juntos (sugerencias al agregar al carrito)
+        self.sistema_pos.historial.coocurrencia = CoocurrenciaProductos()
+        self.sistema_pos.historial.coocurrencia.cargar_desde_bd(self.db.cursor)
+        
+        # Números de venta reservados por bloques en la base de datos
+        # (continúan después de la última venta guardada, sin colisiones)
+        bloque = self.config.obtener("ventas", "bloque_numeros") or 20
+        Venta.asignador_numeros = AsignadorNumeros(
+            self.db.ruta_db, bloque, self.config.obtener("ventas", "contador_inicial") or Venta.contador_ventas
+        )
+        print(f"   ✓ Números de venta asignados por bloques de {bloque}")
         # ─────────────────────────────────────────────────────────────
         
         # Crear directorios necesarios
@@ -246,11 +320,14 @@ def menu_principal_integrado():
         print("  17. Reporte diario de ventas")
         print("  18. Reporte general de ventas")
         print("  19. Top productos más vendidos")
+        print("  27. Mapa de calor de ventas (hora × día)")
         
         print("\n💾 ARCHIVO Y RESPALDO:")
         print("  20. Guardar inventario en CSV")
         print("  21. Guardar historial de ventas en CSV")
         print("  22. Ver configuración del sistema")
+        print("  28. Reconstruir resúmenes de ventas (diario y por producto)")
+        print("  29. Ver registro de actividades")
         
         print("\n🎯 ACCESOS RÁPIDOS:")
         print("  23. Modo: Sistema de Ventas completo")
@@ -386,9 +463,9 @@ def menu_principal_integrado():
         elif opcion == "16":
             try:
                 numero = int(input("Número de venta: "))
-                venta = sistema.sistema_pos.historial.buscar_venta(numero)
-                if venta:
-                    venta.generar_ticket()
+                texto = sistema.sistema_pos.historial.texto_ticket(numero)
+                if texto:
+                    print(texto)
             except ValueError:
                 print("✗ Número inválido")
         
@@ -405,6 +482,26 @@ def menu_principal_integrado():
             except ValueError:
                 print("✗ Número inválido")
         
+        elif opcion == "27":
+            mapa = sistema.sistema_pos.historial.mapa_calor
+            print("Métrica: 1. Tickets  2. Ingresos  3. Unidades por categoría")
+            sub_opcion = input("Opción (default 1): ").strip() or "1"
+            if sub_opcion == "1":
+                mapa.mostrar("ventas")
+            elif sub_opcion == "2":
+                mapa.mostrar("ingresos")
+            elif sub_opcion == "3":
+                categorias = sorted(mapa.por_categoria)
+                for i, categoria in enumerate(categorias, 1):
+                    print(f"  {i}. {categoria}")
+                try:
+                    categoria = categorias[int(input("Categoría: ")) - 1]
+                    mapa.mostrar("unidades", categoria)
+                except (ValueError, IndexError):
+                    print("✗ Categoría inválida")
+            else:
+                print("✗ Opción inválida")
+        
         # === ARCHIVO Y RESPALDO ===
         elif opcion == "20":
             sistema.gestor_productos.guardar_csv()
@@ -419,6 +516,19 @@ def menu_principal_integrado():
             print(json.dumps(sistema.config.config, indent=2, ensure_ascii=False))
             print("="*70)
         
+        elif opcion == "28":
+            sistema.db.reconstruir_resumen_diario()
+            sistema.db.reconstruir_ventas_producto()
+            resumen = sistema.db.resumen_del_dia()
+            print(f"Hoy: {resumen['num_ventas']} ventas, ${resumen['total']:,.2f}")
+        
+        elif opcion == "29":
+            if sistema.db.registro:
+                tipo = input("Tipo (VENTA, PRODUCTO, INVENTARIO...; Enter para todos): ").strip().upper()
+                sistema.db.registro.mostrar(tipo or None)
+            else:
+                print("⚠️  El registro de actividades está desactivado (seguridad.registrar_log_actividades)")
+        
         # === ACCESOS RÁPIDOS ===
         elif opcion == "23":
             print("\n🔄 Cambiando a modo: Sistema de Ventas completo...")
@@ -450,10 +560,10 @@ def menu_principal_integrado():
             print("RESUMEN DE LA SESIÓN")
             print("="*70)
             print(f"Cajero:           {sistema.sistema_pos.cajero}")
-            print(f"Ventas realizadas: {len(sistema.sistema_pos.historial.ventas)}")
-            if sistema.sistema_pos.historial.ventas:
-                total_vendido = sum(v.get_total() for v in sistema.sistema_pos.historial.ventas)
-                print(f"Total vendido:    ${total_vendido:,.2f}")
+            estadisticas = sistema.sistema_pos.historial.estadisticas_sesion
+            print(f"Ventas realizadas: {estadisticas.cantidad}")
+            if estadisticas.cantidad:
+                print(f"Total vendido:    ${estadisticas.total:,.2f}")
             print("="*70)
             
             # Preguntar si guardar datos
@@ -462,10 +572,29 @@ def menu_principal_integrado():
                 sistema.gestor_productos.guardar_csv()
                 sistema.sistema_pos.historial.guardar_csv()
 
+            # Escribir los tickets pendientes antes de salir
+            if Venta.escritor_tickets:
+                Venta.escritor_tickets.cerrar()
+                Venta.escritor_tickets.mostrar_estadisticas()
+            if sistema.archivo_tickets:
+                sistema.archivo_tickets.cerrar()
+
                             # ── GUARDAR STOCK FINAL Y CERRAR BD ──────────────── NUEVO
-            sistema.db.sincronizar_productos_desde_gestor(
-                sistema.gestor_productos
-            )
+            if sistema.db.escritor:
+                sistema.db.escritor.cerrar()
+                sistema.db.escritor.mostrar_estadisticas()
+            guardados = sistema.gestor_productos.persistir_cambios(sistema.db)
+            if guardados is None:
+                pendientes = len(sistema.gestor_productos.get_pendientes())
+                print(f"✗ No se pudieron guardar {pendientes} productos modificados: "
+                      f"sus cambios de stock y precio no quedaron en la base de datos")
+            else:
+                print(f"✓ {guardados} productos modificados guardados en la base de datos")
+            if sistema.db.registro:
+                sistema.db.registrar_log("SISTEMA", "Cierre del sistema")
+                sistema.db.registro.vaciar()
+                sistema.db.registro.mostrar_estadisticas()
+                sistema.db.registro.cerrar()
             sistema.db.cerrar()
             # ─────────────────────────────────────────────────────────
             
@@ -479,7 +608,7 @@ def menu_principal_integrado():
             break
         
         else:
-            print("✗ Opción no válida. Por favor selecciona una opción del 1 al 26.")
+            print("✗ Opción no válida. Por favor selecciona una opción del 1 al 29.")
         
         # Pausa para que el usuario pueda leer el resultado
         if opcion not in ["23", "24", "26"]:
@@ -0,0 +1,505 @@
+"""
+MIGRACIONES DE ESQUEMA - CAFETERÍA
+Historial versionado de los esquemas de cafeteria.db (database.py) y gui.db (gui.py).
+La versión aplicada se guarda en PRAGMA user_version; al abrir una base sólo
+se ejecutan las migraciones pendientes y, si ya está al día, no se escribe nada.
+Autor: Sistema de Ventas
+Fecha: Octubre 2026
+"""
+
+TAMANO_LOTE = 5000  # Filas copiadas por transacción al reconstruir una tabla
+
+
+# ============================================================
+# DEFINICIONES COMPARTIDAS
+# ============================================================
+# {tabla} se reemplaza por el nombre real (o el temporal "<tabla>_nueva")
+
+TABLA_PRODUCTOS = """
+    CREATE TABLE IF NOT EXISTS {tabla} (
+        codigo       TEXT PRIMARY KEY,
+        nombre       TEXT NOT NULL,
+        costo        REAL NOT NULL DEFAULT 0,
+        precio_venta REAL NOT NULL DEFAULT 0,
+        stock        INTEGER NOT NULL DEFAULT 0,
+        categoria    TEXT NOT NULL DEFAULT 'General',
+        activo       INTEGER NOT NULL DEFAULT 1,
+        fecha_alta   TEXT NOT NULL
+    )
+"""
+
+TABLA_VENTAS = """
+    CREATE TABLE IF NOT EXISTS {tabla} (
+        id           INTEGER PRIMARY KEY AUTOINCREMENT,
+        numero_venta INTEGER UNIQUE NOT NULL,
+        fecha        TEXT NOT NULL,
+        cajero       TEXT NOT NULL,
+        total        REAL NOT NULL DEFAULT 0,
+        ganancia     REAL NOT NULL DEFAULT 0,
+        descuento    REAL NOT NULL DEFAULT 0,
+        estado       TEXT NOT NULL DEFAULT 'Completada'
+    )
+"""
+
+TABLA_DETALLE_VENTAS = """
+    CREATE TABLE IF NOT EXISTS {tabla} (
+        id               INTEGER PRIMARY KEY AUTOINCREMENT,
+        numero_venta     INTEGER NOT NULL,
+        codigo_producto  TEXT NOT NULL,
+        nombre_producto  TEXT NOT NULL,
+        cantidad         INTEGER NOT NULL,
+        precio_unitario  REAL NOT NULL,
+        subtotal         REAL NOT NULL,
+        ganancia_item    REAL NOT NULL,
+        FOREIGN KEY (numero_venta) REFERENCES ventas(numero_venta),
+        FOREIGN KEY (codigo_producto) REFERENCES productos(codigo)
+    )
+"""
+
+TABLA_CONFIG_CONTADOR = """
+    CREATE TABLE IF NOT EXISTS {tabla} (
+        clave TEXT PRIMARY KEY,
+        valor INTEGER NOT NULL
+    )
+"""
+
+# Totales por día y cajero de las ventas completadas; se actualiza en la
+# misma transacción que cada venta (fecha = 'YYYY-MM-DD')
+TABLA_RESUMEN_DIARIO = """
+    CREATE TABLE IF NOT EXISTS resumen_diario (
+        fecha      TEXT NOT NULL,
+        cajero     TEXT NOT NULL,
+        num_ventas INTEGER NOT NULL DEFAULT 0,
+        total      REAL NOT NULL DEFAULT 0,
+        ganancia   REAL NOT NULL DEFAULT 0,
+        descuento  REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (fecha, cajero)
+    ) WITHOUT ROWID
+"""
+
+# También es la tabla de cada partición mensual del registro de actividades
+# (database.RegistroActividades)
+TABLA_LOG_ACTIVIDADES = """
+    CREATE TABLE IF NOT EXISTS log_actividades (
+        id          INTEGER PRIMARY KEY AUTOINCREMENT,
+        fecha       TEXT NOT NULL,
+        tipo        TEXT NOT NULL,
+        descripcion TEXT NOT NULL,
+        usuario     TEXT DEFAULT 'Sistema'
+    )
+"""
+
+# Unidades, ingresos y ganancia vendidos por producto (total y por día) de las
+# ventas completadas; se actualizan en la misma transacción que cada venta.
+# La clave es el código: un producto renombrado no se divide en dos filas.
+TABLA_VENTAS_PRODUCTO = """
+    CREATE TABLE IF NOT EXISTS ventas_producto (
+        codigo   TEXT PRIMARY KEY,
+        nombre   TEXT NOT NULL,
+        unidades INTEGER NOT NULL DEFAULT 0,
+        ingresos REAL NOT NULL DEFAULT 0,
+        ganancia REAL NOT NULL DEFAULT 0
+    )
+"""
+
+TABLA_VENTAS_PRODUCTO_DIA = """
+    CREATE TABLE IF NOT EXISTS ventas_producto_dia (
+        fecha    TEXT NOT NULL,
+        codigo   TEXT NOT NULL,
+        unidades INTEGER NOT NULL DEFAULT 0,
+        ingresos REAL NOT NULL DEFAULT 0,
+        ganancia REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (fecha, codigo)
+    ) WITHOUT ROWID
+"""
+
+# Top de productos: recorre el índice en orden en lugar de ordenar la tabla
+INDICE_VENTAS_PRODUCTO = """
+    CREATE INDEX IF NOT EXISTS idx_ventas_producto_unidades
+    ON ventas_producto (unidades DESC)
+"""
+
+# Índices de las consultas de reportes de cafeteria.db.
+# Los que terminan en total/ganancia o cantidad/subtotal son de cobertura:
+# la consulta se resuelve leyendo sólo el índice, sin tocar la tabla.
+INDICES = {
+    # Ventas completadas por rango de fechas y paginación (fecha, numero_venta)
+    "idx_ventas_estado_fecha":
+        "ventas (estado, fecha, numero_venta, total, ganancia)",
+    # Paginación de las ventas de un cajero
+    "idx_ventas_estado_cajero_fecha":
+        "ventas (estado, cajero, fecha, numero_venta)",
+    # Detalle de una venta y pares de productos por ticket (co-ocurrencia)
+    "idx_detalle_venta_producto":
+        "detalle_ventas (numero_venta, codigo_producto)",
+}
+
+# Índices de gui.db (sus consultas no filtran por estado)
+INDICES_GUI = {
+    # Historial por fecha y resumen del día (cobertura: total, ganancia)
+    "idx_ventas_fecha":
+        "ventas (fecha, total, ganancia)",
+    # Detalle de una venta y co-ocurrencia de productos
+    "idx_detalle_venta_producto":
+        "detalle_ventas (numero_venta, codigo_producto)",
+}
+
+# Índices de los reportes de productos que ahora leen ventas_producto: ya no
+# sirven a ninguna consulta y sólo encarecen cada inserción en el detalle
+INDICES_OBSOLETOS = ("idx_detalle_producto_totales", "idx_detalle_nombre_cantidad")
+
+
+# ============================================================
+# UTILIDADES
+# ============================================================
+
+def _iniciar(conexion):
+    """Abre una transacción de escritura si no hay una en curso."""
+    if not conexion.in_transaction:
+        conexion.execute("BEGIN IMMEDIATE")
+
+
+def _columnas(conexion, tabla):
+    return {fila[1] for fila in conexion.execute(f"PRAGMA table_info({tabla})")}
+
+
+def _crear_indices(conexion, indices):
+    for nombre, definicion in indices.items():
+        conexion.execute(f"CREATE INDEX IF NOT EXISTS {nombre} ON {definicion}")
+
+
+def reconstruir_resumen_diario(conexion):
+    """Recalcula resumen_diario desde la tabla ventas (sin commit)."""
+    conexion.execute("DELETE FROM resumen_diario")
+    conexion.execute("""
+        INSERT INTO resumen_diario (fecha, cajero, num_ventas, total, ganancia, descuento)
+        SELECT substr(fecha, 1, 10), cajero, COUNT(*), SUM(total), SUM(ganancia), SUM(descuento)
+        FROM ventas
+        WHERE estado = 'Completada'
+        GROUP BY substr(fecha, 1, 10), cajero
+    """)
+
+
+def reconstruir_ventas_producto(conexion):
+    """Recalcula ventas_producto y ventas_producto_dia desde detalle_ventas (sin commit)."""
+    conexion.execute("DELETE FROM ventas_producto")
+    conexion.execute("DELETE FROM ventas_producto_dia")
+    # El nombre es el de la venta más reciente del producto: con MAX(d.id),
+    # SQLite toma nombre_producto de la misma fila que el máximo
+    conexion.execute("""
+        INSERT INTO ventas_producto (codigo, nombre, unidades, ingresos, ganancia)
+        SELECT codigo, nombre, unidades, ingresos, ganancia FROM (
+            SELECT d.codigo_producto AS codigo, d.nombre_producto AS nombre, MAX(d.id),
+                   SUM(d.cantidad) AS unidades, SUM(d.subtotal) AS ingresos,
+                   SUM(d.ganancia_item) AS ganancia
+            FROM detalle_ventas d
+            JOIN ventas v ON v.numero_venta = d.numero_venta
+            WHERE v.estado = 'Completada'
+            GROUP BY d.codigo_producto
+        )
+    """)
+    conexion.execute("""
+        INSERT INTO ventas_producto_dia (fecha, codigo, unidades, ingresos, ganancia)
+        SELECT substr(v.fecha, 1, 10), d.codigo_producto,
+               SUM(d.cantidad), SUM(d.subtotal), SUM(d.ganancia_item)
+        FROM detalle_ventas d
+        JOIN ventas v ON v.numero_venta = d.numero_venta
+        WHERE v.estado = 'Completada'
+        GROUP BY substr(v.fecha, 1, 10), d.codigo_producto
+    """)
+
+
+def acumular_ventas_producto(conexion, numero_venta, fecha):
+    """
+    Suma las líneas de una venta (ya insertadas en detalle_ventas) a
+    ventas_producto y ventas_producto_dia. fecha = 'YYYY-MM-DD'.
+    """
+    conexion.execute("""
+        INSERT INTO ventas_producto (codigo, nombre, unidades, ingresos, ganancia)
+        SELECT codigo_producto, MAX(nombre_producto), SUM(cantidad), SUM(subtotal), SUM(ganancia_item)
+        FROM detalle_ventas
+        WHERE numero_venta = ?
+        GROUP BY codigo_producto
+        ON CONFLICT(codigo) DO UPDATE SET
+            nombre   = excluded.nombre,
+            unidades = unidades + excluded.unidades,
+            ingresos = ingresos + excluded.ingresos,
+            ganancia = ganancia + excluded.ganancia
+    """, (numero_venta,))
+    conexion.execute("""
+        INSERT INTO ventas_producto_dia (fecha, codigo, unidades, ingresos, ganancia)
+        SELECT ?, codigo_producto, SUM(cantidad), SUM(subtotal), SUM(ganancia_item)
+        FROM detalle_ventas
+        WHERE numero_venta = ?
+        GROUP BY codigo_producto
+        ON CONFLICT(fecha, codigo) DO UPDATE SET
+            unidades = unidades + excluded.unidades,
+            ingresos = ingresos + excluded.ingresos,
+            ganancia = ganancia + excluded.ganancia
+    """, (fecha, numero_venta))
+
+
+def reconstruir_tabla(conexion, tabla, definicion, columnas, tamano_lote=TAMANO_LOTE):
+    """
+    Cambia restricciones de una tabla existente (SQLite no puede hacerlo con ALTER):
+    crea '<tabla>_nueva' con la definición, copia las filas por lotes de rowid
+    confirmando cada lote, borra la original y renombra la nueva.
+
+    columnas: {columna_nueva: expresión sobre la tabla original}. El rowid (y el
+    'id INTEGER PRIMARY KEY', que es su alias) se copia siempre, no se incluye.
+    La original no se toca hasta que la copia termina: si el proceso se
+    interrumpe, la siguiente ejecución descarta la '<tabla>_nueva' a medias y
+    copia de nuevo. El contador AUTOINCREMENT (sqlite_sequence) se conserva.
+    Los índices de la tabla se pierden: la migración debe recrearlos.
+    """
+    nueva = f"{tabla}_nueva"
+    _iniciar(conexion)
+    conexion.execute(f"DROP TABLE IF EXISTS {nueva}")
+    conexion.execute(definicion.format(tabla=nueva))
+
+    destino = ", ".join(columnas)
+    origen = ", ".join(columnas.values())
+    copiado = 0
+    maximo = conexion.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {tabla}").fetchone()[0]
+    while copiado < maximo:
+        hasta = copiado + tamano_lote
+        conexion.execute(f"""
+            INSERT INTO {nueva} (rowid, {destino})
+            SELECT rowid, {origen} FROM {tabla}
+            WHERE rowid > ? AND rowid <= ?
+        """, (copiado, hasta))
+        conexion.commit()
+        _iniciar(conexion)
+        copiado = hasta
+
+    # Las filas copiadas con rowid explícito sólo llevan el contador hasta el
+    # id más alto que queda; los ids de ventas borradas no deben reutilizarse
+    if conexion.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_sequence'").fetchone():
+        anterior = conexion.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (tabla,)).fetchone()
+        if anterior:
+            conexion.execute("DELETE FROM sqlite_sequence WHERE name = ?", (nueva,))
+            conexion.execute(f"""
+                INSERT INTO sqlite_sequence (name, seq)
+                VALUES (?, MAX(?, (SELECT COALESCE(MAX(rowid), 0) FROM {nueva})))
+            """, (nueva, anterior[0]))
+
+    # La original se borra antes de renombrar para que las referencias
+    # (FOREIGN KEY) de otras tablas sigan apuntando al nombre definitivo
+    conexion.execute(f"DROP TABLE {tabla}")
+    conexion.execute(f"ALTER TABLE {nueva} RENAME TO {tabla}")
+
+
+# ============================================================
+# MIGRACIONES DE cafeteria.db
+# ============================================================
+
+def _cafeteria_1(conexion, tamano_lote):
+    """Esquema base: productos, ventas, detalle, contador, totales por cajero, exportaciones y log."""
+    conexion.execute(TABLA_PRODUCTOS.format(tabla="productos"))
+    conexion.execute(TABLA_VENTAS.format(tabla="ventas"))
+    if "descuento" not in _columnas(conexion, "ventas"):
+        # Bases creadas antes de las promociones
+        conexion.execute("ALTER TABLE ventas ADD COLUMN descuento REAL NOT NULL DEFAULT 0")
+    conexion.execute(TABLA_DETALLE_VENTAS.format(tabla="detalle_ventas"))
+    conexion.execute(TABLA_CONFIG_CONTADOR.format(tabla="config_contador"))
+
+    # Totales acumulados por cajero (se actualizan en guardar_venta)
+    conexion.execute("""
+        CREATE TABLE IF NOT EXISTS totales_cajero (
+            cajero         TEXT PRIMARY KEY,
+            num_ventas     INTEGER NOT NULL DEFAULT 0,
+            total_vendido  REAL NOT NULL DEFAULT 0,
+            total_ganancia REAL NOT NULL DEFAULT 0
+        )
+    """)
+    if conexion.execute("SELECT COUNT(*) FROM totales_cajero").fetchone()[0] == 0:
+        # Calcular los totales a partir de las ventas existentes
+        conexion.execute("""
+            INSERT INTO totales_cajero (cajero, num_ventas, total_vendido, total_ganancia)
+            SELECT cajero, COUNT(*), SUM(total), SUM(ganancia)
+            FROM ventas
+            WHERE estado = 'Completada'
+            GROUP BY cajero
+        """)
+
+    # Marca de agua de cada archivo de exportación (último ventas.id exportado)
+    conexion.execute("""
+        CREATE TABLE IF NOT EXISTS exportaciones (
+            archivo   TEXT PRIMARY KEY,
+            ultimo_id INTEGER NOT NULL DEFAULT 0,
+            fecha     TEXT
+        )
+    """)
+
+    conexion.execute(TABLA_LOG_ACTIVIDADES)
+
+
+def _cafeteria_2(conexion, tamano_lote):
+    """Índices de cobertura para ventas y detalle_ventas."""
+    # Reemplazado por idx_detalle_venta_producto, que lo contiene como prefijo
+    conexion.execute("DROP INDEX IF EXISTS idx_detalle_numero_venta")
+    _crear_indices(conexion, INDICES)
+
+
+def _resumen_diario(conexion, tamano_lote):
+    """Tabla resumen_diario calculada con las ventas existentes."""
+    conexion.execute(TABLA_RESUMEN_DIARIO)
+    reconstruir_resumen_diario(conexion)
+
+
+def _ventas_producto(conexion, tamano_lote):
+    """Tablas ventas_producto y ventas_producto_dia calculadas con el detalle existente."""
+    conexion.execute(TABLA_VENTAS_PRODUCTO)
+    conexion.execute(TABLA_VENTAS_PRODUCTO_DIA)
+    conexion.execute(INDICE_VENTAS_PRODUCTO)
+    reconstruir_ventas_producto(conexion)
+
+
+def _quitar_indices_obsoletos(conexion, tamano_lote):
+    """Elimina los índices de reportes de productos reemplazados por ventas_producto."""
+    for nombre in INDICES_OBSOLETOS:
+        conexion.execute(f"DROP INDEX IF EXISTS {nombre}")
+
+
+MIGRACIONES_CAFETERIA = [
+    (1, "Esquema base", _cafeteria_1),
+    (2, "Índices de ventas y detalle", _cafeteria_2),
+    (3, "Resumen diario por cajero", _resumen_diario),
+    (4, "Ventas por producto", _ventas_producto),
+    (5, "Índices de productos obsoletos", _quitar_indices_obsoletos),
+]
+
+
+# ============================================================
+# MIGRACIONES DE gui.db
+# ============================================================
+
+def _gui_1(conexion, tamano_lote):
+    """Esquema original de la GUI (sin restricciones NOT NULL)."""
+    conexion.execute("""
+        CREATE TABLE IF NOT EXISTS productos (
+            codigo       TEXT PRIMARY KEY,
+            nombre       TEXT,
+            costo        REAL DEFAULT 0,
+            precio_venta REAL DEFAULT 0,
+            stock        INTEGER DEFAULT 0,
+            categoria    TEXT DEFAULT 'General',
+            activo       INTEGER DEFAULT 1,
+            fecha_alta   TEXT
+        )
+    """)
+    conexion.execute("""
+        CREATE TABLE IF NOT EXISTS ventas (
+            id           INTEGER PRIMARY KEY AUTOINCREMENT,
+            numero_venta INTEGER UNIQUE,
+            fecha        TEXT,
+            cajero       TEXT,
+            total        REAL DEFAULT 0,
+            ganancia     REAL DEFAULT 0,
+            descuento    REAL DEFAULT 0,
+            estado       TEXT DEFAULT 'Completada'
+        )
+    """)
+    conexion.execute("""
+        CREATE TABLE IF NOT EXISTS detalle_ventas (
+            id              INTEGER PRIMARY KEY AUTOINCREMENT,
+            numero_venta    INTEGER,
+            codigo_producto TEXT,
+            nombre_producto TEXT,
+            cantidad        INTEGER,
+            precio_unitario REAL,
+            subtotal        REAL,
+            ganancia_item   REAL
+        )
+    """)
+    conexion.execute("CREATE TABLE IF NOT EXISTS config_contador (clave TEXT PRIMARY KEY, valor INTEGER)")
+    conexion.execute("INSERT OR IGNORE INTO config_contador (clave, valor) VALUES ('ultimo_numero', 2000)")
+
+
+def _gui_2(conexion, tamano_lote):
+    """Mismas restricciones NOT NULL y valores por defecto que cafeteria.db."""
+    reconstruir_tabla(conexion, "productos", TABLA_PRODUCTOS, {
+        "codigo": "codigo",
+        "nombre": "COALESCE(nombre, codigo)",
+        "costo": "COALESCE(costo, 0)",
+        "precio_venta": "COALESCE(precio_venta, 0)",
+        "stock": "COALESCE(stock, 0)",
+        "categoria": "COALESCE(categoria, 'General')",
+        "activo": "COALESCE(activo, 1)",
+        "fecha_alta": "COALESCE(fecha_alta, datetime('now', 'localtime'))",
+    }, tamano_lote)
+    reconstruir_tabla(conexion, "ventas", TABLA_VENTAS, {
+        "numero_venta": "COALESCE(numero_venta, -id)",  # nunca debería faltar; se marca negativo
+        "fecha": "COALESCE(fecha, '')",
+        "cajero": "COALESCE(cajero, '')",
+        "total": "COALESCE(total, 0)",
+        "ganancia": "COALESCE(ganancia, 0)",
+        "descuento": "COALESCE(descuento, 0)",
+        "estado": "COALESCE(estado, 'Completada')",
+    }, tamano_lote)
+    reconstruir_tabla(conexion, "detalle_ventas", TABLA_DETALLE_VENTAS, {
+        "numero_venta": "COALESCE(numero_venta, 0)",
+        "codigo_producto": "COALESCE(codigo_producto, '')",
+        "nombre_producto": "COALESCE(nombre_producto, codigo_producto, '')",
+        "cantidad": "COALESCE(cantidad, 0)",
+        "precio_unitario": "COALESCE(precio_unitario, 0)",
+        "subtotal": "COALESCE(subtotal, 0)",
+        "ganancia_item": "COALESCE(ganancia_item, 0)",
+    }, tamano_lote)
+    reconstruir_tabla(conexion, "config_contador", TABLA_CONFIG_CONTADOR, {
+        "clave": "clave",
+        "valor": "COALESCE(valor, 0)",
+    }, tamano_lote)
+
+
+def _gui_3(conexion, tamano_lote):
+    """Índices del historial y del detalle."""
+    _crear_indices(conexion, INDICES_GUI)
+
+
+MIGRACIONES_GUI = [
+    (1, "Esquema base", _gui_1),
+    (2, "Restricciones NOT NULL como cafeteria.db", _gui_2),
+    (3, "Índices de historial y detalle", _gui_3),
+    (4, "Resumen diario por cajero", _resumen_diario),
+    (5, "Ventas por producto", _ventas_producto),
+    (6, "Índices de productos obsoletos", _quitar_indices_obsoletos),
+]
+
+
+# ============================================================
+# EJECUCIÓN
+# ============================================================
+
+def version_esquema(conexion):
+    return conexion.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrar(conexion, migraciones, nombre="base de datos", tamano_lote=TAMANO_LOTE):
+    """
+    Aplica en orden las migraciones con versión mayor a PRAGMA user_version.
+    Cada migración se confirma junto con su número de versión, así que un
+    fallo deja la base en la última versión completa. Las que reconstruyen
+    tablas (reconstruir_tabla) confirman además cada lote copiado; si fallan,
+    la versión no avanza y la siguiente ejecución las repite desde el inicio.
+    Devuelve la versión final.
+    """
+    version = version_esquema(conexion)
+    ultima = migraciones[-1][0]
+    if version >= ultima:
+        return version  # Al día: no se abre ninguna transacción
+
+    for numero, descripcion, funcion in migraciones:
+        if numero <= version:
+            continue
+        try:
+            _iniciar(conexion)
+            funcion(conexion, tamano_lote)
+            conexion.execute(f"PRAGMA user_version = {numero}")
+            conexion.commit()
+        except Exception as e:
+            conexion.rollback()
+            print(f"✗ Error en la migración {numero} de {nombre} ({descripcion}): {e}")
+            raise
+        print(f"✓ {nombre}: migración {numero} aplicada ({descripcion})")
+    return ultima
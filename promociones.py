@@ -0,0 +1,259 @@
+"""
+MOTOR DE PROMOCIONES - CAFETERÍA
+Reglas de descuento compiladas: combos, NxM (2x1), descuento por categoría y happy hour
+Autor: Sistema de Ventas
+Fecha: Octubre 2026
+"""
+
+from datetime import datetime
+
+# ============================================================
+# VENTANA HORARIA (HAPPY HOUR)
+# ============================================================
+
+class VentanaHoraria:
+    """Intervalo de horas y días de la semana en que una regla está vigente."""
+
+    def __init__(self, inicio="00:00", fin="23:59", dias=None):
+        self.inicio = self._minutos(inicio)
+        self.fin = self._minutos(fin)
+        self.dias = frozenset(dias) if dias is not None else frozenset(range(7))  # 0 = lunes
+
+    @staticmethod
+    def _minutos(hora):
+        horas, minutos = hora.split(":")
+        return int(horas) * 60 + int(minutos)
+
+    def contiene(self, momento):
+        """Indica si el momento cae dentro de la ventana (soporta horarios que cruzan medianoche)."""
+        minuto = momento.hour * 60 + momento.minute
+        if self.inicio <= self.fin:
+            return momento.weekday() in self.dias and self.inicio <= minuto < self.fin
+        if minuto >= self.inicio:
+            return momento.weekday() in self.dias
+        return (momento.weekday() - 1) % 7 in self.dias and minuto < self.fin
+
+
+# ============================================================
+# REGLAS
+# ============================================================
+
+class Regla:
+    """Base de todas las reglas: nombre, productos/categorías que la activan y horario."""
+
+    def __init__(self, nombre, codigos=(), categorias=(), horario=None):
+        self.nombre = nombre
+        self.codigos = tuple(codigos)
+        self.categorias = tuple(categorias)
+        self.horario = horario
+
+    def vigente(self, momento):
+        return self.horario is None or self.horario.contiene(momento)
+
+    def evaluar(self, carrito):
+        """Retorna el monto de descuento de la regla para el estado actual del carrito."""
+        raise NotImplementedError
+
+
+class ReglaPorcentaje(Regla):
+    """Porcentaje de descuento sobre productos o categorías (también happy hour)."""
+
+    def __init__(self, nombre, porcentaje, codigos=(), categorias=(), horario=None):
+        super().__init__(nombre, codigos, categorias, horario)
+        self.factor = porcentaje / 100
+
+    def evaluar(self, carrito):
+        base = sum(carrito.subtotal_codigo(c) for c in self.codigos)
+        base += sum(carrito.subtotal_categoria(c) for c in self.categorias)
+        return base * self.factor
+
+
+class ReglaNxM(Regla):
+    """Lleva N y paga M del mismo producto (2x1, 3x2...)."""
+
+    def __init__(self, nombre, codigos, lleva=2, paga=1, horario=None):
+        super().__init__(nombre, codigos, (), horario)
+        self.lleva = lleva
+        self.gratis = lleva - paga
+
+    def evaluar(self, carrito):
+        descuento = 0.0
+        for codigo in self.codigos:
+            cantidad, precio = carrito.linea(codigo)
+            descuento += (cantidad // self.lleva) * self.gratis * precio
+        return descuento
+
+
+class ReglaCombo(Regla):
+    """
+    Combo de varios componentes (por código o por categoría), p. ej. café + pan.
+    Se aplica un descuento fijo por cada combo completo en el carrito.
+    """
+
+    def __init__(self, nombre, componentes, descuento, horario=None):
+        codigos = [c["codigo"] for c in componentes if "codigo" in c]
+        categorias = [c["categoria"] for c in componentes if "categoria" in c]
+        super().__init__(nombre, codigos, categorias, horario)
+        self.componentes = [("codigo", c["codigo"]) if "codigo" in c else ("categoria", c["categoria"])
+                            for c in componentes]
+        self.descuento = descuento
+
+    def evaluar(self, carrito):
+        combos = min((carrito.linea(valor)[0] if tipo == "codigo" else carrito.cantidad_categoria(valor))
+                     for tipo, valor in self.componentes)
+        return combos * self.descuento
+
+
+# ============================================================
+# MOTOR (REGLAS COMPILADAS)
+# ============================================================
+
+class MotorPromociones:
+    """
+    Compila las reglas en índices por código de producto y por categoría.
+    Cada carrito sólo reevalúa las reglas indexadas bajo la línea que cambió.
+    """
+
+    def __init__(self, reglas=None, descuento_maximo=None):
+        self.reglas = list(reglas or [])
+        self.descuento_maximo = descuento_maximo  # Tope en % del subtotal
+        self._compilados = {}  # reglas vigentes -> (por_codigo, por_categoria)
+
+    def compilar(self, momento=None):
+        """Devuelve los índices de las reglas vigentes en el momento indicado."""
+        momento = momento or datetime.now()
+        vigentes = tuple(r for r in self.reglas if r.vigente(momento))
+        indices = self._compilados.get(vigentes)
+        if indices is None:
+            por_codigo, por_categoria = {}, {}
+            for regla in vigentes:
+                for codigo in regla.codigos:
+                    por_codigo.setdefault(codigo, []).append(regla)
+                for categoria in regla.categorias:
+                    por_categoria.setdefault(categoria, []).append(regla)
+            indices = ({k: tuple(v) for k, v in por_codigo.items()},
+                       {k: tuple(v) for k, v in por_categoria.items()})
+            self._compilados[vigentes] = indices
+        return indices
+
+    def nuevo_carrito(self, momento=None):
+        """Crea el evaluador incremental de un carrito con las reglas vigentes."""
+        return CarritoPromociones(self, momento)
+
+
+class CarritoPromociones:
+    """Estado incremental de promociones de un carrito."""
+
+    def __init__(self, motor, momento=None):
+        self.descuento_maximo = motor.descuento_maximo
+        self._por_codigo, self._por_categoria = motor.compilar(momento)
+        self._lineas = {}             # codigo -> (cantidad, precio, categoria)
+        self._cantidad_categoria = {}
+        self._subtotal_categoria = {}
+        self._subtotal = 0.0
+        self._montos = {}             # regla -> descuento actual
+        self._total = 0.0
+
+    # --- CONSULTAS USADAS POR LAS REGLAS ---
+    def linea(self, codigo):
+        cantidad, precio, _ = self._lineas.get(codigo, (0, 0.0, None))
+        return cantidad, precio
+
+    def subtotal_codigo(self, codigo):
+        cantidad, precio = self.linea(codigo)
+        return cantidad * precio
+
+    def cantidad_categoria(self, categoria):
+        return self._cantidad_categoria.get(categoria, 0)
+
+    def subtotal_categoria(self, categoria):
+        return self._subtotal_categoria.get(categoria, 0.0)
+
+    # --- ACTUALIZACIÓN ---
+    def _acumular(self, categoria, cantidad, monto):
+        self._cantidad_categoria[categoria] = self._cantidad_categoria.get(categoria, 0) + cantidad
+        self._subtotal_categoria[categoria] = self._subtotal_categoria.get(categoria, 0.0) + monto
+        self._subtotal += monto
+
+    def actualizar_linea(self, codigo, categoria, cantidad, precio):
+        """Registra la nueva cantidad de una línea (0 la elimina) y reevalúa sólo las reglas afectadas."""
+        anterior = self._lineas.pop(codigo, None)
+        if anterior:
+            self._acumular(anterior[2], -anterior[0], -anterior[0] * anterior[1])
+        if cantidad > 0:
+            self._lineas[codigo] = (cantidad, precio, categoria)
+            self._acumular(categoria, cantidad, cantidad * precio)
+
+        afectadas = self._por_codigo.get(codigo, ()) + self._por_categoria.get(categoria, ())
+        for regla in afectadas:
+            monto = round(regla.evaluar(self), 2)
+            self._total += monto - self._montos.get(regla, 0.0)
+            self._montos[regla] = monto
+
+    def vaciar(self):
+        """Elimina todas las líneas."""
+        self._lineas.clear()
+        self._cantidad_categoria.clear()
+        self._subtotal_categoria.clear()
+        self._subtotal = 0.0
+        self._montos.clear()
+        self._total = 0.0
+
+    # --- RESULTADOS ---
+    def descuento(self):
+        """Descuento total de promociones, limitado por el tope configurado."""
+        descuento = max(self._total, 0.0)
+        if self.descuento_maximo is not None:
+            descuento = min(descuento, self._subtotal * self.descuento_maximo / 100)
+        return round(descuento, 2)
+
+    def aplicadas(self):
+        """
+        Lista de (nombre de la promoción, monto) con descuento mayor a cero.
+        Si el tope recorta el descuento, los montos se reducen en proporción
+        para que sumen exactamente descuento().
+        """
+        aplicadas = [(regla.nombre, monto) for regla, monto in self._montos.items() if monto > 0]
+        bruto = sum(monto for _, monto in aplicadas)
+        descuento = self.descuento()
+        if not aplicadas or bruto <= descuento:
+            return aplicadas
+        factor = descuento / bruto
+        ajustadas = [(nombre, round(monto * factor, 2)) for nombre, monto in aplicadas]
+        # El redondeo se compensa en la última línea
+        nombre, monto = ajustadas[-1]
+        ajustadas[-1] = (nombre, round(monto + descuento - sum(m for _, m in ajustadas), 2))
+        return ajustadas
+
+
+# ============================================================
+# CARGA DESDE CONFIGURACIÓN
+# ============================================================
+
+def crear_regla(datos):
+    """Construye una regla a partir de un diccionario de config.json."""
+    horario = VentanaHoraria(**datos["horario"]) if datos.get("horario") else None
+    tipo = datos["tipo"]
+    nombre = datos.get("nombre", tipo)
+
+    if tipo in ("descuento_categoria", "happy_hour"):
+        return ReglaPorcentaje(nombre, datos["porcentaje"], datos.get("codigos", ()),
+                               datos.get("categorias", ()), horario)
+    if tipo == "nxm":
+        return ReglaNxM(nombre, datos["codigos"], datos.get("lleva", 2), datos.get("paga", 1), horario)
+    if tipo == "combo":
+        return ReglaCombo(nombre, datos["componentes"], datos["descuento"], horario)
+    raise ValueError(f"Tipo de promoción desconocido: '{tipo}'")
+
+
+def cargar_promociones(lista, descuento_maximo=None):
+    """Crea el motor con las promociones activas de la configuración."""
+    reglas = []
+    for datos in lista or []:
+        if not datos.get("activa", True):
+            continue
+        try:
+            reglas.append(crear_regla(datos))
+        except (KeyError, ValueError) as e:
+            print(f"✗ Promoción inválida '{datos.get('nombre', '?')}': {e}")
+    return MotorPromociones(reglas, descuento_maximo)
@@ -25,6 +25,10 @@ class Producto:
         self.__stock = int(stock)
         self.__categoria = categoria
         
+        # Campos modificados desde la última vez que se guardaron en la BD
+        self.__cambios = set()
+        self.__gestor = None  # GestorProductos al que se avisa del primer cambio
+        
         # Validaciones
         if self.__costo < 0:
             raise ValueError("El costo no puede ser negativo")
@@ -52,12 +56,37 @@ class Producto:
     def get_categoria(self):
         return self.__categoria
     
+    # --- SEGUIMIENTO DE CAMBIOS ---
+    def get_cambios(self):
+        """Campos modificados desde el último guardado ('nuevo' si nunca se guardó)."""
+        return frozenset(self.__cambios)
+    
+    def tiene_cambios(self):
+        return bool(self.__cambios)
+    
+    def limpiar_cambios(self):
+        self.__cambios.clear()
+    
+    def restaurar_guardado(self, stock, precio_venta):
+        """Toma el stock y el precio guardados en la BD; no cuenta como cambio."""
+        self.__stock = int(stock)
+        self.__precio_venta = float(precio_venta)
+    
+    def vincular_gestor(self, gestor):
+        self.__gestor = gestor
+    
+    def marcar_cambio(self, campo):
+        if not self.__cambios and self.__gestor is not None:
+            self.__gestor.registrar_cambio(self)
+        self.__cambios.add(campo)
+    
     # --- SETTERS ---
     def set_precio_venta(self, nuevo_precio):
         nuevo_precio = float(nuevo_precio)
         if nuevo_precio < 0:
             raise ValueError("El precio de venta no puede ser negativo")
         self.__precio_venta = nuevo_precio
+        self.marcar_cambio("precio_venta")
         print(f"✓ Precio actualizado a: ${nuevo_precio:.2f}")
     
     def set_costo(self, nuevo_costo):
@@ -65,6 +94,7 @@ class Producto:
         if nuevo_costo < 0:
             raise ValueError("El costo no puede ser negativo")
         self.__costo = nuevo_costo
+        self.marcar_cambio("costo")
         print(f"✓ Costo actualizado a: ${nuevo_costo:.2f}")
     
     def set_stock(self, nuevo_stock):
@@ -72,6 +102,7 @@ class Producto:
         if nuevo_stock < 0:
             raise ValueError("El stock no puede ser negativo")
         self.__stock = nuevo_stock
+        self.marcar_cambio("stock")
     
     # --- MÉTODOS DE CÁLCULO ---
     def calcular_ganancia(self):
@@ -92,6 +123,7 @@ class Producto:
             print("✗ Error: La cantidad debe ser mayor a cero")
             return False
         self.__stock += cantidad
+        self.marcar_cambio("stock")
         print(f"✓ Stock agregado: +{cantidad} | Total: {self.__stock}")
         return True
     
@@ -105,6 +137,7 @@ class Producto:
             return None
         
         self.__stock -= cantidad
+        self.marcar_cambio("stock")
         total = self.__precio_venta * cantidad
         ganancia = self.calcular_ganancia() * cantidad
         
@@ -156,10 +189,49 @@ class GestorProductos:
     
     def __init__(self):
         self.productos = []
+        self.__pendientes = {}  # codigo -> Producto con cambios sin guardar
     
     def agregar_producto(self, producto):
         """Agrega un producto al catálogo."""
         self.productos.append(producto)
+        producto.vincular_gestor(self)
+        producto.marcar_cambio("nuevo")
+    
+    # --- SEGUIMIENTO DE CAMBIOS ---
+    def registrar_cambio(self, producto):
+        """Lo llama Producto al modificarse por primera vez desde el último guardado."""
+        self.__pendientes[producto.get_codigo()] = producto
+    
+    def get_pendientes(self):
+        """Productos con cambios sin guardar en la base de datos."""
+        return list(self.__pendientes.values())
+    
+    def limpiar_cambios(self):
+        """Marca todo el catálogo como guardado (p. ej. tras cargarlo desde la BD)."""
+        for producto in self.__pendientes.values():
+            producto.limpiar_cambios()
+        self.__pendientes.clear()
+    
+    def marcar_guardados(self, productos):
+        """Marca como guardados sólo los productos indicados."""
+        for producto in productos:
+            producto.limpiar_cambios()
+            self.__pendientes.pop(producto.get_codigo(), None)
+    
+    def persistir_cambios(self, db):
+        """
+        Guarda en la base de datos sólo los productos modificados, en una
+        transacción. El costo depende de los cambios, no del tamaño del catálogo.
+        Retorna cuántos productos se guardaron, o None si hubo un error
+        (los cambios siguen pendientes para el próximo intento).
+        """
+        pendientes = self.get_pendientes()
+        if not pendientes:
+            return 0
+        if db.guardar_productos(pendientes) is None:
+            return None
+        self.marcar_guardados(pendientes)
+        return len(pendientes)
     
     def listar_productos(self):
         """Muestra todos los productos."""
@@ -285,7 +357,7 @@ class GestorProductos:
                         row['Stock'],
                         row['Categoria']
                     )
-                    self.productos.append(producto)
+                    self.agregar_producto(producto)
             print(f"✓ {len(self.productos)} productos cargados desde '{archivo}'")
         except Exception as e:
             print(f"✗ Error al cargar: {e}")
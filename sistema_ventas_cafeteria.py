@@ -7,9 +7,13 @@ Fecha: Febrero 2026
 """
 
 import csv
+import math
 import os
-from datetime import datetime
+from bisect import bisect_left, bisect_right, insort
+from collections import deque
+from datetime import datetime, time
 from sistema_gestion_productos import Producto, GestorProductos, crear_catalogo_cafeteria
+from tickets import PlantillaTicket
 
 # ============================================================
 # CLASE VENTA
@@ -19,17 +23,58 @@ class Venta:
     """Representa una venta individual con todos sus detalles."""
     
     contador_ventas = 1000  # Empezar desde 1000
+    plantilla_ticket = PlantillaTicket()  # main.py la reemplaza con los datos del negocio
+    escritor_tickets = None  # EscritorTickets opcional para guardar tickets en segundo plano
+    archivo_tickets = None   # ArchivoTickets opcional (segmentos en lugar de un archivo por venta)
+    motor_promociones = None # MotorPromociones opcional con las reglas de descuento
+    asignador_numeros = None # AsignadorNumeros (database.py): números únicos entre terminales
+    descuento_maximo = None  # Tope (% del subtotal) de promociones + descuento manual
     
     def __init__(self, cajero="Cajero General"):
         """Inicializa una nueva venta."""
-        Venta.contador_ventas += 1
-        self.__numero_venta = Venta.contador_ventas
+        if Venta.asignador_numeros:
+            self.__numero_venta = Venta.asignador_numeros.siguiente()
+        else:
+            Venta.contador_ventas += 1
+            self.__numero_venta = Venta.contador_ventas
         self.__fecha = datetime.now()
         self.__items = []
         self.__cajero = cajero
+        self.__subtotal = 0.0
         self.__total = 0.0
         self.__ganancia_total = 0.0
         self.__estado = "Pendiente"  # Pendiente, Completada, Cancelada
+        self.__porcentaje_manual = 0.0
+        self.__promociones = (self.motor_promociones.nuevo_carrito(self.__fecha)
+                              if self.motor_promociones else None)
+    
+    @classmethod
+    def desde_registro(cls, fila, detalle):
+        """
+        Reconstruye una venta guardada a partir de su fila en 'ventas' y sus
+        filas de 'detalle_ventas' (sin consumir un número nuevo).
+        """
+        venta = cls.__new__(cls)
+        venta.__numero_venta = fila['numero_venta']
+        venta.__fecha = datetime.strptime(fila['fecha'], "%Y-%m-%d %H:%M:%S")
+        venta.__cajero = fila['cajero']
+        venta.__items = [{
+            'codigo': d['codigo_producto'],
+            'nombre': d['nombre_producto'],
+            'precio_unitario': d['precio_unitario'],
+            'cantidad': d['cantidad'],
+            'subtotal': d['subtotal'],
+            'ganancia_unitaria': round(d['ganancia_item'] / d['cantidad'], 2) if d['cantidad'] else 0.0,
+            'ganancia_item': d['ganancia_item'],
+            'producto_obj': None  # El producto puede ya no estar en el catálogo
+        } for d in detalle]
+        venta.__total = fila['total']
+        venta.__subtotal = round(fila['total'] + (fila['descuento'] or 0), 2)
+        venta.__ganancia_total = fila['ganancia']
+        venta.__estado = fila['estado']
+        venta.__porcentaje_manual = 0.0
+        venta.__promociones = None
+        return venta
     
     # --- GETTERS ---
     def get_numero_venta(self):
@@ -44,9 +89,18 @@ class Venta:
     def get_cajero(self):
         return self.__cajero
     
+    def get_subtotal(self):
+        return self.__subtotal
+    
     def get_total(self):
         return self.__total
     
+    def get_descuento(self):
+        return round(self.__subtotal - self.__total, 2)
+    
+    def get_promociones_aplicadas(self):
+        return self.__promociones.aplicadas() if self.__promociones else []
+    
     def get_ganancia_total(self):
         return self.__ganancia_total
     
@@ -78,6 +132,7 @@ class Venta:
                 item['subtotal'] = round(item['cantidad'] * item['precio_unitario'], 2)
                 item['ganancia_item'] = round(item['cantidad'] * item['ganancia_unitaria'], 2)
                 print(f"✓ Cantidad actualizada a {nueva_cantidad}")
+                self.__actualizar_promociones(item)
                 self.__calcular_totales()
                 return True
         
@@ -98,6 +153,7 @@ class Venta:
         }
         
         self.__items.append(item)
+        self.__actualizar_promociones(item)
         self.__calcular_totales()
         print(f"✓ Agregado: {cantidad}x {producto.get_nombre()} - ${subtotal:.2f}")
         return True
@@ -108,6 +164,8 @@ class Venta:
             if item['codigo'] == codigo:
                 nombre = item['nombre']
                 self.__items.pop(i)
+                item['cantidad'] = 0
+                self.__actualizar_promociones(item)
                 self.__calcular_totales()
                 print(f"✓ Eliminado: {nombre}")
                 return True
@@ -131,6 +189,7 @@ class Venta:
                 item['cantidad'] = nueva_cantidad
                 item['subtotal'] = round(nueva_cantidad * item['precio_unitario'], 2)
                 item['ganancia_item'] = round(nueva_cantidad * item['ganancia_unitaria'], 2)
+                self.__actualizar_promociones(item)
                 self.__calcular_totales()
                 print(f"✓ Cantidad actualizada a {nueva_cantidad}")
                 return True
@@ -141,24 +200,53 @@ class Venta:
     def vaciar_carrito(self):
         """Vacía todo el carrito."""
         self.__items.clear()
+        if self.__promociones:
+            self.__promociones.vaciar()
         self.__calcular_totales()
         print("✓ Carrito vaciado")
     
+    def __actualizar_promociones(self, item):
+        """Informa al motor de promociones el cambio de una línea del carrito."""
+        if self.__promociones:
+            producto = item['producto_obj']
+            self.__promociones.actualizar_linea(item['codigo'], producto.get_categoria(),
+                                                item['cantidad'], item['precio_unitario'])
+    
     def __calcular_totales(self):
-        """Recalcula los totales de la venta."""
-        self.__total = sum(item['subtotal'] for item in self.__items)
-        self.__ganancia_total = sum(item['ganancia_item'] for item in self.__items)
+        """
+        Recalcula los totales de la venta. El descuento manual (% del
+        subtotal) se suma al de promociones y entre ambos no pasan de
+        descuento_maximo; la ganancia se reduce en el descuento total.
+        """
+        self.__subtotal = round(sum(item['subtotal'] for item in self.__items), 2)
+        descuento = self.__promociones.descuento() if self.__promociones else 0.0
+        descuento += self.__subtotal * self.__porcentaje_manual / 100
+        if self.descuento_maximo is not None:
+            descuento = min(descuento, self.__subtotal * self.descuento_maximo / 100)
+        descuento = round(descuento, 2)
+        self.__total = round(self.__subtotal - descuento, 2)
+        self.__ganancia_total = round(sum(item['ganancia_item'] for item in self.__items) - descuento, 2)
     
     # --- MÉTODOS DE FINALIZACIÓN ---
     def aplicar_descuento(self, porcentaje):
-        """Aplica un descuento porcentual al total."""
+        """
+        Aplica un descuento porcentual sobre el subtotal (reemplaza al anterior).
+        Se suma al de promociones, con el tope de descuento_maximo.
+        """
         if porcentaje < 0 or porcentaje > 100:
             print("✗ El descuento debe estar entre 0 y 100%")
             return False
+        if self.__estado == "Completada":
+            print("✗ Esta venta ya fue completada")
+            return False
         
-        descuento = (self.__total * porcentaje) / 100
-        self.__total = round(self.__total - descuento, 2)
-        print(f"✓ Descuento del {porcentaje}% aplicado: -${descuento:.2f}")
+        antes = self.get_descuento()
+        self.__porcentaje_manual = porcentaje
+        self.__calcular_totales()
+        print(f"✓ Descuento del {porcentaje}% aplicado: -${self.get_descuento() - antes:.2f}")
+        if self.descuento_maximo is not None and \
+                self.get_descuento() >= round(self.__subtotal * self.descuento_maximo / 100, 2) > 0:
+            print(f"⚠️  Descuento total limitado al {self.descuento_maximo}% del subtotal")
         return True
     
     def completar_venta(self):
@@ -191,6 +279,15 @@ class Venta:
         print("✓ Venta cancelada")
         return True
     
+    def revertir_venta(self):
+        """Devuelve al inventario el stock de una venta completada que no se pudo guardar."""
+        if self.__estado != "Completada":
+            return False
+        for item in self.__items:
+            item['producto_obj'].agregar_stock(item['cantidad'])
+        self.__estado = "Cancelada"
+        return True
+    
     # --- VISUALIZACIÓN ---
     def mostrar_carrito(self):
         """Muestra el contenido actual del carrito."""
@@ -213,47 +310,49 @@ class Venta:
         print("="*90 + "\n")
     
     def generar_ticket(self):
-        """Genera el ticket de venta."""
+        """Genera el ticket de venta y lo muestra en pantalla."""
         if not self.__items:
             print("✗ No hay items para generar ticket")
             return ""
         
-        ticket = []
-        ticket.append("\n" + "="*60)
-        ticket.append("             ☕ CAFETERÍA - TICKET DE VENTA ☕")
-        ticket.append("="*60)
-        ticket.append(f"Ticket #:     {self.__numero_venta}")
-        ticket.append(f"Fecha:        {self.__fecha.strftime('%d/%m/%Y %H:%M:%S')}")
-        ticket.append(f"Cajero:       {self.__cajero}")
-        ticket.append("="*60)
-        ticket.append(f"{'Producto':<35} {'Cant':<5} {'P.Unit':<10} {'Total':<10}")
-        ticket.append("-"*60)
-        
-        for item in self.__items:
-            ticket.append(f"{item['nombre']:<35} {item['cantidad']:<5} "
-                         f"${item['precio_unitario']:<9.2f} ${item['subtotal']:<9.2f}")
-        
-        ticket.append("-"*60)
-        ticket.append(f"{'SUBTOTAL:':<52} ${self.__total:.2f}")
-        ticket.append(f"{'TOTAL A PAGAR:':<52} ${self.__total:.2f}")
-        ticket.append("="*60)
-        ticket.append("         ¡Gracias por su compra! Vuelva pronto")
-        ticket.append("="*60 + "\n")
-        
-        ticket_texto = "\n".join(ticket)
+        ticket_texto = self.plantilla_ticket.renderizar(self)
         print(ticket_texto)
         return ticket_texto
     
-    def guardar_ticket(self, carpeta="tickets"):
-        """Guarda el ticket en un archivo."""
+    def guardar_ticket(self, carpeta="tickets", texto=None):
+        """
+        Guarda el ticket en un archivo.
+        Si hay un EscritorTickets configurado, el ticket se escribe en
+        segundo plano y este método regresa de inmediato. Si hay un
+        ArchivoTickets, el ticket se anexa a sus segmentos en lugar de
+        crear un archivo por venta. 'texto' permite reutilizar un ticket
+        ya renderizado con la plantilla.
+        """
+        if texto is None:
+            texto = self.plantilla_ticket.renderizar(self)
+        nombre_archivo = f"{carpeta}/ticket_{self.__numero_venta}_{self.__fecha.strftime('%Y%m%d_%H%M%S')}.txt"
+        
+        if self.escritor_tickets:
+            destino = self.__numero_venta if self.escritor_tickets.archivo else nombre_archivo
+            self.escritor_tickets.encolar(destino, texto)
+            print(f"✓ Ticket #{self.__numero_venta} en cola de escritura")
+            return destino
+        
+        if self.archivo_tickets:
+            try:
+                self.archivo_tickets.agregar(self.__numero_venta, texto)
+                print(f"✓ Ticket #{self.__numero_venta} archivado en '{self.archivo_tickets.carpeta}'")
+                return self.__numero_venta
+            except Exception as e:
+                print(f"✗ Error al archivar ticket: {e}")
+                return None
+        
         if not os.path.exists(carpeta):
             os.makedirs(carpeta)
         
-        nombre_archivo = f"{carpeta}/ticket_{self.__numero_venta}_{self.__fecha.strftime('%Y%m%d_%H%M%S')}.txt"
-        
         try:
             with open(nombre_archivo, 'w', encoding='utf-8') as file:
-                file.write(self.generar_ticket())
+                file.write(texto)
             print(f"✓ Ticket guardado en '{nombre_archivo}'")
             return nombre_archivo
         except Exception as e:
@@ -261,28 +360,342 @@ class Venta:
             return None
 
 
+# ============================================================
+# ESTADÍSTICAS ACUMULADAS
+# ============================================================
+
+class EstadisticasVentas:
+    """
+    Estadísticas de los totales de venta actualizadas en cada venta:
+    conteo, sumas, máximo, mínimo, media y varianza (algoritmo de Welford).
+    """
+    
+    def __init__(self):
+        self.cantidad = 0
+        self.total = 0.0
+        self.ganancia = 0.0
+        self.maximo = None
+        self.minimo = None
+        self.media = 0.0
+        self.__m2 = 0.0  # Suma de cuadrados de las diferencias con la media
+    
+    def agregar(self, monto, ganancia=0.0):
+        """Incorpora una venta."""
+        self.cantidad += 1
+        self.total += monto
+        self.ganancia += ganancia
+        self.maximo = monto if self.maximo is None else max(self.maximo, monto)
+        self.minimo = monto if self.minimo is None else min(self.minimo, monto)
+        delta = monto - self.media
+        self.media += delta / self.cantidad
+        self.__m2 += delta * (monto - self.media)
+    
+    def combinar(self, cantidad, total, ganancia, suma_cuadrados, maximo, minimo):
+        """
+        Incorpora un bloque de ventas ya agregado (p. ej. con SQL): conteo,
+        sumas, suma de cuadrados de los totales, máximo y mínimo.
+        """
+        if not cantidad:
+            return
+        media_bloque = total / cantidad
+        m2_bloque = max(suma_cuadrados - cantidad * media_bloque * media_bloque, 0.0)
+        n = self.cantidad + cantidad
+        delta = media_bloque - self.media
+        self.media += delta * cantidad / n
+        self.__m2 += m2_bloque + delta * delta * self.cantidad * cantidad / n
+        self.cantidad = n
+        self.total += total
+        self.ganancia += ganancia
+        self.maximo = maximo if self.maximo is None else max(self.maximo, maximo)
+        self.minimo = minimo if self.minimo is None else min(self.minimo, minimo)
+    
+    def varianza(self):
+        """Varianza muestral de los totales (0 con menos de dos ventas)."""
+        return self.__m2 / (self.cantidad - 1) if self.cantidad > 1 else 0.0
+    
+    def desviacion_estandar(self):
+        return math.sqrt(self.varianza())
+
+
+class ContadorProductos:
+    """
+    Cantidad y monto vendidos por producto, actualizados en cada venta.
+    Los códigos se mantienen ordenados por cantidad: como los contadores
+    sólo crecen, cada actualización sube el producto unas pocas posiciones
+    y el top-k es un corte de la lista.
+    """
+    
+    def __init__(self):
+        self.__datos = {}      # codigo -> {'nombre', 'cantidad', 'monto'}
+        self.__ranking = []    # códigos ordenados por cantidad (mayor primero)
+        self.__posicion = {}   # codigo -> índice en __ranking
+    
+    def agregar(self, codigo, nombre, cantidad, monto):
+        """Suma una línea de venta al contador del producto."""
+        datos = self.__datos.get(codigo)
+        if datos is None:
+            datos = self.__datos[codigo] = {'nombre': nombre, 'cantidad': 0, 'monto': 0.0}
+            self.__posicion[codigo] = len(self.__ranking)
+            self.__ranking.append(codigo)
+        datos['cantidad'] += cantidad
+        datos['monto'] += monto
+        self.__subir(codigo)
+    
+    def __subir(self, codigo):
+        """Recoloca el producto en el ranking tras aumentar su cantidad."""
+        ranking, posicion, datos = self.__ranking, self.__posicion, self.__datos
+        cantidad = datos[codigo]['cantidad']
+        i = posicion[codigo]
+        while i > 0 and datos[ranking[i - 1]]['cantidad'] < cantidad:
+            ranking[i] = ranking[i - 1]
+            posicion[ranking[i]] = i
+            i -= 1
+        ranking[i] = codigo
+        posicion[codigo] = i
+    
+    def top(self, k=10):
+        """Los k productos más vendidos: [(codigo, {'nombre', 'cantidad', 'monto'}), ...]."""
+        return [(codigo, dict(self.__datos[codigo])) for codigo in self.__ranking[:k]]
+    
+    def obtener(self, codigo):
+        datos = self.__datos.get(codigo)
+        return dict(datos) if datos else None
+
+
 # ============================================================
 # CLASE HISTORIAL DE VENTAS
 # ============================================================
 
 class HistorialVentas:
-    """Administra el historial completo de ventas."""
+    """
+    Administra el historial completo de ventas.
+    Con max_en_memoria y una base de datos vinculada, sólo las ventas más
+    recientes se conservan en memoria; las anteriores se leen por páginas
+    de SQLite con la misma API (listar, buscar, reportes).
+    """
     
-    def __init__(self):
-        self.ventas = []
+    TAMANO_PAGINA = 200
+    
+    def __init__(self, max_en_memoria=None):
+        self.ventas = deque()
+        self.max_en_memoria = max_en_memoria  # None = sin límite
+        self.__ventas_por_dia = {}  # date -> ventas del día ordenadas por hora
+        self.__dias = []            # días con ventas, ordenados
+        self.__por_cajero = {}      # cajero -> ventas y totales acumulados
+        self.__por_numero = {}      # numero_venta -> Venta
+        self.estadisticas = EstadisticasVentas()
+        self.estadisticas_sesion = EstadisticasVentas()  # Sólo las ventas de esta ejecución
+        self.productos_vendidos = ContadorProductos()
+        self.db = None              # BaseDatos opcional para ventas que ya no están en memoria
+        self.mapa_calor = None      # MapaCalorVentas opcional (analitica.py)
+        self.coocurrencia = None    # CoocurrenciaProductos opcional (analitica.py)
+        self.__primera_fecha = None # Venta más antigua del historial
+        self.__limite_bd = None     # Venta más reciente que salió de memoria
     
     def agregar_venta(self, venta):
         """Registra una venta en el historial."""
         if venta.get_estado() == "Completada":
             self.ventas.append(venta)
+            self.__por_numero[venta.get_numero_venta()] = venta
+            self.estadisticas.agregar(venta.get_total(), venta.get_ganancia_total())
+            self.estadisticas_sesion.agregar(venta.get_total(), venta.get_ganancia_total())
+            for item in venta.get_items():
+                self.productos_vendidos.agregar(item['codigo'], item['nombre'],
+                                                item['cantidad'], item['subtotal'])
+            self.__indexar_por_dia(venta)
+            self.__acumular_cajero(venta)
+            if self.mapa_calor:
+                self.mapa_calor.agregar_venta(venta)
+            if self.coocurrencia:
+                self.coocurrencia.agregar_venta(venta)
+            if self.__primera_fecha is None or venta.get_fecha() < self.__primera_fecha:
+                self.__primera_fecha = venta.get_fecha()
+            self.__desalojar()
+    
+    # --- VINCULACIÓN CON LA BASE DE DATOS ---
+    def vincular_base_datos(self, db):
+        """
+        Vincula el historial con la base de datos y carga con consultas
+        agregadas los totales de todas las ventas ya guardadas (estadísticas,
+        productos, cajeros). Las ventas en sí no se cargan: se leen por
+        páginas cuando un listado o reporte las necesita.
+        Debe llamarse al iniciar, antes de registrar ventas nuevas.
+        """
+        self.db = db
+        resumen = db.resumen_historial()
+        if not resumen['cantidad']:
+            return
+        
+        self.estadisticas.combinar(resumen['cantidad'], resumen['total'], resumen['ganancia'],
+                                   resumen['suma_cuadrados'], resumen['maximo'], resumen['minimo'])
+        for fila in db.totales_por_producto():
+            self.productos_vendidos.agregar(fila['codigo_producto'], fila['nombre_producto'],
+                                            fila['total_vendido'], fila['total_ingresos'])
+        for fila in db.reporte_ventas_por_cajero():
+            self.__por_cajero[fila['cajero']] = {
+                'ventas': [], 'cantidad': fila['num_ventas'],
+                'total': fila['total_vendido'], 'ganancia': fila['total_ganancia']
+            }
+        
+        # Todo lo guardado hasta ahora se consulta en la BD
+        formato = "%Y-%m-%d %H:%M:%S"
+        self.__primera_fecha = datetime.strptime(resumen['primera_fecha'], formato)
+        self.__limite_bd = datetime.strptime(resumen['ultima_fecha'], formato)
+        print(f"✓ Historial vinculado: {resumen['cantidad']} ventas en la base de datos")
+    
+    # --- VENTANA EN MEMORIA ---
+    def __desalojar(self):
+        """
+        Saca de memoria las ventas más antiguas que excedan la ventana.
+        Sólo con base de datos vinculada: de ahí se vuelven a leer.
+        Los totales acumulados no cambian.
+        """
+        if not self.max_en_memoria or not self.db:
+            return
+        while len(self.ventas) > self.max_en_memoria:
+            venta = self.ventas.popleft()
+            del self.__por_numero[venta.get_numero_venta()]
+            
+            dia = venta.get_fecha().date()
+            ventas_dia = self.__ventas_por_dia[dia]
+            ventas_dia.remove(venta)
+            if not ventas_dia:
+                del self.__ventas_por_dia[dia]
+                del self.__dias[bisect_left(self.__dias, dia)]
+            self.__por_cajero[venta.get_cajero()]['ventas'].remove(venta)
+            
+            if self.__limite_bd is None or venta.get_fecha() > self.__limite_bd:
+                self.__limite_bd = venta.get_fecha()
+    
+    def __ventas_bd(self, desde=None, hasta=None, cajero=None, descendente=False, limite=None):
+        """
+        Ventas que ya salieron de memoria, leídas de la BD por páginas
+        (paginación por clave sobre fecha y número de venta).
+        """
+        if self.__limite_bd is None:
+            return
+        desde = max(desde, self.__primera_fecha) if desde else self.__primera_fecha
+        hasta = min(hasta, self.__limite_bd) if hasta else self.__limite_bd
+        if desde > hasta:
+            return
+        
+        formato = "%Y-%m-%d %H:%M:%S"
+        cursor_pagina = None
+        entregadas = 0
+        while True:
+            tamano = self.TAMANO_PAGINA if limite is None else min(self.TAMANO_PAGINA, limite - entregadas)
+            filas = self.db.obtener_ventas_paginadas(
+                tamano, cursor_pagina, desde.strftime(formato), hasta.strftime(formato),
+                cajero, descendente
+            )
+            if not filas:
+                return
+            detalles = self.db.obtener_detalles_ventas([f['numero_venta'] for f in filas])
+            for fila in filas:
+                if fila['numero_venta'] in self.__por_numero:
+                    continue  # Sigue en memoria
+                yield Venta.desde_registro(fila, detalles.get(fila['numero_venta'], []))
+                entregadas += 1
+            if len(filas) < tamano or (limite is not None and entregadas >= limite):
+                return
+            cursor_pagina = (filas[-1]['fecha'], filas[-1]['numero_venta'])
+    
+    def ventas_recientes(self, limite):
+        """Las últimas 'limite' ventas, de la más antigua a la más reciente."""
+        recientes = list(self.ventas)[-limite:]
+        faltan = limite - len(recientes)
+        if faltan > 0:
+            anteriores = list(self.__ventas_bd(descendente=True, limite=faltan))
+            recientes = anteriores[::-1] + recientes
+        return recientes
+    
+    def iterar_ventas(self):
+        """Recorre todas las ventas en orden: primero las de la BD, luego las de memoria."""
+        yield from self.__ventas_bd()
+        yield from self.ventas
+    
+    # --- ÍNDICE POR DÍA ---
+    @staticmethod
+    def __dia(fecha):
+        return fecha.date() if isinstance(fecha, datetime) else fecha
+    
+    def __indexar_por_dia(self, venta):
+        """Agrega la venta al bucket de su día, manteniendo el orden por hora."""
+        dia = venta.get_fecha().date()
+        ventas_dia = self.__ventas_por_dia.get(dia)
+        if ventas_dia is None:
+            ventas_dia = self.__ventas_por_dia[dia] = []
+            insort(self.__dias, dia)
+        if ventas_dia and ventas_dia[-1].get_fecha() > venta.get_fecha():
+            insort(ventas_dia, venta, key=Venta.get_fecha)
+        else:
+            ventas_dia.append(venta)
+    
+    # --- ÍNDICE POR CAJERO ---
+    def __acumular_cajero(self, venta):
+        """Agrega la venta al índice de su cajero y actualiza sus totales."""
+        datos = self.__por_cajero.get(venta.get_cajero())
+        if datos is None:
+            datos = self.__por_cajero[venta.get_cajero()] = {
+                'ventas': [], 'cantidad': 0, 'total': 0.0, 'ganancia': 0.0
+            }
+        datos['ventas'].append(venta)
+        datos['cantidad'] += 1
+        datos['total'] += venta.get_total()
+        datos['ganancia'] += venta.get_ganancia_total()
+    
+    def resumen_cajero(self, cajero):
+        """Cantidad de ventas, monto y ganancia acumulados de un cajero (cierre de turno)."""
+        datos = self.__por_cajero.get(cajero)
+        if datos is None:
+            return {'cajero': cajero, 'cantidad': 0, 'total': 0.0, 'ganancia': 0.0}
+        return {'cajero': cajero, 'cantidad': datos['cantidad'],
+                'total': round(datos['total'], 2), 'ganancia': round(datos['ganancia'], 2)}
+    
+    def ranking_cajeros(self):
+        """Cajeros ordenados por monto vendido."""
+        return sorted((self.resumen_cajero(cajero) for cajero in self.__por_cajero),
+                      key=lambda r: r['total'], reverse=True)
+    
+    def ventas_del_dia(self, fecha):
+        """Ventas de un día (datetime o date), ordenadas por hora."""
+        dia = self.__dia(fecha)
+        if self.__limite_bd is not None and dia <= self.__limite_bd.date():
+            return self.ventas_en_rango(dia, dia)
+        return list(self.__ventas_por_dia.get(dia, ()))
+    
+    def ventas_en_rango(self, inicio, fin):
+        """
+        Ventas entre dos fechas, inclusive. Con datetime se respeta la hora;
+        con date se toma el día completo. Sólo recorre los días del rango.
+        """
+        dia_inicio, dia_fin = self.__dia(inicio), self.__dia(fin)
+        desde_dia = bisect_left(self.__dias, dia_inicio)
+        hasta_dia = bisect_right(self.__dias, dia_fin)
+        
+        resultado = []
+        if self.__limite_bd is not None and dia_inicio <= self.__limite_bd.date():
+            desde_bd = inicio if isinstance(inicio, datetime) else datetime.combine(dia_inicio, time.min)
+            hasta_bd = fin if isinstance(fin, datetime) else datetime.combine(dia_fin, time.max)
+            resultado.extend(self.__ventas_bd(desde_bd, hasta_bd))
+        
+        for dia in self.__dias[desde_dia:hasta_dia]:
+            ventas_dia = self.__ventas_por_dia[dia]
+            desde, hasta = 0, len(ventas_dia)
+            if dia == dia_inicio and isinstance(inicio, datetime):
+                desde = bisect_left(ventas_dia, inicio, key=Venta.get_fecha)
+            if dia == dia_fin and isinstance(fin, datetime):
+                hasta = bisect_right(ventas_dia, fin, key=Venta.get_fecha)
+            resultado.extend(ventas_dia[desde:hasta])
+        return resultado
     
     def listar_ventas(self, limite=None):
         """Lista todas las ventas registradas."""
-        if not self.ventas:
+        if not self.estadisticas.cantidad:
             print("No hay ventas registradas")
             return
         
-        ventas_mostrar = self.ventas[-limite:] if limite else self.ventas
+        ventas_mostrar = self.ventas_recientes(limite) if limite else self.iterar_ventas()
         
         print("\n" + "="*90)
         print("HISTORIAL DE VENTAS")
@@ -298,17 +711,34 @@ class HistorialVentas:
         print("="*90 + "\n")
     
     def buscar_venta(self, numero_venta):
-        """Busca una venta por número."""
-        for venta in self.ventas:
-            if venta.get_numero_venta() == numero_venta:
-                return venta
+        """Busca una venta por número (en memoria y, si no está, en la base de datos)."""
+        venta = self.__por_numero.get(numero_venta)
+        if venta is not None:
+            return venta
+        
+        if self.db:
+            fila = self.db.obtener_venta(numero_venta)
+            if fila:
+                return Venta.desde_registro(fila, self.db.obtener_detalle_venta(numero_venta))
+        
         print(f"✗ Venta #{numero_venta} no encontrada")
         return None
     
+    def texto_ticket(self, numero_venta):
+        """
+        Texto del ticket para reimprimir: primero el archivo de tickets
+        (copia exacta del original), luego la venta en memoria o en la BD.
+        """
+        if Venta.archivo_tickets:
+            texto = Venta.archivo_tickets.leer(numero_venta)
+            if texto:
+                return texto
+        venta = self.buscar_venta(numero_venta)
+        return Venta.plantilla_ticket.renderizar(venta) if venta else None
+    
     def ventas_por_fecha(self, fecha):
         """Filtra ventas por fecha específica."""
-        ventas_fecha = [v for v in self.ventas 
-                       if v.get_fecha().date() == fecha.date()]
+        ventas_fecha = self.ventas_del_dia(fecha)
         
         if not ventas_fecha:
             print(f"No hay ventas para la fecha {fecha.strftime('%d/%m/%Y')}")
@@ -322,18 +752,17 @@ class HistorialVentas:
     
     def ventas_por_cajero(self, cajero):
         """Filtra ventas por cajero."""
-        ventas_cajero = [v for v in self.ventas if v.get_cajero() == cajero]
+        datos = self.__por_cajero.get(cajero)
         
-        if not ventas_cajero:
+        if datos is None:
             print(f"No hay ventas del cajero '{cajero}'")
             return []
         
-        total = sum(v.get_total() for v in ventas_cajero)
         print(f"\nVentas de {cajero}:")
-        print(f"  Total ventas: {len(ventas_cajero)}")
-        print(f"  Monto total: ${total:.2f}")
+        print(f"  Total ventas: {datos['cantidad']}")
+        print(f"  Monto total: ${datos['total']:.2f}")
         
-        return ventas_cajero
+        return list(self.__ventas_bd(cajero=cajero)) + datos['ventas']
     
     # --- REPORTES ---
     def reporte_diario(self, fecha=None):
@@ -341,8 +770,7 @@ class HistorialVentas:
         if fecha is None:
             fecha = datetime.now()
         
-        ventas_dia = [v for v in self.ventas 
-                     if v.get_fecha().date() == fecha.date()]
+        ventas_dia = self.ventas_del_dia(fecha)
         
         if not ventas_dia:
             print(f"\n✗ No hay ventas para el {fecha.strftime('%d/%m/%Y')}")
@@ -362,48 +790,30 @@ class HistorialVentas:
     
     def reporte_general(self):
         """Genera reporte general de todas las ventas."""
-        if not self.ventas:
+        est = self.estadisticas
+        if not est.cantidad:
             print("No hay ventas registradas")
             return
         
-        total_ventas = sum(v.get_total() for v in self.ventas)
-        total_ganancias = sum(v.get_ganancia_total() for v in self.ventas)
-        
         print("\n" + "="*70)
         print("REPORTE GENERAL DE VENTAS")
         print("="*70)
-        print(f"Total de ventas:        {len(self.ventas)}")
-        print(f"Monto total vendido:    ${total_ventas:,.2f}")
-        print(f"Ganancia total:         ${total_ganancias:,.2f}")
-        print(f"Promedio por venta:     ${total_ventas/len(self.ventas):,.2f}")
-        print(f"Ticket más alto:        ${max(v.get_total() for v in self.ventas):,.2f}")
-        print(f"Ticket más bajo:        ${min(v.get_total() for v in self.ventas):,.2f}")
+        print(f"Total de ventas:        {est.cantidad}")
+        print(f"Monto total vendido:    ${est.total:,.2f}")
+        print(f"Ganancia total:         ${est.ganancia:,.2f}")
+        print(f"Promedio por venta:     ${est.media:,.2f}")
+        print(f"Desviación estándar:    ${est.desviacion_estandar():,.2f}")
+        print(f"Ticket más alto:        ${est.maximo:,.2f}")
+        print(f"Ticket más bajo:        ${est.minimo:,.2f}")
+        print("-"*70)
+        print("VENTAS POR CAJERO")
+        for resumen in self.ranking_cajeros():
+            print(f"  {resumen['cajero']:<25} {resumen['cantidad']:>5} ventas   ${resumen['total']:>12,.2f}")
         print("="*70 + "\n")
     
     def productos_mas_vendidos(self, top=10):
         """Muestra los productos más vendidos."""
-        productos_vendidos = {}
-        
-        for venta in self.ventas:
-            for item in venta.get_items():
-                codigo = item['codigo']
-                nombre = item['nombre']
-                cantidad = item['cantidad']
-                
-                if codigo not in productos_vendidos:
-                    productos_vendidos[codigo] = {
-                        'nombre': nombre,
-                        'cantidad': 0,
-                        'monto': 0
-                    }
-                
-                productos_vendidos[codigo]['cantidad'] += cantidad
-                productos_vendidos[codigo]['monto'] += item['subtotal']
-        
-        # Ordenar por cantidad
-        productos_ordenados = sorted(productos_vendidos.items(), 
-                                    key=lambda x: x[1]['cantidad'], 
-                                    reverse=True)
+        productos_ordenados = self.productos_vendidos.top(top)
         
         print("\n" + "="*80)
         print(f"TOP {top} PRODUCTOS MÁS VENDIDOS")
@@ -411,14 +821,21 @@ class HistorialVentas:
         print(f"{'#':<4} {'Código':<10} {'Producto':<35} {'Cantidad':<10} {'Monto':<12}")
         print("-"*80)
         
-        for i, (codigo, datos) in enumerate(productos_ordenados[:top], 1):
+        for i, (codigo, datos) in enumerate(productos_ordenados, 1):
             print(f"{i:<4} {codigo:<10} {datos['nombre']:<35} "
                   f"{datos['cantidad']:<10} ${datos['monto']:<11.2f}")
         
         print("="*80 + "\n")
     
     def guardar_csv(self, archivo="historial_ventas.csv"):
-        """Guarda el historial en CSV."""
+        """
+        Guarda el historial en CSV. Con base de datos vinculada se agregan
+        sólo las ventas nuevas (con su detalle) leyendo directo de la BD.
+        """
+        if self.db:
+            self.db.exportar_ventas_csv(archivo)
+            return
+        
         if not self.ventas:
             print("No hay ventas para guardar")
             return
@@ -429,11 +846,12 @@ class HistorialVentas:
                 writer.writerow(['Numero_Venta', 'Fecha', 'Hora', 'Cajero', 
                                'Items', 'Total', 'Ganancia', 'Estado'])
                 
-                for venta in self.ventas:
+                for venta in self.iterar_ventas():
+                    fecha, hora = venta.get_fecha().strftime('%d/%m/%Y %H:%M:%S').split(' ')
                     writer.writerow([
                         venta.get_numero_venta(),
-                        venta.get_fecha().strftime('%d/%m/%Y'),
-                        venta.get_fecha().strftime('%H:%M:%S'),
+                        fecha,
+                        hora,
                         venta.get_cajero(),
                         len(venta.get_items()),
                         venta.get_total(),
@@ -458,6 +876,7 @@ class SistemaPOS:
         self.historial = HistorialVentas()
         self.venta_actual = None
         self.cajero = "Cajero Principal"
+        self.db = None  # BaseDatos opcional donde se guardan las ventas
     
     def nueva_venta(self):
         """Inicia una nueva venta."""
@@ -535,7 +954,15 @@ class SistemaPOS:
         
         if confirmar.lower() == 's':
             if self.venta_actual.completar_venta():
+                # ── GUARDAR EN SQLITE ─────────────────────────── NUEVO
+                # El commit corre mientras se muestra el ticket; la venta
+                # cuenta como guardada cuando su Future se resuelve
+                guardado = self.db.encolar_venta(self.venta_actual) if self.db else None
                 self.venta_actual.generar_ticket()
+                if guardado and not self.confirmar_guardado(self.venta_actual, guardado):
+                    self.venta_actual = None
+                    return
+                # ─────────────────────────────────────────────────────
                 
                 # Preguntar si guardar ticket
                 guardar = input("\n¿Guardar ticket en archivo? (s/n): ")
@@ -544,17 +971,29 @@ class SistemaPOS:
                 
                 # Agregar al historial
                 self.historial.agregar_venta(self.venta_actual)
-
-                             # ── GUARDAR EN SQLITE ─────────────────────────── NUEVO
-                if hasattr(self, 'db') and self.db:
-                    self.db.guardar_venta(self.venta_actual)
-                # ─────────────────────────────────────────────────────
-
                 self.venta_actual = None
         else:
             print("Venta no confirmada")
 
 
+    def confirmar_guardado(self, venta, guardado):
+        """
+        Espera el Future de db.encolar_venta(venta). Si la venta no quedó
+        confirmada en la base de datos, devuelve su stock al inventario
+        (la venta no debe pasar al historial) y retorna False.
+        """
+        try:
+            if guardado.result():
+                return True
+            error = "ya existe una venta con ese número"
+        except Exception as e:
+            error = e
+        venta.revertir_venta()
+        print(f"✗ La venta #{venta.get_numero_venta()} NO se guardó ({error}); "
+              f"el stock se restauró, cóbrala de nuevo")
+        return False
+
+
 # ============================================================
 # MENÚ INTERACTIVO DEL SISTEMA DE VENTAS
 # ============================================================
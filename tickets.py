@@ -0,0 +1,360 @@
+"""
+MOTOR DE TICKETS - CAFETERÍA
+Renderizado de tickets con plantilla precompilada (texto, bytes y ESC/POS)
+Autor: Sistema de Ventas
+Fecha: Octubre 2026
+"""
+
+import atexit
+import os
+import queue
+import sys
+import threading
+import time
+
+# ============================================================
+# CONSTANTES
+# ============================================================
+
+ANCHO_TICKET = 60
+
+# Comandos ESC/POS (subconjunto común de impresoras térmicas)
+ESC_INICIALIZAR = b"\x1b@"
+ESC_PAGINA_CP858 = b"\x1bt\x13"      # Tabla de caracteres PC858 (latín + €)
+ESC_FUENTE_B = b"\x1bM\x01"          # Fuente B: 64 columnas en papel de 80 mm
+ESC_CENTRAR = b"\x1ba\x01"
+ESC_IZQUIERDA = b"\x1ba\x00"
+ESC_NEGRITA_ON = b"\x1bE\x01"
+ESC_NEGRITA_OFF = b"\x1bE\x00"
+ESC_CORTE_PARCIAL = b"\x1dVB\x03"    # Avanza 3 líneas y corta
+CODIFICACION_ESCPOS = "cp858"
+
+
+# ============================================================
+# CLASE PLANTILLA DE TICKET
+# ============================================================
+
+class PlantillaTicket:
+    """
+    Plantilla de ticket precompilada.
+    El encabezado (datos del negocio) y los formatos de cada línea se
+    construyen una sola vez; renderizar una venta no imprime ni escribe nada.
+    """
+
+    def __init__(self, configuracion_general=None, ancho=ANCHO_TICKET):
+        """Precompila la plantilla con la sección 'configuracion_general' de config.json."""
+        config = configuracion_general or {}
+        self.ancho = ancho
+        separador = "=" * ancho
+        linea = "-" * ancho
+
+        # --- Encabezado fijo (datos del negocio) ---
+        nombre_negocio = config.get("nombre_negocio")
+        if nombre_negocio:
+            titulo = f"☕ {nombre_negocio.upper()} ☕".center(ancho).rstrip()
+        else:
+            titulo = "             ☕ CAFETERÍA - TICKET DE VENTA ☕"
+        encabezado = [separador, titulo]
+        for clave, etiqueta in (("direccion", ""), ("telefono", "Tel: "), ("rfc", "RFC: ")):
+            if config.get(clave):
+                encabezado.append(f"{etiqueta}{config[clave]}".center(ancho).rstrip())
+        if nombre_negocio:
+            encabezado.append("TICKET DE VENTA".center(ancho).rstrip())
+        encabezado.append(separador)
+        self._encabezado = encabezado
+
+        # --- Formatos precompilados ---
+        self._formato_datos = (
+            "Ticket #:     {0}\n"
+            "Fecha:        {1}\n"
+            "Cajero:       {2}"
+        ).format
+        self._columnas = [separador,
+                          f"{'Producto':<35} {'Cant':<5} {'P.Unit':<10} {'Total':<10}",
+                          linea]
+        self._formato_item = "{0:<35} {1:<5} ${2:<9.2f} ${3:<9.2f}".format
+        self._linea = linea
+        self._formato_importe = "{0:<52} ${1:.2f}".format
+        self._formato_descuento = "{0:<51} -${1:.2f}".format
+        self._pie = [separador,
+                     "         ¡Gracias por su compra! Vuelva pronto",
+                     separador]
+
+        # Bloques de texto ya unidos para no repetir el join en cada venta
+        self._texto_encabezado = "\n" + "\n".join(self._encabezado)
+        self._texto_columnas = "\n".join(self._columnas)
+        self._texto_pie = "\n".join(self._pie) + "\n"
+
+        # Bloques ESC/POS precodificados
+        self._escpos_encabezado = (
+            ESC_INICIALIZAR + ESC_PAGINA_CP858 + ESC_FUENTE_B
+            + ESC_CENTRAR + ESC_NEGRITA_ON
+            + self._codificar("\n".join(l.strip() for l in self._encabezado[1:-1]) + "\n")
+            + ESC_NEGRITA_OFF + ESC_IZQUIERDA
+            + self._codificar(separador + "\n")
+        )
+        self._escpos_pie = (
+            ESC_CENTRAR + self._codificar("\n".join(l.strip() for l in self._pie) + "\n")
+            + ESC_IZQUIERDA + ESC_CORTE_PARCIAL
+        )
+
+    # --- RENDERIZADO DE TEXTO ---
+    def _cuerpo(self, venta):
+        """Construye las líneas variables del ticket (datos, items y totales)."""
+        formato_item = self._formato_item
+        partes = [self._formato_datos(venta.get_numero_venta(),
+                                      venta.get_fecha().strftime('%d/%m/%Y %H:%M:%S'),
+                                      venta.get_cajero()),
+                  self._texto_columnas]
+        partes.extend(formato_item(item['nombre'], item['cantidad'],
+                                   item['precio_unitario'], item['subtotal'])
+                      for item in venta.get_items())
+        partes.append(self._linea)
+
+        subtotal = venta.get_subtotal()
+        total = venta.get_total()
+        partes.append(self._formato_importe("SUBTOTAL:", subtotal))
+        for nombre, monto in venta.get_promociones_aplicadas():
+            partes.append(self._formato_descuento(f"  {nombre[:48]}", monto))
+        if total < subtotal:
+            partes.append(self._formato_descuento("DESCUENTO:", subtotal - total))
+        partes.append(self._formato_importe("TOTAL A PAGAR:", total))
+        return "\n".join(partes)
+
+    def renderizar(self, venta):
+        """Devuelve el texto del ticket de una venta ('' si no tiene items)."""
+        if not venta.get_items():
+            return ""
+        return "\n".join((self._texto_encabezado, self._cuerpo(venta), self._texto_pie))
+
+    def renderizar_bytes(self, venta, codificacion="utf-8"):
+        """Devuelve el ticket como bytes en la codificación indicada."""
+        return self.renderizar(venta).encode(codificacion, errors="replace")
+
+    def renderizar_lote(self, ventas):
+        """Renderiza varios tickets en un solo texto (reimpresiones de fin de día)."""
+        return "".join(self.renderizar(venta) for venta in ventas)
+
+    # --- RENDERIZADO ESC/POS ---
+    def _codificar(self, texto):
+        return texto.encode(CODIFICACION_ESCPOS, errors="replace")
+
+    def renderizar_escpos(self, venta):
+        """Devuelve el ticket como flujo de bytes ESC/POS listo para la impresora."""
+        if not venta.get_items():
+            return b""
+        return b"".join((self._escpos_encabezado,
+                         self._codificar(self._cuerpo(venta) + "\n"),
+                         self._escpos_pie))
+
+    def renderizar_lote_escpos(self, ventas):
+        """Renderiza varios tickets ESC/POS, cada uno con su propio corte de papel."""
+        return b"".join(self.renderizar_escpos(venta) for venta in ventas)
+
+
+# ============================================================
+# IMPRESORA SIMULADA
+# ============================================================
+
+class ImpresoraArchivo:
+    """
+    Sustituto de impresora térmica: escribe los bytes ESC/POS en un archivo
+    o dispositivo (por ejemplo 'impresora.bin' o '/dev/usb/lp0').
+    Con destino '-' los envía a la salida estándar.
+    """
+
+    def __init__(self, destino="impresora.bin"):
+        self.destino = destino
+
+    def enviar(self, datos):
+        """Envía un bloque de bytes a la impresora. Retorna True si tuvo éxito."""
+        try:
+            if self.destino == "-":
+                sys.stdout.buffer.write(datos)
+                sys.stdout.buffer.flush()
+            else:
+                with open(self.destino, "ab") as impresora:
+                    impresora.write(datos)
+            return True
+        except Exception as e:
+            print(f"✗ Error al enviar a la impresora: {e}")
+            return False
+
+
+# ============================================================
+# ESCRITOR DE TICKETS EN SEGUNDO PLANO
+# ============================================================
+
+class EscritorTickets:
+    """
+    Hilo escritor de tickets.
+    Recibe tickets ya renderizados en una cola acotada y los escribe por
+    lotes, con un fsync por archivo al final de cada lote, para que el
+    disco no retrase el cobro del siguiente cliente.
+    Con un ArchivoTickets, las claves encoladas son números de venta y cada
+    lote se anexa al segmento activo con un único fsync.
+    """
+
+    def __init__(self, capacidad=256, lote_maximo=32, archivo=None):
+        self._cola = queue.Queue(maxsize=capacidad)
+        self.lote_maximo = lote_maximo
+        self.archivo = archivo
+        self._carpetas_creadas = set()
+        self._cerrado = False
+        # Hace atómicos "¿cerrado?" + put(): nada entra a la cola después del fin
+        self._lock_cierre = threading.Lock()
+
+        # Estadísticas
+        self._escritos = 0
+        self._lotes = 0
+        self._errores = 0
+        self._latencia_total = 0.0
+        self._latencia_maxima = 0.0
+
+        self._hilo = threading.Thread(target=self._ejecutar, name="EscritorTickets", daemon=True)
+        self._hilo.start()
+        atexit.register(self.cerrar)  # Vacía la cola aunque no se llame a cerrar()
+
+    def encolar(self, destino, contenido):
+        """
+        Agrega un ticket a la cola de escritura. 'destino' es la ruta del
+        archivo, o el número de venta si el escritor usa un ArchivoTickets.
+        Si la cola está llena espera a que haya espacio (contrapresión).
+        """
+        with self._lock_cierre:
+            if not self._cerrado:
+                self._cola.put((destino, contenido, time.perf_counter()))
+                return
+        self._escribir_lote([(destino, contenido, time.perf_counter())])
+
+    def vaciar(self):
+        """Bloquea hasta que todos los tickets encolados estén en disco."""
+        self._cola.join()
+
+    def cerrar(self):
+        """Escribe los tickets pendientes y detiene el hilo."""
+        with self._lock_cierre:
+            if self._cerrado:
+                return
+            self._cerrado = True
+            self._cola.put(None)
+        self._hilo.join()
+
+    # --- HILO DE ESCRITURA ---
+    def _ejecutar(self):
+        while True:
+            primero = self._cola.get()
+            if primero is None:
+                self._cola.task_done()
+                return
+
+            # Juntar todo lo que ya esté esperando, hasta el tamaño de lote
+            lote = [primero]
+            terminar = False
+            while len(lote) < self.lote_maximo:
+                try:
+                    siguiente = self._cola.get_nowait()
+                except queue.Empty:
+                    break
+                if siguiente is None:
+                    terminar = True
+                    break
+                lote.append(siguiente)
+
+            self._escribir_lote(lote)
+            for _ in range(len(lote) + terminar):
+                self._cola.task_done()
+            if terminar:
+                return
+
+    def _escribir_lote(self, lote):
+        """Escribe un lote de tickets y sincroniza todos los archivos al final."""
+        if self.archivo:
+            self._escribir_lote_archivo(lote)
+            return
+
+        abiertos = []
+        carpetas = set()
+        for ruta, contenido, encolado in lote:
+            try:
+                carpeta = os.path.dirname(ruta)
+                if carpeta and carpeta not in self._carpetas_creadas:
+                    os.makedirs(carpeta, exist_ok=True)
+                    self._carpetas_creadas.add(carpeta)
+                archivo = open(ruta, 'w', encoding='utf-8')
+                archivo.write(contenido)
+                archivo.flush()
+                abiertos.append((archivo, encolado))
+                carpetas.add(carpeta or ".")
+            except Exception as e:
+                self._errores += 1
+                print(f"✗ Error al guardar ticket '{ruta}': {e}")
+
+        for archivo, encolado in abiertos:
+            try:
+                os.fsync(archivo.fileno())
+            except OSError as e:
+                self._errores += 1
+                print(f"✗ Error al sincronizar '{archivo.name}': {e}")
+            finally:
+                archivo.close()
+
+        # Las entradas de directorio nuevas también deben llegar al disco
+        for carpeta in carpetas:
+            try:
+                descriptor = os.open(carpeta, os.O_RDONLY)
+            except OSError:
+                continue  # Windows no permite abrir carpetas
+            try:
+                os.fsync(descriptor)
+            except OSError:
+                pass
+            finally:
+                os.close(descriptor)
+
+        self._registrar_latencias([encolado for _, encolado in abiertos])
+
+    def _escribir_lote_archivo(self, lote):
+        """Anexa el lote completo al archivo segmentado."""
+        try:
+            self.archivo.agregar_lote([(numero, contenido) for numero, contenido, _ in lote])
+        except Exception as e:
+            self._errores += len(lote)
+            print(f"✗ Error al archivar {len(lote)} tickets: {e}")
+            return
+        self._registrar_latencias([encolado for _, _, encolado in lote])
+
+    def _registrar_latencias(self, encolados):
+        ahora = time.perf_counter()
+        for encolado in encolados:
+            latencia = ahora - encolado
+            self._latencia_total += latencia
+            if latencia > self._latencia_maxima:
+                self._latencia_maxima = latencia
+        self._escritos += len(encolados)
+        self._lotes += 1
+
+    # --- ESTADÍSTICAS ---
+    def estadisticas(self):
+        """Retorna profundidad de la cola y latencias de escritura (ms)."""
+        return {
+            'en_cola': self._cola.qsize(),
+            'escritos': self._escritos,
+            'lotes': self._lotes,
+            'errores': self._errores,
+            'latencia_promedio_ms': (self._latencia_total / self._escritos * 1000) if self._escritos else 0.0,
+            'latencia_maxima_ms': self._latencia_maxima * 1000,
+        }
+
+    def mostrar_estadisticas(self):
+        """Muestra las estadísticas del escritor."""
+        datos = self.estadisticas()
+        print("\n" + "="*60)
+        print("ESCRITOR DE TICKETS")
+        print("="*60)
+        print(f"Tickets en cola:      {datos['en_cola']}")
+        print(f"Tickets escritos:     {datos['escritos']} en {datos['lotes']} lotes")
+        print(f"Errores:              {datos['errores']}")
+        print(f"Latencia promedio:    {datos['latencia_promedio_ms']:.2f} ms")
+        print(f"Latencia máxima:      {datos['latencia_maxima_ms']:.2f} ms")
+        print("="*60 + "\n")